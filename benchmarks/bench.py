@@ -0,0 +1,259 @@
+# bench.py
+#
+# Benchmark harness for ptx_parser and sass_ptx_parser.
+#
+#   python benchmarks/bench.py run --out results.json [--threads 1000,1000000] [--blocks 128,256] [--kernels ...]
+#   python benchmarks/bench.py compare baseline.json results.json [--threshold 0.1]
+#   python benchmarks/bench.py generate ptx --stores 4 --addressing gather > k.ptx
+#
+# Both packages use flat module names (parser, simulator, utils), so every
+# case runs in a fresh worker process with the package directory on
+# sys.path; a case that exceeds --timeout is recorded as such. compare
+# matches cases by (package, kernel, format, threads, block) and exits
+# non-zero when throughput dropped by more than the threshold. sass_ptx_parser
+# cases also record the occupancy of their block size (occupancy.py) and the
+# sweep flags block sizes that leave the SMs under-occupied.
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from typing import Dict, List
+
+from kernels import SUITE, generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = ("ptx_parser", "sass_ptx_parser")
+FORMATS = ("ptx", "sass")
+DEFAULT_THREADS = (1_000, 10_000, 100_000, 1_000_000)
+FULL_THREADS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000)
+BLOCK = 256
+
+def _worker(package: str, kernel_path: str, threads: int, block: int) -> Dict:
+    """Time parse / simulate / analyze of one kernel in this process."""
+    sys.path.insert(0, os.path.join(ROOT, package))
+    import parser as kparser
+    import simulator
+    import utils
+
+    with open(kernel_path) as f:
+        code = f.read()
+    grid = max(1, -(-threads // block))
+    timings = {}
+    sink = io.StringIO()
+    with redirect_stdout(sink):
+        start = time.perf_counter()
+        ir = kparser.parse_ptx_to_ir(code) if kernel_path.endswith(".ptx") else kparser.parse_sass_to_ir(code)
+        timings["parse_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = simulator.simulate_launch(ir, grid, block, 0x1000)
+        timings["simulate_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if package == "ptx_parser":
+            addresses = [a["address"] for a in result]
+            utils.estimate_footprint(addresses)
+            utils.coalesce_addresses(addresses)
+            utils.analyze_stride(addresses)
+            simulator.analyze_warp_usage(result)
+            accesses = len(addresses)
+        else:
+            trace = result[0]
+            accesses_trace = trace.select(space="global")
+            ranges = utils.strided_ranges(accesses_trace)
+            utils.footprint_from_ranges(ranges)
+            utils.stride_from_ranges(ranges)
+            for _ in simulator.iter_warp_usage(accesses_trace):
+                pass
+            utils.analyze_bank_conflicts(trace.select(space="shared"))
+            accesses = trace.num_accesses
+        timings["analyze_s"] = time.perf_counter() - start
+
+    total = sum(timings.values())
+    result = {
+        **{k: round(v, 6) for k, v in timings.items()},
+        "total_s": round(total, 6),
+        "threads_simulated": grid * block,
+        "accesses": accesses,
+        "threads_per_s": round(grid * block / total, 1) if total else None,
+    }
+    if package == "sass_ptx_parser":
+        import occupancy
+        occ = occupancy.launch_occupancy(
+            grid, block, occupancy.registers_per_thread(code, kernel_path.endswith(".ptx")),
+            occupancy.declared_shared(ir), occupancy.device_limits(arch=occupancy.target_arch(code)))
+        result.update(occupancy=occ["occupancy"], occupancy_limiter=occ["limiter"],
+                      occupancy_flags=[f["flag"] for f in occ["flags"]])
+    return result
+
+def run_case(package: str, fmt: str, kernel: str, threads: int, timeout: float, block: int = BLOCK) -> Dict:
+    case = {"package": package, "kernel": kernel, "format": fmt, "threads": threads, "block": block}
+    with tempfile.NamedTemporaryFile("w", suffix=f".{fmt}", delete=False) as f:
+        f.write(generate(fmt, **SUITE[kernel]))
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "worker", package, f.name, str(threads), str(block)],
+            capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {**case, "status": "timeout"}
+    finally:
+        os.unlink(f.name)
+    if proc.returncode != 0:
+        return {**case, "status": "error", "error": proc.stderr.strip().splitlines()[-1:]}
+    return {**case, "status": "ok", **json.loads(proc.stdout.strip().splitlines()[-1])}
+
+def cmd_run(args):
+    results = []
+    for package in args.packages:
+        for kernel in args.kernels:
+            for fmt in args.formats:
+                skip = False
+                for threads, block in ((t, b) for t in args.threads for b in args.blocks):
+                    if skip:
+                        # Larger launches of a case that already timed out would too
+                        results.append({"package": package, "kernel": kernel, "format": fmt,
+                                        "threads": threads, "block": block, "status": "skipped"})
+                        continue
+                    # One record per case: the first failure, or the fastest run with every run's total
+                    runs = []
+                    for _ in range(args.repeat):
+                        run = run_case(package, fmt, kernel, threads, args.timeout, block)
+                        if run["status"] != "ok":
+                            break
+                        runs.append(run)
+                    if run["status"] != "ok":
+                        r = {**run, "completed_repeats": len(runs)}
+                        skip = run["status"] == "timeout"
+                    else:
+                        r = {**min(runs, key=lambda x: x["total_s"]), "repeat_total_s": [x["total_s"] for x in runs]}
+                    results.append(r)
+                    print(f"{package:16} {kernel:18} {fmt:4} {threads:>11,} {block:5}  {r['status']:8}"
+                          + (f" {r['total_s']:9.3f} s  {r['threads_per_s']:>14,.0f} thr/s" if r["status"] == "ok" else "")
+                          + (f"  occupancy {r['occupancy']:.0%}" if "occupancy" in r else "")
+                          + (f"  [{', '.join(r['occupancy_flags'])}]" if r.get("occupancy_flags") else ""),
+                          file=sys.stderr)
+
+    baseline = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(baseline, f, indent=4)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+def _key(r: Dict):
+    return r["package"], r["kernel"], r["format"], r["threads"], r.get("block", BLOCK)
+
+def compare(baseline: List[Dict], current: List[Dict], threshold: float) -> List[Dict]:
+    """
+    Per-case throughput change; a case regresses when it drops by more than
+    threshold. Cases run on one side only, or that did not finish in the
+    baseline, are listed with their status and no change.
+    """
+    before = {_key(r): r for r in baseline}
+    after = {_key(r) for r in current}
+    rows = []
+    for r in current + [b for b in baseline if _key(b) not in after]:
+        b = before.get(_key(r))
+        row = {"package": r["package"], "kernel": r["kernel"], "format": r["format"], "threads": r["threads"],
+               "block": r.get("block", BLOCK), "baseline_tps": b.get("threads_per_s") if b else None,
+               "current_tps": r.get("threads_per_s") if _key(r) in after else None}
+        if b is None:
+            row.update(change=None, regression=False, status="only_current")
+        elif _key(r) not in after:
+            row.update(change=None, regression=False, status="only_baseline")
+        elif b["status"] != "ok":
+            row.update(change=None, regression=False, status=f"baseline_{b['status']}")
+        elif r["status"] != "ok":
+            row.update(change=None, regression=True, status=r["status"])
+        else:
+            change = r["threads_per_s"] / b["threads_per_s"] - 1
+            row.update(change=round(change, 4), regression=change < -threshold, status="ok")
+        rows.append(row)
+    return rows
+
+def cmd_compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    with open(args.current) as f:
+        current = json.load(f)["results"]
+    rows = compare(baseline, current, args.threshold)
+    for row in rows:
+        change = f"{row['change']:+16.1%}" if row["change"] is not None else f"{row['status']:>16}"
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['package']:16} {row['kernel']:18} {row['format']:4} {row['threads']:>11,} {row['block']:5}  {change}{flag}")
+    regressions = sum(r["regression"] for r in rows)
+    unmatched = sum(r["status"] in ("only_baseline", "only_current") for r in rows)
+    print(f"{len(rows) - unmatched} cases compared, {regressions} regressions (threshold {args.threshold:.0%})"
+          + (f", {unmatched} cases on one side only" if unmatched else ""))
+    sys.exit(1 if regressions else 0)
+
+def cmd_generate(args):
+    sys.stdout.write(generate(args.format, instructions=args.instructions, stores=args.stores,
+                              addressing=args.addressing, predicated=args.predicated))
+
+def _csv(kind, choices=None):
+    def parse(text):
+        items = [kind(x) for x in text.split(",") if x]
+        bad = [x for x in items if choices is not None and x not in choices]
+        if bad:
+            raise argparse.ArgumentTypeError(f"unknown: {', '.join(map(str, bad))}")
+        return items
+    return parse
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ptx_parser and sass_ptx_parser")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Time every case and write a JSON baseline")
+    run.add_argument("--out", default="benchmark_results.json", help="Output JSON file (default: benchmark_results.json)")
+    run.add_argument("--packages", type=_csv(str, PACKAGES), default=list(PACKAGES))
+    run.add_argument("--kernels", type=_csv(str, SUITE), default=list(SUITE))
+    run.add_argument("--formats", type=_csv(str, FORMATS), default=list(FORMATS))
+    run.add_argument("--threads", type=_csv(int), default=list(DEFAULT_THREADS),
+                     help="Comma-separated thread counts (default: 1K..1M)")
+    run.add_argument("--blocks", type=_csv(int), default=[BLOCK],
+                     help=f"Comma-separated block sizes to sweep (default: {BLOCK})")
+    run.add_argument("--full", action="store_const", dest="threads", const=list(FULL_THREADS),
+                     help="Thread counts from 1K to 100M")
+    run.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is kept")
+    run.add_argument("--timeout", type=float, default=600, help="Seconds per case (default: 600)")
+    run.set_defaults(func=cmd_run)
+
+    cmp = sub.add_parser("compare", help="Flag throughput regressions against a baseline")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="Allowed throughput drop (default: 0.10)")
+    cmp.set_defaults(func=cmd_compare)
+
+    gen = sub.add_parser("generate", help="Print a synthetic kernel")
+    gen.add_argument("format", choices=FORMATS)
+    gen.add_argument("--instructions", type=int, default=0)
+    gen.add_argument("--stores", type=int, default=1)
+    gen.add_argument("--addressing", choices=("affine", "gather"), default="affine")
+    gen.add_argument("--predicated", action="store_true")
+    gen.set_defaults(func=cmd_generate)
+
+    if len(sys.argv) > 1 and sys.argv[1] == "worker":
+        package, path, threads, block = sys.argv[2:6]
+        print(json.dumps(_worker(package, path, int(threads), int(block))))
+        return
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
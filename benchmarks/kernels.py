@@ -0,0 +1,117 @@
+# kernels.py
+#
+# Synthetic PTX / SASS kernels for benchmarking. Every kernel computes
+# idx = ctaid.x * ntid.x + tid.x and stores to out[idx] (one array per extra
+# store), shaped by:
+#
+#   instructions  extra integer multiply-adds before the stores
+#   stores        number of st.global / STG instructions
+#   addressing    "affine" (out[idx]) or "gather" (out[(idx * 40503) & 0xffff])
+#   predicated    stores alternate between @p and @!p on the parity of tid.x
+
+from typing import Dict
+
+# Distance between the arrays written by successive stores
+ARRAY_STRIDE = 1 << 24
+
+SUITE: Dict[str, Dict] = {
+    "affine_st1": {"instructions": 0, "stores": 1, "addressing": "affine", "predicated": False},
+    "affine_st4_alu32": {"instructions": 32, "stores": 4, "addressing": "affine", "predicated": False},
+    "gather_st1": {"instructions": 0, "stores": 1, "addressing": "gather", "predicated": False},
+    "predicated_st2": {"instructions": 8, "stores": 2, "addressing": "affine", "predicated": True},
+}
+
+def kernel_name(instructions=0, stores=1, addressing="affine", predicated=False) -> str:
+    return f"_Z5synth_i{instructions}_s{stores}_{addressing}{'_pred' if predicated else ''}"
+
+def generate_ptx(instructions: int = 0, stores: int = 1, addressing: str = "affine",
+                 predicated: bool = False) -> str:
+    name = kernel_name(instructions, stores, addressing, predicated)
+    body = [
+        f"ld.param.u64 \t%rd1, [{name}_param_0];",
+        "cvta.to.global.u64 \t%rd2, %rd1;",
+        "mov.u32 \t%r1, %ctaid.x;",
+        "mov.u32 \t%r2, %ntid.x;",
+        "mov.u32 \t%r3, %tid.x;",
+        "mad.lo.s32 \t%r4, %r1, %r2, %r3;",
+    ]
+    if addressing == "gather":
+        body += ["mul.lo.s32 \t%r4, %r4, 40503;", "and.b32 \t%r4, %r4, 65535;"]
+    if instructions:
+        body.append("mov.u32 \t%r10, 1;")
+        body += ["mad.lo.s32 \t%r10, %r10, %r2, %r3;"] * instructions
+    body += [
+        "mul.wide.s32 \t%rd3, %r4, 4;",
+        "add.s64 \t%rd4, %rd2, %rd3;",
+        "mov.u32 \t%r5, 1065353216;",
+        f"mov.u64 \t%rd20, {ARRAY_STRIDE};",
+    ]
+    if predicated:
+        body += ["and.b32 \t%r6, %r3, 1;", "setp.eq.s32 \t%p1, %r6, 0;"]
+    for k in range(stores):
+        addr = f"%rd{4 + k}"
+        if k:
+            body.append(f"add.s64 \t{addr}, %rd{3 + k}, %rd20;")
+        guard = ("@%p1 " if k % 2 == 0 else "@!%p1 ") if predicated else ""
+        body.append(f"{guard}st.global.u32 \t[{addr}], %r5;")
+    body.append("ret;")
+
+    lines = [
+        ".version 7.5",
+        ".target sm_86",
+        ".address_size 64",
+        "",
+        f".visible .entry {name}(",
+        f"\t.param .u64 {name}_param_0,",
+        f"\t.param .u32 {name}_param_1",
+        ")",
+        "{",
+        "\t.reg .pred \t%p<2>;",
+        "\t.reg .b32 \t%r<11>;",
+        f"\t.reg .b64 \t%rd<{max(21, 5 + stores)}>;",
+        "",
+    ]
+    lines += ["\t" + line for line in body]
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def generate_sass(instructions: int = 0, stores: int = 1, addressing: str = "affine",
+                  predicated: bool = False) -> str:
+    name = kernel_name(instructions, stores, addressing, predicated)
+    body = [
+        "MOV R1, c[0x0][0x28] ;",
+        "S2R R0, SR_CTAID.X ;",
+        "S2R R7, SR_TID.X ;",
+        "IMAD R0, R0, c[0x0][0x0], R7 ;",
+    ]
+    if addressing == "gather":
+        body += ["IMAD R0, R0, 0x9e37, RZ ;", "LOP3.LUT R0, R0, 0xffff, RZ, 0xc0, !PT ;"]
+    if instructions:
+        body.append("MOV R10, 0x1 ;")
+        body += ["IMAD R10, R10, c[0x0][0x0], R7 ;"] * instructions
+    body += [
+        "MOV R9, 0x4 ;",
+        "IMAD.WIDE R2, R0, R9, c[0x0][0x160] ;",
+        "MOV R5, 0x3f800000 ;",
+    ]
+    if predicated:
+        body += ["LOP3.LUT R8, R7, 0x1, RZ, 0xc0, !PT ;", "ISETP.EQ.AND P0, PT, R8, RZ, PT ;"]
+    for k in range(stores):
+        # 64-bit pointer pairs: the low word carries into the high one
+        lo = 2 if k == 0 else 12 + 2 * k
+        addr = f"R{lo}"
+        if k:
+            prev = 2 if k == 1 else 10 + 2 * k
+            body.append(f"IADD3 R{lo}, P1, R{prev}, 0x{ARRAY_STRIDE:x}, RZ ;")
+            body.append(f"IADD3.X R{lo + 1}, RZ, R{prev + 1}, RZ, P1, !PT ;")
+        guard = ("@P0 " if k % 2 == 0 else "@!P0 ") if predicated else ""
+        body.append(f"{guard}STG.E [{addr}.64], R5 ;")
+    body.append("EXIT ;")
+    body.append(f"BRA 0x{len(body) * 16:x};")
+
+    lines = ["\tcode for sm_86", f"\t\tFunction : {name}"]
+    lines += [f"        /*{k * 16:04x}*/                   {ins}" for k, ins in enumerate(body)]
+    return "\n".join(lines) + "\n"
+
+def generate(fmt: str, **params) -> str:
+    return generate_ptx(**params) if fmt == "ptx" else generate_sass(**params)
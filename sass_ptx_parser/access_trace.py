@@ -0,0 +1,154 @@
+# access_trace.py
+
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+SPACES = ("global", "shared")
+KINDS = ("read", "write", "atomic")
+
+Dim3 = Tuple[int, int, int]
+
+# List slot plus a small int object per written value
+VALUE_BYTES = 36
+
+def dim3(value: Union[int, str, tuple, list]) -> Dim3:
+    """Normalize 128, "16,16", "8x8x4" or (16, 16) to an (x, y, z) tuple."""
+    if isinstance(value, str):
+        value = [int(v) for v in value.lower().replace("x", ",").split(",")]
+    elif isinstance(value, int):
+        value = [value]
+    value = list(value) + [1] * (3 - len(value))
+    if len(value) != 3 or any(v < 1 for v in value):
+        raise ValueError(f"bad launch dimension: {value}")
+    return tuple(value)
+
+def unravel(index: int, dims: Dim3) -> Dim3:
+    """Linear index -> (x, y, z), x varying fastest as in the hardware order."""
+    x, y = dims[0], dims[1]
+    return index % x, index // x % y, index // (x * y)
+
+class AccessTrace:
+    """
+    Column-oriented memory trace, one row per executed (thread, memory
+    instruction). `block` is the linear block index, `thread` the linear
+    thread index inside the block (x fastest, then y, then z) and `warp` the
+    warp index inside the block.
+    A row from a summarized loop stands for `count` accesses at
+    address, address + stride, ...; straight-line rows have count 1.
+    """
+
+    COLUMNS = (("block", "L"), ("thread", "L"), ("warp", "L"), ("instr", "L"),
+               ("address", "Q"), ("size", "H"), ("space", "B"), ("kind", "B"),
+               ("stride", "q"), ("count", "L"))
+
+    def __init__(self, grid_dim, block_dim, base_address: int = 0):
+        self.grid_shape = dim3(grid_dim)
+        self.block_shape = dim3(block_dim)
+        self.grid_dim = self.grid_shape[0] * self.grid_shape[1] * self.grid_shape[2]
+        self.block_dim = self.block_shape[0] * self.block_shape[1] * self.block_shape[2]
+        self.base_address = base_address
+        for name, code in self.COLUMNS:
+            setattr(self, name, array(code))
+        self.value: List = []
+        self.ops: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.address)
+
+    @property
+    def num_accesses(self) -> int:
+        return sum(self.count)
+
+    @property
+    def warps_per_block(self) -> int:
+        return (self.block_dim + 31) // 32
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the rows: column data plus a boxed value each."""
+        return sum(len(getattr(self, name)) * getattr(self, name).itemsize for name, _ in self.COLUMNS) \
+            + VALUE_BYTES * len(self.value)
+
+    def chunks(self) -> Iterator["AccessTrace"]:
+        """
+        The trace in pieces that each hold whole blocks. An in-memory trace is
+        a single piece; spilled traces (see spill.py) yield one per file.
+        """
+        yield self
+
+    def extend(self, instr: int, op: str, blocks: List[int], threads: List[int],
+               addresses: List[int], size: int, space: str, kind: str,
+               values: Optional[List] = None, strides: Optional[List[int]] = None,
+               counts: Optional[List[int]] = None):
+        """Append one memory instruction executed by a batch of threads."""
+        n = len(addresses)
+        self.block.extend(blocks)
+        self.thread.extend(threads)
+        self.warp.extend([t // 32 for t in threads])
+        self.instr.extend(array("L", [instr]) * n)
+        self.address.extend(addresses)
+        self.size.extend(array("H", [size]) * n)
+        self.space.extend(array("B", [SPACES.index(space)]) * n)
+        self.kind.extend(array("B", [KINDS.index(kind)]) * n)
+        self.value.extend(values if values is not None else [None] * n)
+        self.stride.extend(strides if strides is not None else array("q", [0]) * n)
+        self.count.extend(counts if counts is not None else array("L", [1]) * n)
+        self.ops[instr] = op
+
+    def take(self, rows: List[int]) -> "AccessTrace":
+        """New trace holding only the given row indices, in order."""
+        out = AccessTrace(self.grid_shape, self.block_shape, self.base_address)
+        for name, code in self.COLUMNS:
+            col = getattr(self, name)
+            setattr(out, name, array(code, [col[i] for i in rows]))
+        out.value = [self.value[i] for i in rows]
+        out.ops = dict(self.ops)
+        return out
+
+    def select(self, space: Optional[str] = None, kind: Optional[str] = None) -> "AccessTrace":
+        space_code = SPACES.index(space) if space is not None else None
+        kind_code = KINDS.index(kind) if kind is not None else None
+        rows = [
+            i for i, (s, k) in enumerate(zip(self.space, self.kind))
+            if (space_code is None or s == space_code) and (kind_code is None or k == kind_code)
+        ]
+        return self.take(rows)
+
+    def global_warp(self, i: int) -> int:
+        return self.block[i] * self.warps_per_block + self.warp[i]
+
+    def record(self, i: int) -> Dict:
+        """Row i in the dict layout used by the JSON report."""
+        bx, by, bz = unravel(self.block[i], self.grid_shape)
+        tx, ty, tz = unravel(self.thread[i], self.block_shape)
+        return {
+            "blockIdx.x": bx,
+            "blockIdx.y": by,
+            "blockIdx.z": bz,
+            "threadIdx.x": tx,
+            "threadIdx.y": ty,
+            "threadIdx.z": tz,
+            "warp_id": self.global_warp(i),
+            "globalIdx": self.block[i] * self.block_dim + self.thread[i],
+            "address": self.address[i],
+            "space": SPACES[self.space[i]],
+            "access_type": KINDS[self.kind[i]],
+            "access_size": self.size[i],
+            "instr_idx": self.instr[i],
+            "instruction": self.ops[self.instr[i]],
+            "written_value": self.value[i],
+            "stride": self.stride[i],
+            "count": self.count[i],
+        }
+
+    def records(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def expanded_addresses(self) -> Iterator[int]:
+        """Every accessed address, unrolling summarized loop rows."""
+        for addr, stride, count in zip(self.address, self.stride, self.count):
+            if count == 1:
+                yield addr
+            else:
+                yield from range(addr, addr + stride * count, stride) if stride else [addr] * count
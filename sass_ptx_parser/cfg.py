@@ -0,0 +1,285 @@
+# cfg.py
+
+from typing import Iterable, List, Dict, Set
+
+def is_terminator(instr: Dict) -> bool:
+    return instr["op"] in ("bra", "exit")
+
+def build_cfg(ir: List[Dict]) -> List[Dict]:
+    """
+    Split the IR into basic blocks. Each block covers ir[start:end] and lists
+    its successor block ids; a predicated bra/exit also falls through. A
+    branch to a label the IR does not have (unresolved_targets) exits.
+    """
+    leaders = {0} if ir else set()
+    for i, instr in enumerate(ir):
+        if instr["op"] == "label":
+            leaders.add(i)
+        elif is_terminator(instr) and i + 1 < len(ir):
+            leaders.add(i + 1)
+
+    starts = sorted(leaders)
+    blocks = []
+    for bid, start in enumerate(starts):
+        end = starts[bid + 1] if bid + 1 < len(starts) else len(ir)
+        label = ir[start]["name"] if ir[start]["op"] == "label" else None
+        blocks.append({"id": bid, "start": start, "end": end, "label": label,
+                       "succs": [], "preds": []})
+
+    by_label = {b["label"]: b["id"] for b in blocks if b["label"] is not None}
+    for b in blocks:
+        last = ir[b["end"] - 1]
+        fallthrough = b["id"] + 1 if b["id"] + 1 < len(blocks) else None
+        succs = []
+        if last["op"] == "bra":
+            if last["target"] in by_label:
+                succs.append(by_label[last["target"]])
+            if last.get("pred") is not None and fallthrough is not None:
+                succs.append(fallthrough)
+        elif last["op"] == "exit":
+            if last.get("pred") is not None and fallthrough is not None:
+                succs.append(fallthrough)
+        elif fallthrough is not None:
+            succs.append(fallthrough)
+
+        b["succs"] = list(dict.fromkeys(succs))
+        for s in b["succs"]:
+            blocks[s]["preds"].append(b["id"])
+
+    return blocks
+
+def unresolved_targets(ir: List[Dict]) -> List[str]:
+    """Branch targets without a label in the IR, e.g. behind a line the parser dropped."""
+    labels = {i["name"] for i in ir if i["op"] == "label"}
+    return sorted({i["target"] for i in ir if i["op"] == "bra" and i["target"] not in labels})
+
+def summarize_cfg(ir: List[Dict], blocks: List[Dict]) -> Dict:
+    branches = [i for i in ir if i["op"] == "bra"]
+    return {
+        "basic_blocks": len(blocks),
+        "edges": sum(len(b["succs"]) for b in blocks),
+        "branches": len(branches),
+        "predicated_branches": sum(1 for i in branches if i.get("pred") is not None),
+        "predicated_instructions": sum(1 for i in ir if i.get("pred") is not None),
+        "unresolved_branches": unresolved_targets(ir),
+    }
+
+def dominators(blocks: List[Dict]) -> List[set]:
+    """Dominator sets per block (iterative data-flow; block 0 is the entry)."""
+    everything = set(range(len(blocks)))
+    dom = [set(everything) for _ in blocks]
+    if blocks:
+        dom[0] = {0}
+    changed = True
+    while changed:
+        changed = False
+        for b in blocks[1:]:
+            preds = [dom[p] for p in b["preds"]]
+            new = (set.intersection(*preds) if preds else set()) | {b["id"]}
+            if new != dom[b["id"]]:
+                dom[b["id"]] = new
+                changed = True
+    return dom
+
+def find_loops(blocks: List[Dict]) -> List[Dict]:
+    """Natural loops, one per header, from back edges latch -> header."""
+    dom = dominators(blocks)
+    loops = {}
+    for b in blocks:
+        for s in b["succs"]:
+            if s not in dom[b["id"]]:
+                continue
+            body, stack = {s}, [b["id"]]
+            while stack:
+                x = stack.pop()
+                if x not in body:
+                    body.add(x)
+                    stack.extend(blocks[x]["preds"])
+            loop = loops.setdefault(s, {"header": s, "latches": [], "body": set()})
+            loop["latches"].append(b["id"])
+            loop["body"] |= body
+
+    for loop in loops.values():
+        loop["exits"] = sorted({s for x in loop["body"] for s in blocks[x]["succs"]
+                                if s not in loop["body"]})
+    return [loops[h] for h in sorted(loops)]
+
+# Opcode heads that access memory; ld.param reads the parameter space only
+MEMORY_OPS = ("ld", "st", "atom", "red")
+
+def is_memory(instr: Dict) -> bool:
+    return instr["op"].split(".")[0] in MEMORY_OPS and not instr["op"].startswith("ld.param")
+
+def _sources(instr: Dict) -> List:
+    return [instr[k] for k in ("src", "src1", "src2", "src3", "addr", "val") if k in instr]
+
+def analyze_loop(ir: List[Dict], blocks: List[Dict], loop: Dict) -> Dict:
+    """
+    Induction variables, exit test and affinity of one loop.
+
+    A basic induction variable is a register whose only definition in the
+    loop is r = r + step (or a pointer bump r = a * b + r) with a
+    loop-invariant step. Registers derived from
+    them by add/sub, multiplication or shift by an invariant are affine in
+    the iteration number. The loop is summarizable when its body is a single
+    basic block closed by a guarded back edge, the guard comes from a setp on
+    affine values, and every address is affine: each iteration then moves
+    every register and address by a fixed per-lane delta.
+    """
+    idxs = [k for b in sorted(loop["body"]) for k in range(blocks[b]["start"], blocks[b]["end"])]
+    body = [ir[k] for k in idxs]
+    defs = {}
+    for k, instr in zip(idxs, body):
+        if "dst" in instr:
+            for reg in defined_registers(instr):
+                defs.setdefault(reg, []).append(k)
+
+    ivs = {}
+    for reg, ks in defs.items():
+        instr = ir[ks[0]]
+        head = instr["op"].split(".")[0]
+        if len(ks) != 1 or head not in ("add", "sub", "mad"):
+            continue
+        if head == "mad":
+            # Pointer bump r = a * b + r (IMAD.WIDE R2, R9, 0x400, R2) with invariant a, b
+            a, b = instr["src1"], instr["src2"]
+            if str(instr["src3"]).split(":")[0] != reg or a in defs or b in defs:
+                continue
+            ivs[reg] = a * b if isinstance(a, int) and isinstance(b, int) else f"{a}*{b}"
+            continue
+        a, b = instr["src1"], instr["src2"]
+        if instr["op"].startswith("add"):
+            step = b if a == reg else (a if b == reg else None)
+        else:
+            step = b if a == reg else None
+        if step is None or step in defs:
+            continue
+        if instr["op"].startswith("sub"):
+            step = -step if isinstance(step, (int, float)) else f"-{step}"
+        ivs[reg] = step
+
+    info = {
+        "header": blocks[loop["header"]]["label"],
+        "blocks": len(loop["body"]),
+        "instructions": sum(1 for i in body if i["op"] != "label"),
+        "induction_variables": [{"register": r, "step": s} for r, s in ivs.items()],
+        "summarizable": False,
+    }
+
+    last = ir[blocks[loop["header"]]["end"] - 1]
+    if (len(loop["body"]) != 1 or last["op"] != "bra" or last.get("pred") is None
+            or any(i.get("pred") is not None for i in body[:-1])):
+        return info
+
+    # Classify every value defined in the body, in program order
+    cls = {}
+    def klass(x):
+        if isinstance(x, str):
+            x = x.split(":")[0]   # a register pair follows its low register
+        if not isinstance(x, str) or x not in defs:
+            return "inv"
+        if x in ivs:
+            return "aff"
+        return cls.get(x, "other")  # not defined yet this iteration: carried
+
+    for instr in body:
+        if "dst" not in instr:
+            continue
+        head = instr["op"].split(".")[0]
+        srcs = [klass(x) for x in _sources(instr)]
+        if instr["dst"] in ivs:
+            continue
+        if len(defs[instr["dst"]]) > 1 or "other" in srcs or head == "atom" or head == "ld" and not instr["op"].startswith("ld.param"):
+            cls[instr["dst"]] = "other"
+        elif head in ("mov", "cvta", "add", "sub") or instr["op"].startswith("ld.param"):
+            cls[instr["dst"]] = "aff"
+        elif head in ("mul", "shl"):
+            cls[instr["dst"]] = "other" if srcs.count("aff") > 1 or (head == "shl" and srcs[1] == "aff") else "aff"
+        elif head == "mad":
+            cls[instr["dst"]] = "other" if srcs[:2].count("aff") > 1 else "aff"
+        elif head == "setp":
+            cls[instr["dst"]] = "cmp"
+        else:
+            cls[instr["dst"]] = "aff" if all(s == "inv" for s in srcs) else "other"
+        # High words of a 64-bit result only matter where a pair is read back
+        for reg in defined_registers(instr)[1:]:
+            cls[reg] = "other"
+
+    setps = [k for k in idxs if ir[k]["op"].startswith("setp") and ir[k]["dst"] == last["pred"]]
+    memory = [k for k in idxs if is_memory(ir[k])]
+    if (len(setps) != 1 or cls.get(last["pred"]) != "cmp"
+            or any(klass(ir[k]["addr"]) == "other" for k in memory)):
+        return info
+
+    info.update({
+        "summarizable": True,
+        "exit_test": {"instr_idx": setps[0], "op": ir[setps[0]]["op"], "negated": last.get("neg", False)},
+        "affine": sorted(r for r in defs if r in ivs or cls.get(r) == "aff"),
+        "varying": sorted(r for r in defs if r not in ivs and cls.get(r) != "aff"),
+        "memory": memory,
+    })
+    return info
+
+def defined_registers(instr: Dict) -> List[str]:
+    """Registers (or shared-memory symbol) an instruction writes, low register of a pair first."""
+    if instr["op"] == "decl.shared":
+        return [instr["name"]]
+    if "dst" not in instr:
+        return []
+    return [instr["dst"]] + (instr["dst_hi"].split(":") if "dst_hi" in instr else [])
+
+def _uses(instr: Dict) -> List[str]:
+    regs = [r for x in _sources(instr) if isinstance(x, str) for r in x.split(":")]
+    if instr.get("pred") is not None:
+        regs.append(instr["pred"])
+    return regs
+
+def _define(state: Dict[str, Set[int]], k: int, instr: Dict):
+    for reg in defined_registers(instr):
+        # A guarded write may not happen, so earlier definitions still reach
+        state[reg] = {k} if instr.get("pred") is None else state.get(reg, set()) | {k}
+
+def def_use_chains(ir: List[Dict], blocks: List[Dict]) -> List[Dict[str, Set[int]]]:
+    """
+    Reaching definitions per use: for every instruction, each register it
+    reads (sources and guard predicate) mapped to the instructions whose
+    definition of it can reach that point. Registers never defined in the
+    kernel (tid.x, params) map to an empty set.
+    """
+    out = [{} for _ in blocks]
+    changed = True
+    while changed:
+        changed = False
+        for b in blocks:
+            state = {}
+            for p in b["preds"]:
+                for reg, defs in out[p].items():
+                    state[reg] = state.get(reg, set()) | defs
+            for k in range(b["start"], b["end"]):
+                _define(state, k, ir[k])
+            if state != out[b["id"]]:
+                out[b["id"]] = state
+                changed = True
+
+    chains = [{} for _ in ir]
+    for b in blocks:
+        state = {}
+        for p in b["preds"]:
+            for reg, defs in out[p].items():
+                state[reg] = state.get(reg, set()) | defs
+        for k in range(b["start"], b["end"]):
+            chains[k] = {reg: set(state.get(reg, ())) for reg in _uses(ir[k])}
+            _define(state, k, ir[k])
+    return chains
+
+def backward_slice(chains: List[Dict[str, Set[int]]], roots: Iterable[int]) -> Set[int]:
+    """The roots plus every instruction they transitively read a value from."""
+    seen, stack = set(), list(roots)
+    while stack:
+        k = stack.pop()
+        if k in seen:
+            continue
+        seen.add(k)
+        for defs in chains[k].values():
+            stack.extend(defs)
+    return seen
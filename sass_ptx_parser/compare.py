@@ -0,0 +1,335 @@
+# compare.py
+#
+# Access-pattern diff between two analysis reports (JSON or NDJSON, any
+# kernel version or launch config):
+#
+#   python compare.py before.json after.json --json_out diff.json
+#
+# Both formats are read as a stream: JSON reports one member or array
+# element at a time, so no report is ever held whole. warp_stats records
+# are loaded into columns, the other record lists are skipped, each side is
+# sorted once by
+# (warp_id, instruction) and the two are merge-joined in a single pass, so
+# million-warp reports compare in seconds. Only changed, added and removed
+# (warp, instruction) pairs are written, followed by aggregate totals.
+#
+# Instructions are aligned by instr_idx, or with --align ordinal by their
+# rank among the memory instructions of each report, which survives edits
+# that shift instruction indices between kernel versions.
+
+import argparse
+import json
+import sys
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from report import ReportWriter, FORMATS
+
+ALIGN = ("index", "ordinal")
+# Record lists of a report besides warp_stats; neither format keeps them
+RECORDS = ("memory_writes", "control_flow.warps", "address_conflicts.warps", "memory_events")
+# Characters read at a time from a JSON report
+READ_SIZE = 1 << 20
+NUMBER_CHARS = "0123456789.eE+-"
+
+_decoder = json.JSONDecoder()
+
+class WarpTable:
+    """warp_stats records of one report, one array per field."""
+
+    COLUMNS = (("warp", "Q"), ("instr", "L"), ("bx", "L"), ("by", "L"), ("bz", "L"),
+               ("num_threads", "H"), ("contiguous", "B"), ("coalesced", "B"),
+               ("iterations", "Q"), ("coalesced_iterations", "Q"), ("sectors", "Q"),
+               ("lo", "Q"), ("hi", "Q"))
+    # Columns that decide whether a pair changed
+    RAW = ("num_threads", "contiguous", "coalesced", "iterations", "coalesced_iterations", "sectors", "lo", "hi")
+    # Fields reported per (warp, instruction) when they differ
+    COMPARED = ("num_threads", "contiguous", "coalesced", "iterations", "coalesced_iterations", "sectors",
+                "address_range")
+
+    def __init__(self):
+        for name, code in self.COLUMNS:
+            setattr(self, name, array(code))
+
+    def __len__(self) -> int:
+        return len(self.warp)
+
+    def append(self, r: Dict[str, Any]):
+        lo, hi = r["address_range"].split(" - ")
+        self.warp.append(r["warp_id"])
+        self.instr.append(r["instr_idx"])
+        self.bx.append(r["blockIdx.x"])
+        self.by.append(r.get("blockIdx.y", 0))
+        self.bz.append(r.get("blockIdx.z", 0))
+        self.num_threads.append(r["num_threads"])
+        self.contiguous.append(r["contiguous"])
+        self.coalesced.append(r["coalesced"])
+        self.iterations.append(r["iterations"])
+        self.coalesced_iterations.append(r["coalesced_iterations"])
+        self.sectors.append(r["sectors"])
+        self.lo.append(int(lo, 16))
+        self.hi.append(int(hi, 16))
+
+    def field(self, name: str, i: int):
+        if name == "address_range":
+            return f"0x{self.lo[i]:08x} - 0x{self.hi[i]:08x}"
+        value = getattr(self, name)[i]
+        return bool(value) if name in ("contiguous", "coalesced") else value
+
+    def aligned_instr(self, align: str) -> array:
+        if align == "index":
+            return self.instr
+        rank = {k: n for n, k in enumerate(sorted(set(self.instr)))}
+        return array("L", [rank[k] for k in self.instr])
+
+    def order(self, instr: array) -> Tuple[List[int], List[int]]:
+        """Row indices sorted by (warp, aligned instruction), and the packed key of every row."""
+        keys = [w << 32 | k for w, k in zip(self.warp, instr)]
+        return sorted(range(len(keys)), key=keys.__getitem__), keys
+
+    def rows(self) -> List[Tuple]:
+        """Compared columns as one tuple per row, so a pair is checked with a single comparison."""
+        return list(zip(*(getattr(self, name) for name in self.RAW)))
+
+    def totals(self) -> Dict[str, int]:
+        return {
+            "requests": len(self),
+            "warps": len(set(self.warp)),
+            "fully_utilized": sum(1 for t in self.num_threads if t == 32),
+            "coalesced": sum(self.coalesced),
+            "iterations": sum(self.iterations),
+            "coalesced_iterations": sum(self.coalesced_iterations),
+            "sectors": sum(self.sectors),
+        }
+
+class _JsonStream:
+    """Pull parser over a JSON file: punctuation one character, values one at a time."""
+
+    def __init__(self, f):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(READ_SIZE)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self._fill()
+
+    def take(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"malformed report: expected {char!r} at {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number cut by the end of the buffer (12 of 12.5e3) continues in the next read
+                if self.eof or end < len(self.buf) and self.buf[end] not in NUMBER_CHARS:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def _read_object(stream: _JsonStream, path: str, node: Dict[str, Any], table: "WarpTable"):
+    """Members of the object at the stream position into `node`; warp_stats go to `table`."""
+    stream.take("{")
+    if stream.peek() == "}":
+        stream.take("}")
+        return
+    while True:
+        key = stream.value()
+        stream.take(":")
+        name = f"{path}.{key}" if path else key
+        if stream.peek() == "{":
+            _read_object(stream, name, node.setdefault(key, {}), table)
+        elif stream.peek() == "[":
+            items = None if name == "warp_stats" or name in RECORDS else []
+            stream.take("[")
+            while stream.peek() != "]":
+                item = stream.value()
+                if name == "warp_stats":
+                    table.append(item)
+                elif items is not None:
+                    items.append(item)
+                if stream.peek() == ",":
+                    stream.take(",")
+            stream.take("]")
+            if items is not None:
+                node[key] = items
+        else:
+            node[key] = stream.value()
+        if stream.peek() != ",":
+            break
+        stream.take(",")
+    stream.take("}")
+
+def load_report(path: str) -> Tuple[Dict[str, Any], WarpTable]:
+    """Top-level fields and warp_stats columns of a report in either format."""
+    table = WarpTable()
+    fields: Dict[str, Any] = {}
+    with open(path) as f:
+        head = f.read(16)
+        f.seek(0)
+        if not head.startswith(('{"field"', '{"record"')):
+            _read_object(_JsonStream(f), "", fields, table)
+            return fields, table
+
+        for line in f:
+            item = json.loads(line)
+            if item.get("record") == "warp_stats":
+                table.append(item)
+            elif "field" in item:
+                # Dotted section paths become nested objects
+                *parents, name = item["field"].split(".")
+                node = fields
+                for p in parents:
+                    node = node.setdefault(p, {})
+                node[name] = item["value"]
+        return fields, table
+
+def join(a: WarpTable, b: WarpTable, align: str = "index") -> Iterator[Tuple[Optional[int], Optional[int]]]:
+    """(row in a, row in b) pairs of a sorted merge join; None marks a missing side."""
+    (oa, ka), (ob, kb) = a.order(a.aligned_instr(align)), b.order(b.aligned_instr(align))
+    i = j = 0
+    while i < len(oa) and j < len(ob):
+        x, y = oa[i], ob[j]
+        if ka[x] == kb[y]:
+            yield x, y
+            i += 1
+            j += 1
+        elif ka[x] < kb[y]:
+            yield x, None
+            i += 1
+        else:
+            yield None, y
+            j += 1
+    for x in oa[i:]:
+        yield x, None
+    for y in ob[j:]:
+        yield None, y
+
+def iter_deltas(a: WarpTable, b: WarpTable, align: str = "index", stats: Optional[Dict[str, int]] = None
+                ) -> Iterator[Dict[str, Any]]:
+    """
+    One record per (warp, instruction) that differs between the reports;
+    changed fields are [before, after]. `stats` collects per-status counts.
+    """
+    stats = stats if stats is not None else {}
+    for key in ("unchanged", "changed", "improved", "regressed", "only_before", "only_after"):
+        stats.setdefault(key, 0)
+    ra, rb = a.rows(), b.rows()
+    for x, y in join(a, b, align):
+        if x is not None and y is not None and ra[x] == rb[y]:
+            stats["unchanged"] += 1
+            continue
+        side, row = (a, x) if x is not None else (b, y)
+        record = {
+            "blockIdx.x": side.bx[row],
+            "blockIdx.y": side.by[row],
+            "blockIdx.z": side.bz[row],
+            "warp_id": side.warp[row],
+        }
+        if y is None:
+            stats["only_before"] += 1
+            yield {**record, "status": "only_before", "instr_idx": [a.instr[x], None], "sectors": [a.sectors[x], 0]}
+            continue
+        if x is None:
+            stats["only_after"] += 1
+            yield {**record, "status": "only_after", "instr_idx": [None, b.instr[y]], "sectors": [0, b.sectors[y]]}
+            continue
+
+        changed = {name: [a.field(name, x), b.field(name, y)] for name in WarpTable.COMPARED
+                   if a.field(name, x) != b.field(name, y)}
+        stats["changed"] += 1
+        if b.sectors[y] < a.sectors[x]:
+            stats["improved"] += 1
+        elif b.sectors[y] > a.sectors[x]:
+            stats["regressed"] += 1
+        yield {**record, "status": "changed", "instr_idx": [a.instr[x], b.instr[y]], **changed}
+
+def _change(before, after) -> Dict[str, Any]:
+    out = {"before": before, "after": after, "delta": None, "improvement": None}
+    if isinstance(before, (int, float)) and isinstance(after, (int, float)):
+        out["delta"] = round(after - before, 6)
+        out["improvement"] = round((before - after) / before, 4) if before else None
+    return out
+
+def summarize(fa: Dict[str, Any], fb: Dict[str, Any], a: WarpTable, b: WarpTable,
+              stats: Dict[str, int]) -> Dict[str, Any]:
+    """Aggregate before/after numbers; improvement is the relative reduction."""
+    ta, tb = a.totals(), b.totals()
+    ma, mb = fa.get("memory_summary", {}), fb.get("memory_summary", {})
+
+    def rate(t):
+        return round(t["coalesced_iterations"] / t["iterations"], 4) if t["iterations"] else None
+
+    def wavefronts(fields):
+        return sum(c["wavefronts"] for c in fields.get("shared_memory", {}).get("bank_conflicts", []))
+
+    return {
+        "warp_pairs": stats,
+        "sectors": _change(ta["sectors"], tb["sectors"]),
+        "requests": _change(ta["iterations"], tb["iterations"]),
+        "coalesced_rate": {"before": rate(ta), "after": rate(tb)},
+        "partial_warps": _change(ta["requests"] - ta["fully_utilized"], tb["requests"] - tb["fully_utilized"]),
+        "footprint_bytes": _change(ma.get("footprint_bytes"), mb.get("footprint_bytes")),
+        "used_bytes": _change(ma.get("used_bytes"), mb.get("used_bytes")),
+        "efficiency": {"before": ma.get("efficiency"), "after": mb.get("efficiency")},
+        "shared_wavefronts": _change(wavefronts(fa), wavefronts(fb)),
+        "occupancy": {"before": fa.get("occupancy", {}).get("occupancy"),
+                      "after": fb.get("occupancy", {}).get("occupancy")},
+    }
+
+def compare_reports(before: str, after: str, align: str = "index") -> Dict[str, Any]:
+    """In-memory API: deltas list plus summary for two report files."""
+    fa, a = load_report(before)
+    fb, b = load_report(after)
+    stats: Dict[str, int] = {}
+    deltas = list(iter_deltas(a, b, align, stats))
+    return {"deltas": deltas, "summary": summarize(fa, fb, a, b, stats)}
+
+def _describe(fields: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: fields.get(k) for k in ("kernel", "grid_dim", "block_dim", "detail")}
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff the access patterns of two analysis reports")
+    parser.add_argument("before", help="Report of the baseline version or launch")
+    parser.add_argument("after", help="Report to compare against it")
+    parser.add_argument("--align", choices=ALIGN, default="index", help="Match instructions by instr_idx or by their order among memory instructions (default: index)")
+    parser.add_argument("--json_out", type=str, default="diff.json", help="Output file (default: diff.json)")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="Output format (default: json)")
+    args = parser.parse_args()
+
+    fa, a = load_report(args.before)
+    fb, b = load_report(args.after)
+    for path, fields, table in ((args.before, fa, a), (args.after, fb, b)):
+        if not len(table) and "warp_summary" in fields:
+            print(f"[WARN] {path} has no warp_stats (written with --detail summary); only totals are compared")
+
+    stats: Dict[str, int] = {}
+    with open(args.json_out, "w") as f, ReportWriter(f, args.format) as out:
+        out.fields({"before": _describe(fa), "after": _describe(fb), "align": args.align})
+        out.records("warp_deltas", iter_deltas(a, b, args.align, stats))
+        summary = summarize(fa, fb, a, b, stats)
+        out.field("summary", summary)
+
+    sectors = summary["sectors"]
+    print(f"{stats['changed']} changed, {stats['only_before']} removed, {stats['only_after']} added "
+          f"(warp, instruction) pairs; sectors {sectors['before']} -> {sectors['after']}")
+    print(f"Output written to {args.json_out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,237 @@
 # evaluator.py
+#
+# Instructions are evaluated for a whole batch of threads at once. A register
+# holds either a list with one value per lane or a single uniform value shared
+# by every lane; unknown values are None and propagate through arithmetic.
+#
+# SASS 64-bit values live in register pairs. A 64-bit result keeps the whole
+# value in the low register and its high word in "dst_hi"; an operand naming a
+# pair ("r2:r3", or a quad for 128-bit data) reads the low register when the
+# high word agrees with it, and combines the two 32-bit words otherwise, so
+# pairs built from separate halves (IADD3 / IADD3.X) read correctly too.
 
-from typing import Dict, Union
+import operator
+from itertools import repeat
+from typing import Dict, List, Optional
+
+ARITH = {
+    "add": operator.add,
+    "sub": operator.sub,
+    "mul": operator.mul,
+    "shl": operator.lshift,
+    "shr": operator.rshift,
+    "and": operator.and_,
+    "or": operator.or_,
+}
+
+COMPARE = {
+    "eq": operator.eq, "ne": operator.ne,
+    "lt": operator.lt, "le": operator.le, "gt": operator.gt, "ge": operator.ge,
+    "lo": operator.lt, "ls": operator.le, "hi": operator.gt, "hs": operator.ge,
+}
+
+MASK32 = 0xffffffff
+
+def unsigned_width(op: str) -> Optional[int]:
+    """Bit width a setp compares its operands at as unsigned; None for signed and float comparisons."""
+    cmp, kind = op.split(".")[1], op.split(".")[-1]
+    if cmp in ("lo", "ls", "hi", "hs") or kind[0] in "ub":
+        return int(kind[1:]) if kind[1:].isdigit() else 32
+    return None
 
 def resolve(val, regs):
+    """Register or symbol name -> its value; literals pass through."""
     if isinstance(val, str):
-        return regs.get(val, val)
+        return _group(val, regs) if ":" in val else regs.get(val)
     return val
-    
-def evaluate_instruction(instr, regs: Dict[str, Union[int, str]]):
-    op = instr["op"]
-    #print(f"Evaluating instruction: {op} with args {instr}")
-    if op == "ld.param.u64":
-        regs[instr["dst"]] = regs[instr["src"]]
-    elif op == "cvta.to.global.u64":
-        regs[instr["dst"]] = regs[instr["src"]]
-    elif op.startswith("mov"):
-        regs[instr["dst"]] = regs[instr["src"]] if isinstance(instr["src"], str) else instr["src"]
-    elif op.startswith("mad.lo.s32"):
-        regs[instr["dst"]] = resolve(regs[instr["src1"]], regs) * resolve(regs[instr["src2"]], regs) + resolve(regs[instr["src3"]], regs)
-    elif op.startswith("mul.wide.s32"):
-        src2 = instr["src2"]
-        src2_val = regs[src2] if isinstance(src2, str) else src2
-        regs[instr["dst"]] = regs[instr["src1"]] * src2_val
-    elif op.startswith("add.s64"):
-        regs[instr["dst"]] = resolve(regs[instr["src1"]], regs) + resolve(regs[instr["src2"]], regs)
-    elif op.startswith("st.global"):
-        stored_value = regs.get(instr["val"], instr["val"])
-        address = regs[instr["addr"]]
-        return {"address": address, "value": stored_value}
-    elif op.startswith("fsel"):
-        global_thread_id = regs.get("ctaid.x", None)+ regs.get("ntid.x", 0) + regs.get("tid.x", 0)
-        input_value = regs.get("input_size", 0)
-
-        if global_thread_id == input_value:
-            return {"address": regs["out"], "written_value": "unk"}
+
+def _join(lo, hi):
+    """Value of one lane of a register pair."""
+    if hi is None or not isinstance(lo, int):
+        return lo
+    if not isinstance(hi, int):
+        return None
+    return lo if lo >> 32 == hi else (lo & MASK32) | hi << 32
+
+def _uniform_high(value, shift: int):
+    """value >> shift when it is the same int for every lane of a column, else None."""
+    try:
+        lo, hi = min(value) >> shift, max(value) >> shift
+    except (TypeError, ValueError):
+        return None
+    return lo if lo == hi else None
+
+def _word(name: str, regs):
+    """One element of a register group; immediates of a vector store are Python literals."""
+    if name in regs:
+        return regs[name]
+    for parse in (int, float):
+        try:
+            return parse(name)
+        except ValueError:
+            pass
+    return None
+
+def _group(name: str, regs):
+    """Column of a register group such as "r2:r3", lowest register first."""
+    words = [_word(r, regs) for r in name.split(":")]
+    value = words[-1]
+    for lo in reversed(words[:-1]):
+        if value is None:
+            value = lo
+        elif not isinstance(lo, list) and not isinstance(value, list):
+            value = _join(lo, value)
+        elif isinstance(lo, list) and isinstance(value, int) and _uniform_high(lo, 32) == value:
+            value = lo
         else:
-            return {"address": regs["out"], "written_value": "unk"} 
-    return None
\ No newline at end of file
+            value = [_join(a, b) for a, b in zip(lo if isinstance(lo, list) else repeat(lo),
+                                                  value if isinstance(value, list) else repeat(value))]
+    return value
+
+def _high(value, shift: int):
+    """value >> shift per lane; uniform when every lane has the same high part."""
+    if isinstance(value, list):
+        high = _uniform_high(value, shift)
+        if high is not None:
+            return high
+        return [v >> shift if isinstance(v, int) else None for v in value]
+    return value >> shift if isinstance(value, int) else None
+
+def lanes(value, active: List[int]) -> List:
+    """Per-lane values of a register (column or uniform) for the active lanes."""
+    if isinstance(value, list):
+        return [value[i] for i in active]
+    return [value] * len(active)
+
+def _safe(fn, *args):
+    try:
+        return fn(*args)
+    except TypeError:
+        return None
+
+def apply(fn, args, active: List[int], n: int):
+    """Apply fn lane-wise over the active lanes; uniform inputs stay uniform."""
+    if not any(isinstance(a, list) for a in args):
+        return _safe(fn, *args)
+    if len(active) == n:
+        cols = [a if isinstance(a, list) else repeat(a) for a in args]
+    else:
+        cols = [lanes(a, active) for a in args]
+    try:
+        return [fn(*xs) for xs in zip(*cols)]
+    except TypeError:
+        return [_safe(fn, *xs) for xs in zip(*cols)]
+
+def write(regs, dst: str, result, active: List[int], n: int):
+    """Store a result for the active lanes only."""
+    if len(active) == n:
+        regs[dst] = result
+        return
+    col = regs.get(dst)
+    if not isinstance(col, list):
+        col = [col] * n
+        regs[dst] = col
+    if isinstance(result, list):
+        for i, v in zip(active, result):
+            col[i] = v
+    else:
+        for i in active:
+            col[i] = result
+
+def _write_dst(instr, regs, result, active: List[int], n: int):
+    """Write the result of instr, and the high words of a 64-bit result to its pair."""
+    write(regs, instr["dst"], result, active, n)
+    if "dst_hi" in instr:
+        for k, reg in enumerate(instr["dst_hi"].split(":"), 1):
+            write(regs, reg, _high(result, 32 * k), active, n)
+
+def guard(instr, regs, active: List[int]) -> List[int]:
+    """Lanes of `active` whose guard predicate (@p / @!p) lets instr execute."""
+    pred = instr.get("pred")
+    if pred is None:
+        return active
+    want = not instr.get("neg", False)
+    p = regs.get(pred)
+    if not isinstance(p, list):
+        return active if bool(p) == want else []
+    return [i for i in active if bool(p[i]) == want]
+
+def _memory_access(instr, regs, active: List[int], kind: str) -> Optional[Dict]:
+    base = resolve(instr["addr"], regs)
+    offset = instr.get("offset", 0)
+    values = lanes(resolve(instr["val"], regs), active) if kind != "read" else None
+    hit, addresses, stored = [], [], []
+    for pos, (lane, addr) in enumerate(zip(active, lanes(base, active))):
+        if isinstance(addr, int):
+            hit.append(lane)
+            addresses.append(addr + offset)
+            if values is not None:
+                stored.append(values[pos])
+    if not hit:
+        return None
+    return {
+        "lanes": hit,
+        "address": addresses,
+        "value": stored if values is not None else None,
+        "space": instr["op"].split(".")[1],
+        "access_type": kind,
+        "access_size": instr.get("size", 4),
+    }
+
+def evaluate_instruction(instr, regs: Dict, active: List[int], n: int):
+    """
+    Execute instr for the active lanes (already filtered by guard()).
+    Memory instructions return a dict of per-lane addresses, others None.
+    """
+    op = instr["op"]
+    head = op.split(".")[0]
+
+    if head in ("label", "bra", "exit") or op == "decl.param":
+        return None
+    elif op == "decl.shared":
+        regs[instr["name"]] = instr["offset"]
+    elif op.startswith("ld.param") or head in ("cvta", "mov"):
+        src = resolve(instr["src"], regs)
+        _write_dst(instr, regs, lanes(src, active) if isinstance(src, list) else src, active, n)
+    elif head == "mad":
+        args = [resolve(instr[k], regs) for k in ("src1", "src2", "src3")]
+        _write_dst(instr, regs, apply(lambda a, b, c: a * b + c, args, active, n), active, n)
+    elif head in ARITH:
+        args = [resolve(instr["src1"], regs), resolve(instr["src2"], regs)]
+        _write_dst(instr, regs, apply(ARITH[head], args, active, n), active, n)
+    elif head == "carry":
+        # Carry out of the low words of src1 << shift + src2 + src3 (IADD3 / LEA with a predicate output)
+        shift = instr.get("shift", 0)
+        args = [resolve(instr.get(k, 0), regs) for k in ("src1", "src2", "src3")]
+        write(regs, instr["dst"], apply(lambda a, b, c: ((a << shift & MASK32) + (b & MASK32) + (c & MASK32)) >> 32,
+                                        args, active, n), active, n)
+    elif head == "lea":
+        # lea.hi: high word of (src3:src1) << shift, plus src2 (LEA.HI); no src3 sign-extends src1
+        shift, extend = instr["shift"], "src3" not in instr
+        args = [resolve(instr.get(k, 0), regs) for k in ("src1", "src2", "src3")]
+        write(regs, instr["dst"], apply(lambda a, b, c: (((a >> 31 if extend else c) << 32 | a & MASK32) << shift >> 32) + b,
+                                        args, active, n), active, n)
+    elif head == "setp":
+        args = [resolve(instr["src1"], regs), resolve(instr["src2"], regs)]
+        fn, width = COMPARE[op.split(".")[1]], unsigned_width(op)
+        if width is not None:
+            # Registers hold plain integers; unsigned tests see them wrapped to the type width
+            mask = (1 << width) - 1
+            fn = lambda a, b, cmp=fn: cmp(a & mask, b & mask)
+        write(regs, instr["dst"], apply(fn, args, active, n), active, n)
+    elif head == "selp":
+        args = [resolve(instr[k], regs) for k in ("src3", "src1", "src2")]
+        _write_dst(instr, regs, apply(lambda p, a, b: a if p else b, args, active, n), active, n)
+    elif head == "st":
+        return _memory_access(instr, regs, active, "write")
+    elif head == "ld":
+        access = _memory_access(instr, regs, active, "read")
+        _write_dst(instr, regs, None, active, n)
+        return access
+    elif head in ("atom", "red"):
+        # The old value an atom returns depends on the order the lanes ran in
+        access = _memory_access(instr, regs, active, "atomic")
+        if "dst" in instr:
+            _write_dst(instr, regs, None, active, n)
+        return access
+    return None
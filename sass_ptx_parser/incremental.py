@@ -0,0 +1,267 @@
+# incremental.py
+#
+# Incremental re-analysis (main.py --incremental). The IR of the previous
+# run and its per-instruction results are cached per kernel text and launch
+# configuration. A new run matches its IR against the cached one and
+# compares the backward slice (cfg.def_use_chains) of every memory
+# instruction under that matching. When neither the slice nor the slice of
+# the control flow changed, the instruction keeps its cached trace rows,
+# warp stats, byte ranges and bank conflicts; the others are re-simulated
+# with only the instructions they and the control flow depend on evaluated.
+#
+# Directories are keyed on a hash of the launch and of the kernel text, so
+# identical kernels share a cache wherever they come from (another path,
+# stdin). A kernel text seen for the first time starts from the last cache
+# of the same launch, named by <launch>.latest, and copies the files of the
+# entries it reuses into its own directory.
+#
+# Cache layout, one directory per (launch, kernel text):
+#   index.json      IR, launch and one entry per memory instruction
+#   warp_exec.json  warp execution stats and loop info of the last run
+#   <id>.<n>.trace  trace rows of an instruction (spill.write_chunk)
+#   <id>.warps      its warp_stats records, one JSON object per line
+#   <id>.ranges     its merged global byte ranges (spill.write_ranges)
+#
+# Reports are the same as a full run except that memory_writes are grouped
+# by instruction. Reused entries whose instruction moved (an edit above it)
+# have the instruction index in their trace files rewritten.
+
+import difflib
+import hashlib
+import heapq
+import json
+import os
+import shutil
+from array import array
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+import profiling
+from cfg import build_cfg, def_use_chains, backward_slice, is_memory
+from simulator import simulate_launch, iter_warp_usage
+from spill import SpilledTrace, RangeFile, write_chunk, read_chunk, write_ranges, merge_range_files
+from utils import analyze_bank_conflicts, strided_ranges, merge_ranges
+
+CACHE_VERSION = 3
+# Files the cache writes next to index.json and warp_exec.json; only these are cleaned up
+CACHE_SUFFIXES = (".trace", ".warps", ".ranges", ".tmp")
+# Read buffers for the range merge when no --memory-budget is given
+MERGE_BUDGET = 64 << 20
+
+def match_ir(old: List[Dict], new: List[Dict]) -> List[Optional[int]]:
+    """Old index of every new instruction; None for inserted or edited ones."""
+    keys = [json.dumps(i, sort_keys=True) for i in old], [json.dumps(i, sort_keys=True) for i in new]
+    old_of = [None] * len(new)
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, *keys, autojunk=False).get_opcodes():
+        if tag == "equal":
+            old_of[j1:j2] = range(i1, i2)
+    return old_of
+
+def _control_roots(ir: List[Dict]) -> List[int]:
+    return [k for k, i in enumerate(ir) if i["op"] in ("label", "bra", "exit")]
+
+def _guard_defs(ir: List[Dict], chains) -> List[int]:
+    """Definitions of every guard predicate; they decide which lanes count as executing."""
+    return [d for k, i in enumerate(ir) if i.get("pred") is not None for d in chains[k][i["pred"]]]
+
+def _load(directory: str, launch: Dict) -> Optional[Dict]:
+    try:
+        with open(os.path.join(directory, "index.json")) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != CACHE_VERSION or index.get("launch") != launch:
+        return None
+    return index
+
+def _store(directory: str, index: Dict, warp_exec, loops):
+    for name, data in (("warp_exec.json", {"warp_exec": warp_exec, "loops": loops}), ("index.json", index)):
+        tmp = os.path.join(directory, name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(directory, name))
+
+    keep = {"index.json", "warp_exec.json"}
+    for entry in index["entries"].values():
+        keep.update(_entry_files(entry))
+    for name in os.listdir(directory):
+        if name.endswith(CACHE_SUFFIXES) and name not in keep:
+            os.unlink(os.path.join(directory, name))
+
+def _entry_files(entry: Dict) -> List[str]:
+    return [f["path"] for f in entry["files"]] + [entry[k] for k in ("warps", "ranges") if entry.get(k)]
+
+def _hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def _renumber(directory: str, entry: Dict, k: int, op: str):
+    """Point a reused entry, and the instr column of its trace files, at instruction k."""
+    for f in entry["files"]:
+        path = os.path.join(directory, f["path"])
+        with read_chunk(path) as part:
+            part = part.take(range(len(part)))
+        part.instr = array("L", [k]) * len(part)
+        part.ops = {k: op}
+        write_chunk(part, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    entry["instr_idx"] = k
+
+def _counts(pairs) -> Dict:
+    return {(s, k): n for s, k, n in pairs}
+
+def _analyze_instr(directory: str, entry: Dict, ir: List[Dict], k: int, grid_dim, block_dim,
+                   base_address) -> Dict:
+    """Per-instruction results for a freshly simulated instruction `k`."""
+    trace = SpilledTrace(grid_dim, block_dim, base_address)
+    for f in entry["files"]:
+        trace.attach(os.path.join(directory, f["path"]), _counts(f["rows"]), _counts(f["accesses"]), {k: ir[k]["op"]})
+    space = ir[k]["op"].split(".")[1]
+    if space == "global":
+        entry["warps"] = f"{entry['id']}.warps"
+        with open(os.path.join(directory, entry["warps"]), "w") as f:
+            for record in iter_warp_usage(trace):
+                f.write(json.dumps(record) + "\n")
+        entry["ranges"] = f"{entry['id']}.ranges"
+        write_ranges(merge_ranges(r for part in trace.chunks() for r in strided_ranges(part)),
+                     os.path.join(directory, entry["ranges"]))
+    elif space == "shared":
+        conflicts = analyze_bank_conflicts(trace)
+        entry["bank_conflicts"] = conflicts[0] if conflicts else None
+    return entry
+
+def reanalyze(ir: List[Dict], kernel_text: str, grid_dim, block_dim, base_address: int,
+              summarize_loops: bool = True, cache_dir: str = ".ptx_cache",
+              memory_budget: Optional[int] = None, params: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    """
+    Analyze `ir` reusing the cached results of the previous run of the same
+    launch: of this kernel text when there is one, else of the last kernel
+    run with it. Returns the trace (per-instruction chunks), warp
+    execution stats, loop info, warp_stats records, merged byte ranges, bank
+    conflicts and a summary of what was reused.
+    """
+    launch = {"grid": list(grid_dim), "block": list(block_dim), "base": base_address,
+              "summarize_loops": summarize_loops, "params": params}
+    launch_key = _hash(json.dumps(launch, sort_keys=True).encode())
+    directory = os.path.join(cache_dir, f"{launch_key}-{_hash(kernel_text.encode())}")
+    latest = os.path.join(cache_dir, launch_key + ".latest")
+    os.makedirs(directory, exist_ok=True)
+    origin = directory
+    index = _load(directory, launch)
+    if index is None:
+        try:
+            with open(latest) as f:
+                origin = os.path.join(cache_dir, f.read().strip())
+        except OSError:
+            pass
+        index = _load(origin, launch) if origin != directory else None
+
+    chains = def_use_chains(ir, build_cfg(ir))
+    memory = [k for k, i in enumerate(ir) if is_memory(i)]
+    reused: Dict[int, Dict] = {}
+    old_of = [None] * len(ir)
+    if index is not None:
+        old_ir = index["ir"]
+        old_chains = def_use_chains(old_ir, build_cfg(old_ir))
+        old_of = match_ir(old_ir, ir)
+
+        def same(new_slice, old_slice):
+            mapped = {old_of[x] for x in new_slice}
+            return None not in mapped and mapped == old_slice
+
+        if same(backward_slice(chains, _control_roots(ir)), backward_slice(old_chains, _control_roots(old_ir))):
+            for k in memory:
+                entry = index["entries"].get(str(old_of[k])) if old_of[k] is not None else None
+                if entry is not None and same(backward_slice(chains, [k]), backward_slice(old_chains, [old_of[k]])):
+                    reused[k] = entry
+    for k, entry in reused.items():
+        if origin != directory:
+            for name in _entry_files(entry):
+                shutil.copyfile(os.path.join(origin, name), os.path.join(directory, name))
+        if entry["instr_idx"] != k:
+            _renumber(directory, entry, k, ir[k]["op"])
+    stale = [k for k in memory if k not in reused]
+    identical = (index is not None and not stale and len(index["ir"]) == len(ir)
+                 and old_of == list(range(len(ir))))
+
+    evaluated = None
+    if identical:
+        with open(os.path.join(origin, "warp_exec.json")) as f:
+            cached = json.load(f)
+        warp_exec, loops = cached["warp_exec"], cached["loops"]
+    else:
+        evaluated = backward_slice(chains, _control_roots(ir) + _guard_defs(ir, chains) + stale)
+        trace, warp_exec, loops = simulate_launch(ir, grid_dim, block_dim, base_address, summarize_loops,
+                                                  memory_budget=memory_budget, evaluate=evaluated,
+                                                  traced=set(stale), params=params)
+
+    next_id = index["next_id"] if index is not None else 0
+    entries = {}
+    fresh = {}
+    for k in stale:
+        fresh[k] = {"id": next_id, "instr_idx": k, "files": []}
+        next_id += 1
+    if stale:
+        for n, part in enumerate(trace.chunks()):
+            rows = defaultdict(list)
+            for i, k in enumerate(part.instr):
+                rows[k].append(i)
+            for k, idx in rows.items():
+                entry = fresh[k]
+                path = f"{entry['id']}.{n}.trace"
+                counts = write_chunk(part.take(idx), os.path.join(directory, path))
+                entry["files"].append({"path": path, **{name: [[s, kind, c] for (s, kind), c in counter.items()]
+                                                        for name, counter in zip(("rows", "accesses"), counts)}})
+    for k in memory:
+        if k in reused:
+            entries[str(k)] = reused[k]
+        else:
+            entries[str(k)] = _analyze_instr(directory, fresh[k], ir, k, grid_dim, block_dim, base_address)
+
+    _store(directory, {"version": CACHE_VERSION, "launch": launch, "ir": ir, "entries": entries,
+                       "next_id": next_id}, warp_exec, loops)
+    with open(latest + ".tmp", "w") as f:
+        f.write(os.path.basename(directory))
+    os.replace(latest + ".tmp", latest)
+    profiling.count("incremental_reused", len(reused))
+    profiling.count("incremental_resimulated", len(stale))
+
+    trace = SpilledTrace(grid_dim, block_dim, base_address)
+    ranges, conflicts = [], []
+    for k in memory:
+        entry = entries[str(k)]
+        ops = {entry["instr_idx"]: ir[k]["op"]}
+        for f in entry["files"]:
+            trace.attach(os.path.join(directory, f["path"]), _counts(f["rows"]), _counts(f["accesses"]), ops)
+        if entry.get("ranges"):
+            ranges.append(os.path.join(directory, entry["ranges"]))
+        if entry.get("bank_conflicts"):
+            conflicts.append({**entry["bank_conflicts"], "instr_idx": k})
+    merged = trace.store.new(".ranges")
+    merge_range_files(ranges, merged, memory_budget or MERGE_BUDGET)
+
+    return {
+        "trace": trace,
+        "warp_exec": warp_exec,
+        "loops": loops,
+        "warp_stats": _warp_stats(directory, [(k, entries[str(k)]) for k in memory]),
+        "ranges": RangeFile(merged),
+        "bank_conflicts": conflicts,
+        "summary": {
+            "cache": directory,
+            "cached_ir": index is not None,
+            "changed_instructions": sum(1 for o in old_of if o is None) if index is not None else len(ir),
+            "memory_instructions": len(memory),
+            "reused": len(reused),
+            "resimulated": stale,
+            "evaluated_instructions": len(evaluated) if evaluated is not None else 0,
+        },
+    }
+
+def _warp_records(directory: str, entry: Dict, k: int) -> Iterator[Dict[str, Any]]:
+    with open(os.path.join(directory, entry["warps"])) as f:
+        for line in f:
+            yield {**json.loads(line), "instr_idx": k}
+
+def _warp_stats(directory: str, entries) -> Iterator[Dict[str, Any]]:
+    """Cached warp_stats of every instruction, merged into the (warp, instruction) order of a full run."""
+    return heapq.merge(*(_warp_records(directory, entry, k) for k, entry in entries if entry.get("warps")),
+                       key=lambda r: (r["warp_id"], r["instr_idx"]))
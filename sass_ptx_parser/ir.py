@@ -1,7 +1,9 @@
 # ir.py
 
 WRITE_KERNEL_IR = [
-    {"op": "ld.param.u64", "dst": "rd1", "src": "out"},
+    {"op": "decl.param", "kernel": "_Z5writePf", "name": "param_0", "type": "u64", "size": 8, "align": 8,
+     "offset": 0, "pointer": True},
+    {"op": "ld.param.u64", "dst": "rd1", "src": "param_0"},
     {"op": "cvta.to.global.u64", "dst": "rd2", "src": "rd1"},
     {"op": "mov.u32", "dst": "r1", "src": "ctaid.x"},
     {"op": "mov.u32", "dst": "r2", "src": "ntid.x"},
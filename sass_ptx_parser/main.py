@@ -5,110 +5,255 @@ import tempfile
 import argparse
 import json
 import os 
+from collections import Counter
+from contextlib import nullcontext
 from parser import parse_ptx_to_ir, parse_sass_to_ir
-from simulator import simulate_launch, analyze_warp_usage
-from utils import coalesce_addresses, analyze_stride, estimate_footprint
+from simulator import simulate_launch, iter_warp_usage, summarize_warp_execution
+from utils import (strided_ranges, format_ranges, stride_from_ranges,
+                   analyze_bank_conflicts, analyze_address_conflicts, buffer_usage,
+                   memory_instructions)
 from symbolic_evaluator import evaluate_symbolic
+from cfg import build_cfg, summarize_cfg, unresolved_targets
+from access_trace import dim3
+from sampling import sample_launch, apply_estimates
+from trace_io import write_trace
+from spill import SpilledTrace, parse_size, spilled_ranges
+from incremental import reanalyze
+from params import parse_param_arg, assign_buffers, describe_params, load_signatures, store_signatures
+from roofline import tally_sectors, estimate
+from occupancy import (DEVICES, device_limits, target_arch, registers_per_thread, declared_shared,
+                       shared_high_water, launch_occupancy, PTX_REGISTERS)
+from profiling import Profiler, phase, count
+from report import (ReportWriter, FORMATS, DETAILS, iter_memory_writes, summarize_memory_writes,
+                    summarize_warp_usage, warp_execution_histograms)
 
 def main():
     parser = argparse.ArgumentParser(description="Symbolic PTX memory analyzer")
     parser.add_argument("ptx_file", help="Path to the .ptx file to analyze")
-    parser.add_argument("--grid", type=int, default=4, help="Grid dimension (default: 4)")
-    parser.add_argument("--block", type=int, default=128, help="Block dimension (default: 128)")
-    parser.add_argument("--base", type=lambda x: int(x, 0), default=0x1000, help="Base address (hex or int, default: 0x1000)")
+    parser.add_argument("--grid", type=dim3, default=(4, 1, 1), help="Grid dimension: X, X,Y or XxYxZ (default: 4)")
+    parser.add_argument("--block", type=dim3, default=(128, 1, 1), help="Block dimension: X, X,Y or XxYxZ (default: 128)")
+    parser.add_argument("--base", type=lambda x: int(x, 0), default=0x1000, help="Base address of the first buffer (hex or int, default: 0x1000)")
+    parser.add_argument("--param", type=parse_param_arg, action="append", default=[], metavar="N=VALUE[:SIZE]",
+                        help="Kernel parameter N: base address and buffer size (e.g. 1=0x20000000:64M) for pointers, the value for scalars; repeatable")
+    parser.add_argument("--arch", type=str, default=None, help="Target architecture (e.g. sm_90) for SASS dumps without a 'code for sm_XX' header")
+    parser.add_argument("--device", choices=DEVICES, default=None, help="Device preset for the occupancy limits and SM count (default: the first preset of the kernel's architecture)")
+    parser.add_argument("--registers", type=int, default=None, metavar="N", help="Registers per thread for the occupancy estimate, e.g. from ptxas -v (default: derived from the kernel)")
+    parser.add_argument("--dynamic-shared", type=parse_size, default=0, metavar="SIZE", help="Dynamic shared memory per block added to the static size (e.g. 16K)")
+    parser.add_argument("--bandwidth", type=float, default=None, metavar="GB/S", help="DRAM bandwidth for the roofline estimate (default: from --device)")
+    parser.add_argument("--clock", type=float, default=None, metavar="GHZ", help="SM clock for the roofline estimate (default: from --device)")
+    parser.add_argument("--sms", type=int, default=None, metavar="N", help="SM count for the occupancy waves and roofline estimate (default: from --device)")
+    parser.add_argument("--no-loop-summary", action="store_true", help="Execute every loop iteration instead of summarizing affine loops")
+    parser.add_argument("--sample", type=float, default=None, metavar="FRACTION", help="Simulate a stratified sample of about FRACTION of the blocks and extrapolate")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for --sample (default: 0)")
+    parser.add_argument("--memory-budget", type=parse_size, default=None, metavar="SIZE", help="Spill the trace to temporary files once it outgrows SIZE (e.g. 512M, 4G); results are unchanged")
+    parser.add_argument("--incremental", action="store_true", help="Reuse the cached results of memory instructions whose address computation did not change since the last run")
+    parser.add_argument("--cache_dir", type=str, default=".ptx_cache", help="Cache directory for kernel signatures and --incremental (default: .ptx_cache)")
+    parser.add_argument("--top_addresses", type=int, default=10, metavar="N", help="Most contended addresses listed per instruction and grid-wide (default: 10)")
+    parser.add_argument("--trace_out", type=str, default=None, help="Also write the raw access trace in binary form (see trace_io.py)")
     parser.add_argument("--json_out", type=str, default="output.json", help="Output JSON file (default: output.json)")
+    parser.add_argument("--format", choices=FORMATS, default="json", help="Report format: compact JSON or NDJSON, one record per line (default: json)")
+    parser.add_argument("--profile", action="store_true", help="Record wall time and counters per phase into the report")
+    parser.add_argument("--profile-memory", action="store_true", help="With --profile, also record peak traced memory per phase; tracemalloc slows the run, so wall times are inflated")
+    parser.add_argument("--detail", choices=DETAILS, default="threads", help="summary: histograms only; warps: per-warp records; threads: also per-thread writes (default: threads)")
     args = parser.parse_args()
+    if args.incremental and args.sample is not None:
+        parser.error("--incremental cannot be combined with --sample")
+
+    profiler = Profiler(memory=args.profile_memory) if args.profile or args.profile_memory else None
+    with profiler or nullcontext():
+        analyze(args, profiler)
+
+def analyze(args, profiler=None):
     
-    if args.ptx_file == "-":
-        ptx_code = sys.stdin.read()
-        tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".sass")
-        tmp.write(ptx_code.encode())
-        tmp.close()
-        args.ptx_file = tmp.name      
-        print(f"[INFO] read kernel text from stdin into {tmp.name}")
-    else:
-        with open(args.ptx_file, "r") as f:
-            ptx_code = f.read()
-
-    if args.ptx_file.endswith(".ptx"):
-        ir = parse_ptx_to_ir(ptx_code)
-    else: 
-        ir = parse_sass_to_ir(ptx_code)
-
-    addresses = simulate_launch(ir, args.grid, args.block, args.base)
-    accessess = addresses.copy()
-    memory_writes = []
-
-    print(f"DEBUG: Total accesses: {len(accessess)}")
-    print(f"DEBUG: Sample access: {accessess[1234] if accessess else 'None'}")
-
-    for access in accessess:
-        if (isinstance(access, dict)) and "address" in access and "written_value" in access and access["written_value"] != "unk" and access["written_value"] is not None:
-            memory_writes.append({
-                "address": access["address"],
-                "written_value": access["written_value"],
-                "thread_id": access["globalIdx"],
-                "memory_offset": access.get("memory_offset", None)
+    with phase("read"):
+        if args.ptx_file == "-":
+            ptx_code = sys.stdin.read()
+            tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".sass")
+            tmp.write(ptx_code.encode())
+            tmp.close()
+            args.ptx_file = tmp.name      
+            print(f"[INFO] read kernel text from stdin into {tmp.name}")
+        else:
+            with open(args.ptx_file, "r") as f:
+                ptx_code = f.read()
+
+    unsupported = Counter()
+    with phase("parse"):
+        if args.ptx_file.endswith(".ptx"):
+            ir = parse_ptx_to_ir(ptx_code)
+            # SASS dumps of the same kernels take their parameter layout from here
+            store_signatures(args.cache_dir, ir)
+        else: 
+            ir = parse_sass_to_ir(ptx_code, load_signatures(args.cache_dir), args.arch, unsupported)
+        count("ir_instructions", len(ir))
+        count("unsupported_instructions", sum(unsupported.values()))
+    if unsupported:
+        print(f"[WARN] {sum(unsupported.values())} SASS instructions not modelled: "
+              + ", ".join(f"{op} x{n}" for op, n in unsupported.most_common()))
+    for target in unresolved_targets(ir):
+        print(f"[WARN] branch to unknown label {target}; its lanes are treated as exiting")
+    try:
+        params = assign_buffers(ir, args.base, {name: (value, size) for name, value, size in args.param})
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+
+    sampling = incremental = None
+    with phase("simulate"):
+        if args.incremental:
+            incremental = reanalyze(ir, ptx_code, args.grid, args.block, args.base,
+                                    not args.no_loop_summary, args.cache_dir, args.memory_budget, params)
+            trace, warp_exec, loops = incremental["trace"], incremental["warp_exec"], incremental["loops"]
+        elif args.sample is not None:
+            trace, warp_exec, loops, sampling = sample_launch(ir, args.grid, args.block, args.base, args.sample,
+                                                              args.seed, summarize_loops=not args.no_loop_summary,
+                                                              params=params, memory_budget=args.memory_budget)
+        else:
+            trace, warp_exec, loops = simulate_launch(ir, args.grid, args.block, args.base,
+                                                      summarize_loops=not args.no_loop_summary,
+                                                      memory_budget=args.memory_budget, params=params)
+    if isinstance(trace, SpilledTrace):
+        print(f"[INFO] trace exceeded the memory budget; {len(trace.files)} chunks spilled to {trace.directory}")
+    if args.trace_out:
+        with phase("trace_export"):
+            write_trace(trace, args.trace_out)
+        print(f"Trace written to {args.trace_out}")
+
+    shared_accesses = trace.select(space="shared")
+    accessess = trace.select(space="global")
+
+    count("global_accesses", accessess.num_accesses)
+
+    with phase("ranges"):
+        if incremental is not None:
+            byte_ranges = incremental["ranges"]
+        elif isinstance(accessess, SpilledTrace):
+            byte_ranges = spilled_ranges(accessess, args.memory_budget)
+        else:
+            byte_ranges = strided_ranges(accessess)
+        # Widths of the global memory instructions; the store moving the most
+        # bytes (address_expr follows the store) sets the unit stride
+        instructions = memory_instructions(accessess)
+        main_access = max(instructions, key=lambda i: (i["access_type"] == "write", i["bytes"]), default=None)
+        access_size = main_access["access_size"] if main_access else 4
+        # Footprint and stride per buffer, so the gaps between allocations do not count
+        buffers, footprint_info = buffer_usage(byte_ranges, params, access_size)
+        unattributed = footprint_info.pop("unattributed_bytes")
+        if sampling is not None:
+            buffers, footprint_info = apply_estimates(buffers, footprint_info, sampling)
+        ranges = format_ranges(byte_ranges, access_size)
+        # The summary stride is that of the buffer moving the most bytes
+        dominant = max(buffers, key=lambda b: b["used_bytes"], default=None)
+        if dominant is not None and dominant["used_bytes"]:
+            stride_info = {"stride": dominant["stride"], "pattern": dominant["pattern"],
+                           "density": dominant["density"], "stride_buffer": dominant["name"]}
+        else:
+            stride_info = {**stride_from_ranges(byte_ranges, access_size), "stride_buffer": None}
+
+    with phase("symbolic"):
+        symbolic_expr = evaluate_symbolic(ir)
+    with phase("bank_conflicts"):
+        if incremental is not None:
+            bank_conflicts = incremental["bank_conflicts"]
+        else:
+            bank_conflicts = analyze_bank_conflicts(shared_accesses)
+    with phase("address_conflicts"):
+        address_conflicts = analyze_address_conflicts(accessess, args.top_addresses)
+    with phase("occupancy"):
+        is_ptx = args.ptx_file.endswith(".ptx")
+        registers = args.registers if args.registers is not None else registers_per_thread(ptx_code, is_ptx)
+        # SASS dumps carry no shared declarations; the simulated accesses bound them from below
+        shared = max(declared_shared(ir), shared_high_water(shared_accesses)) + args.dynamic_shared
+        device = device_limits(args.device, args.arch or target_arch(ptx_code))
+        for key, value in (("bandwidth_gbs", args.bandwidth), ("clock_ghz", args.clock), ("sm_count", args.sms)):
+            if value is not None:
+                device[key] = value
+        occupancy = launch_occupancy(trace.grid_dim, trace.block_dim, registers, shared, device,
+                                     "--registers" if args.registers is not None else PTX_REGISTERS if is_ptx else "sass")
+    for flag in occupancy["flags"]:
+        print(f"[WARN] launch config: {flag['message']}")
+
+    if not args.json_out:
+        if profiler is not None:
+            print(json.dumps(profiler.report(), indent=4))
+        return
+
+    # warp_stats and memory_writes are computed while they are written, so
+    # their analysis time is part of this phase
+    with open(args.json_out, "w") as f, ReportWriter(f, args.format) as out:
+        with phase("serialize"):
+            out.fields({
+                "kernel": os.path.basename(args.ptx_file).split(".")[0],
+                "grid_dim_x": args.grid[0],
+                "block_dim_x": args.block[0],
+                "grid_dim": list(args.grid),
+                "block_dim": list(args.block),
+                "base_address": hex(args.base),
+                "num_threads": trace.grid_dim * trace.block_dim,
+                "num_warps": trace.grid_dim * trace.warps_per_block,
+                "detail": args.detail,
             })
+            out.field("parameters", describe_params(ir, params))
+            if unsupported:
+                out.field("unsupported_instructions", dict(unsupported.most_common()))
+            if sampling is not None:
+                out.field("sampling", sampling)
+            if incremental is not None:
+                out.field("incremental", incremental["summary"])
+            out.field("occupancy", occupancy)
+
+            # Per-warp and per-thread sections collapse into histograms below
+            # the requested detail level
+            warp_stats = incremental["warp_stats"] if incremental is not None else iter_warp_usage(accessess)
+            # Sectors per instruction for the roofline estimate, counted as the records go out
+            sectors = Counter()
+            warp_stats = tally_sectors(warp_stats, sectors)
+            if args.detail == "summary":
+                out.field("warp_summary", summarize_warp_usage(warp_stats))
+            else:
+                out.records("warp_stats", warp_stats)
+            if args.detail == "threads":
+                out.records("memory_writes", iter_memory_writes(accessess, args.base, params))
+            else:
+                out.field("memory_writes_summary", summarize_memory_writes(iter_memory_writes(accessess, args.base, params)))
+
+            execution = summarize_warp_execution(warp_exec)
+            with out.section("control_flow"):
+                out.fields(summarize_cfg(ir, build_cfg(ir)))
+                out.field("warp_execution", execution)
+                if args.detail == "summary":
+                    out.field("warps_histogram", warp_execution_histograms(warp_exec))
+                else:
+                    out.records("warps", warp_exec)
+                out.field("loops", loops)
 
-    addresses = [a["address"] for a in addresses]
-    footprint_info = estimate_footprint(addresses)
-    ranges = coalesce_addresses(addresses)
-    stride_info = analyze_stride(addresses)
-    #print("First 10 addresses:")
-    #for addr in addresses[:10]:
-        #print(f"0x{addr:x}")
-
-    symbolic_expr = evaluate_symbolic(ir)
-
-    warp_stats = analyze_warp_usage(accessess)
-    #print("Warp Usage:")
-    #for stat in warp_stats:
-        #print(stat)
-
-    #print("Memory Events:")
-    #for r in ranges:
-    #    event = {
-    #        "instruction": "st.global.u32",
-    #        "access_type": "write",
-    #        "access_size": 4,
-    #        "address_range": r["address_range"],
-    #        "coalesced": r["coalesced"],
-    #        "address_expr": symbolic_expr,
-    #        **stride_info,
-    #        **footprint_info
-    #    }
-        #print(event)
-
-    ouput = {
-        "kernel": os.path.basename(args.ptx_file).split(".")[0],
-        "grid_dim_x": args.grid,
-        "block_dim_x": args.block,
-        "base_address": hex(args.base),
-        "num_threads": args.grid * args.block,
-        "num_warps": (args.grid * args.block) // 32,
-        "warp_stats": warp_stats,
-        "memory_writes": memory_writes,
-        "memory_events": [
-            {
-                "instruction": "st.global.u32",
-                "access_type": "write",
-                "access_size": 4,
-                "address_range": r["address_range"],
-                "coalesced": r["coalesced"],
+            out.field("shared_memory", {
+                "num_accesses": shared_accesses.num_accesses,
+                "bank_conflicts": bank_conflicts,
+            })
+            with out.section("address_conflicts"):
+                conflicted_warps = address_conflicts.pop("warps")
+                out.fields(address_conflicts)
+                if args.detail != "summary":
+                    out.records("warps", conflicted_warps)
+            out.field("memory_summary", {
+                "instruction": main_access["instruction"] if main_access else None,
+                "access_type": main_access["access_type"] if main_access else None,
+                "access_size": access_size,
                 "address_expr": symbolic_expr,
                 **stride_info,
-                **footprint_info
-            }
-            for r in ranges
-        ]
-    }
+                **footprint_info,
+                "instructions": instructions,
+            })
+            out.field("buffers", {"buffers": buffers, "unattributed_bytes": unattributed})
+            out.field("roofline", estimate(instructions, sectors, execution, trace.grid_dim,
+                                           trace.grid_dim * trace.warps_per_block, device,
+                                           sampling["estimates"] if sampling is not None else None))
+            out.records("memory_events", ranges)
+
+        if profiler is not None:
+            out.field("profile", profiler.report())
 
-    if args.json_out:
-        with open(args.json_out, "w") as f:
-            json.dump(ouput, f, indent=4)
-        print(f"Output written to {args.json_out}")
+    print(f"Output written to {args.json_out}")
 
 if __name__ == "__main__":
-    print("TEST")
     main()
\ No newline at end of file
@@ -0,0 +1,219 @@
+# occupancy.py
+#
+# Achievable occupancy of a launch, as the CUDA occupancy calculator works it
+# out: the blocks that fit on one SM are limited by the resident warp and
+# block slots, by the register file (allocated per warp in units of 256
+# registers) and by shared memory (allocated per block in units of 128 or
+# 256 bytes, plus 1 KB the driver reserves per block from sm_80 on).
+#
+# Registers per thread come from the kernel text: one past the highest R<n>
+# of a SASS dump, or the virtual registers a PTX file declares with .reg
+# (%r<12> is twelve 32-bit registers, %rd<5> five 64-bit pairs). PTX counts
+# are an upper bound, ptxas usually allocates fewer: they are clamped to the
+# per-thread maximum, the report marks them approximate, and a block they
+# leave no room for is flagged register_bound instead of cannot_launch,
+# since ptxas would spill rather than fail. Shared memory per block
+# is what the decl.shared entries of the IR add up to, or for SASS the
+# highest shared byte the simulation touched.
+
+import re
+from typing import Any, Dict, List, Optional
+from access_trace import AccessTrace
+from params import sm_version, DEFAULT_ARCH
+
+# (first SM version, per-SM limits); later architectures override earlier ones
+ARCH_LIMITS = [
+    (50, {"max_warps": 64, "max_blocks": 32, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 65536,
+          "max_shared_per_block": 49152, "shared_unit": 256, "reserved_shared": 0}),
+    (70, {"max_warps": 64, "max_blocks": 32, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 98304,
+          "max_shared_per_block": 98304, "shared_unit": 256, "reserved_shared": 0}),
+    (75, {"max_warps": 32, "max_blocks": 16, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 65536,
+          "max_shared_per_block": 65536, "shared_unit": 256, "reserved_shared": 0}),
+    (80, {"max_warps": 64, "max_blocks": 32, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 167936,
+          "max_shared_per_block": 166912, "shared_unit": 128, "reserved_shared": 1024}),
+    (86, {"max_warps": 48, "max_blocks": 16, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 102400,
+          "max_shared_per_block": 101376, "shared_unit": 128, "reserved_shared": 1024}),
+    (89, {"max_warps": 48, "max_blocks": 24, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 102400,
+          "max_shared_per_block": 101376, "shared_unit": 128, "reserved_shared": 1024}),
+    (90, {"max_warps": 64, "max_blocks": 32, "max_threads_per_block": 1024, "registers": 65536,
+          "max_registers_per_thread": 255, "register_unit": 256, "shared": 233472,
+          "max_shared_per_block": 232448, "shared_unit": 128, "reserved_shared": 1024}),
+    (120, {"max_warps": 48, "max_blocks": 24, "max_threads_per_block": 1024, "registers": 65536,
+           "max_registers_per_thread": 255, "register_unit": 256, "shared": 102400,
+           "max_shared_per_block": 101376, "shared_unit": 128, "reserved_shared": 1024}),
+]
+
+# Device presets for --device: SM count, DRAM bandwidth (GB/s) and boost clock (GHz)
+DEVICES = {
+    "v100": {"arch": "sm_70", "sm_count": 80, "bandwidth_gbs": 900, "clock_ghz": 1.53},
+    "t4": {"arch": "sm_75", "sm_count": 40, "bandwidth_gbs": 320, "clock_ghz": 1.59},
+    "a100": {"arch": "sm_80", "sm_count": 108, "bandwidth_gbs": 1555, "clock_ghz": 1.41},
+    "rtx3090": {"arch": "sm_86", "sm_count": 82, "bandwidth_gbs": 936, "clock_ghz": 1.695},
+    "a10": {"arch": "sm_86", "sm_count": 72, "bandwidth_gbs": 600, "clock_ghz": 1.695},
+    "l4": {"arch": "sm_89", "sm_count": 58, "bandwidth_gbs": 300, "clock_ghz": 2.04},
+    "rtx4090": {"arch": "sm_89", "sm_count": 128, "bandwidth_gbs": 1008, "clock_ghz": 2.52},
+    "h100": {"arch": "sm_90", "sm_count": 132, "bandwidth_gbs": 3350, "clock_ghz": 1.98},
+}
+
+# register_source of a count summed from the PTX .reg declarations
+PTX_REGISTERS = "ptx .reg"
+
+# Occupancy below this is flagged
+LOW_OCCUPANCY = 0.5
+
+# Bytes per PTX register class; predicates do not take general registers
+REG_BYTES = {"pred": 0, "b8": 4, "u8": 4, "s8": 4, "b16": 4, "u16": 4, "s16": 4, "f16": 4, "f16x2": 4,
+             "bf16": 4, "bf16x2": 4, "b32": 4, "u32": 4, "s32": 4, "f32": 4,
+             "b64": 8, "u64": 8, "s64": 8, "f64": 8, "b128": 16}
+
+def target_arch(code: str) -> Optional[str]:
+    """sm_XX of a PTX .target or a SASS 'code for sm_XX' header."""
+    m = re.search(r'(?:\.target\s+|code for\s+)(sm_\d+)', code)
+    return m.group(1) if m else None
+
+def device_limits(device: Optional[str] = None, arch: Optional[str] = None) -> Dict[str, Any]:
+    """Per-SM limits of a --device preset, or of an architecture (then its first preset gives the SM count, bandwidth and clock)."""
+    if device is not None:
+        if device not in DEVICES:
+            raise ValueError(f"unknown device {device!r} (known: {', '.join(DEVICES)})")
+        arch = DEVICES[device]["arch"]
+    arch = arch or DEFAULT_ARCH
+    version = sm_version(arch)
+    limits = ARCH_LIMITS[0][1]
+    for since, entry in ARCH_LIMITS:
+        if version >= since:
+            limits = entry
+    if device is None:
+        device = next((name for name, d in DEVICES.items() if d["arch"] == arch), None)
+    preset = DEVICES[device] if device is not None else {}
+    return {"device": device, "arch": arch, "sm_count": preset.get("sm_count"),
+            "bandwidth_gbs": preset.get("bandwidth_gbs"), "clock_ghz": preset.get("clock_ghz"), **limits}
+
+def sass_registers(code: str) -> int:
+    """One past the highest R<n> a SASS dump uses (RZ is not allocated)."""
+    highest = -1
+    for line in code.splitlines():
+        if re.search(r'code for|Function\s*:', line):
+            continue
+        line = re.sub(r'/\*.*?\*/', "", line)
+        for m in re.finditer(r'\bR(\d+)\b', line):
+            highest = max(highest, int(m.group(1)))
+    return highest + 1
+
+def ptx_registers(code: str) -> int:
+    """32-bit registers the .reg declarations of a PTX file add up to."""
+    words = 0
+    for m in re.finditer(r'\.reg\s+\.(\w+)\s+([^;]+);', code):
+        size = REG_BYTES.get(m.group(1), 4)
+        for name in m.group(2).split(","):
+            n = re.search(r'<(\d+)>', name)
+            words += (int(n.group(1)) if n else 1) * ((size + 3) // 4)
+    return words
+
+def registers_per_thread(code: str, is_ptx: bool) -> int:
+    return ptx_registers(code) if is_ptx else sass_registers(code)
+
+def declared_shared(ir: List[Dict]) -> int:
+    """Static shared memory of a kernel: the end of its last decl.shared."""
+    return max((i["offset"] + i["size"] for i in ir if i["op"] == "decl.shared"), default=0)
+
+def shared_high_water(trace: AccessTrace) -> int:
+    """One past the highest shared-memory byte a trace touched, summarized loops included."""
+    top = 0
+    for part in trace.chunks():
+        for addr, stride, count, size in zip(part.address, part.stride, part.count, part.size):
+            top = max(top, addr + size, addr + stride * (count - 1) + size)
+    return top
+
+def _round_up(value: int, unit: int) -> int:
+    return (value + unit - 1) // unit * unit
+
+def block_occupancy(block_threads: int, registers: int, shared: int, limits: Dict[str, Any]) -> Dict[str, Any]:
+    """Resident blocks and warps per SM for one block size, and the resource that limits them."""
+    warps = (block_threads + 31) // 32
+    if not 0 < block_threads <= limits["max_threads_per_block"]:
+        fits = {"threads": 0}
+    else:
+        regs_per_warp = _round_up(max(registers, 1) * 32, limits["register_unit"])
+        smem = _round_up(shared + limits["reserved_shared"], limits["shared_unit"])
+        fits = {
+            "blocks": limits["max_blocks"],
+            "warps": limits["max_warps"] // warps,
+            "registers": (limits["registers"] // regs_per_warp) // warps
+                         if registers <= limits["max_registers_per_thread"] else 0,
+            "shared": (limits["shared"] // smem if smem else limits["max_blocks"])
+                      if shared <= limits["max_shared_per_block"] else 0,
+        }
+    limiter = min(fits, key=fits.get)
+    blocks = fits[limiter]
+    return {
+        "block_threads": block_threads,
+        "blocks_per_sm": blocks,
+        "active_warps": blocks * warps,
+        "occupancy": round(blocks * warps / limits["max_warps"], 4),
+        "limiter": limiter,
+    }
+
+def launch_occupancy(grid_blocks: int, block_threads: int, registers: int, shared: int,
+                     limits: Dict[str, Any], register_source: str = "sass") -> Dict[str, Any]:
+    """
+    Occupancy of a launch and of every block size that is a multiple of 32,
+    with flags for configurations that waste the SMs: blocks that cannot
+    launch, occupancy below LOW_OCCUPANCY or below the best block size,
+    partial warps and grids short of one full wave.
+    """
+    approximate = register_source == PTX_REGISTERS
+    if approximate:
+        registers = min(registers, limits["max_registers_per_thread"])
+    current = block_occupancy(block_threads, registers, shared, limits)
+    sizes = [block_occupancy(t, registers, shared, limits)
+             for t in range(32, limits["max_threads_per_block"] + 1, 32)]
+    # Smallest block reaching the highest occupancy
+    best = max(sizes, key=lambda s: (s["occupancy"], -s["block_threads"]))
+
+    resident = current["blocks_per_sm"] * (limits["sm_count"] or 0)
+    waves = round(grid_blocks / resident, 3) if resident else None
+    flags = []
+    if current["blocks_per_sm"] == 0 and approximate and current["limiter"] == "registers":
+        flags.append({"flag": "register_bound",
+                      "message": f"the PTX declares registers for no {block_threads}-thread block per SM; "
+                                 f"ptxas usually allocates fewer, pass --registers from ptxas -v"})
+    elif current["blocks_per_sm"] == 0:
+        flags.append({"flag": "cannot_launch",
+                      "message": f"a {block_threads}-thread block does not fit on an SM ({current['limiter']})"})
+    elif current["occupancy"] < LOW_OCCUPANCY:
+        flags.append({"flag": "low_occupancy",
+                      "message": f"occupancy {current['occupancy']:.0%} is limited by {current['limiter']}"})
+    if current["occupancy"] < best["occupancy"]:
+        flags.append({"flag": "below_best",
+                      "message": f"--block {best['block_threads']} reaches {best['occupancy']:.0%} "
+                                 f"(this launch {current['occupancy']:.0%})"})
+    if block_threads % 32:
+        flags.append({"flag": "partial_warp",
+                      "message": f"{32 - block_threads % 32} lanes of the last warp of every block are idle"})
+    if waves is not None and waves < 1:
+        flags.append({"flag": "partial_wave",
+                      "message": f"{grid_blocks} blocks fill {waves:.0%} of the {resident} resident block slots"})
+
+    return {
+        "device": limits["device"],
+        "arch": limits["arch"],
+        "sm_count": limits["sm_count"],
+        "registers_per_thread": registers,
+        "register_source": register_source,
+        "registers_approximate": approximate,
+        "shared_bytes_per_block": shared,
+        **current,
+        "max_warps_per_sm": limits["max_warps"],
+        "waves": waves,
+        "best_block_threads": best["block_threads"],
+        "best_occupancy": best["occupancy"],
+        "flags": flags,
+        "block_sizes": sizes,
+    }
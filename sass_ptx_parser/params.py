@@ -0,0 +1,267 @@
+# params.py
+#
+# Kernel parameter layouts. A PTX entry declares its parameters
+# (.param .u64 k_param_0, .param .align 8 .b8 k_param_2[16]) and they are
+# laid out in that order, each aligned to its size or .align. A SASS dump
+# only names the kernel, so its layout comes from the signature cached when
+# the PTX of the same kernel was analyzed (signatures.json in the cache
+# directory, keyed by kernel name) or else from the parameter types in the
+# mangled name. The parameters sit in constant bank 0 from an
+# architecture-specific offset (CBANK_LAYOUTS), below which the driver
+# keeps ntid / nctaid.
+#
+# The parsers emit one {"op": "decl.param"} per parameter ahead of the body
+# and name parameters param_0, param_1, ...; the high word of a 64-bit
+# parameter is param_N.hi. At launch every pointer parameter gets a buffer
+# (base address and size, from --param or laid out from --base one after
+# another) and every scalar a value.
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from spill import parse_size
+
+# (first SM version, offset of ntid.x, offset of the first parameter) in c[0x0]
+CBANK_LAYOUTS = [(30, 0x8, 0x140), (70, 0x0, 0x160), (90, 0x0, 0x210), (100, 0x0, 0x380)]
+DEFAULT_ARCH = "sm_86"
+
+# Kernels whose layout is unknown: one buffer pointer and a 32-bit count
+DEFAULT_SIGNATURE = [{"type": "u64", "size": 8, "align": 8, "pointer": True},
+                     {"type": "u32", "size": 4, "align": 4, "pointer": False}]
+
+# Value of a scalar parameter not given with --param
+SCALAR_DEFAULT = 1234
+# Buffers without a size are this far apart, so no realistic index reaches the next one
+BUFFER_SPACING = 1 << 32
+BUFFER_ALIGN = 256
+
+SIGNATURE_FILE = "signatures.json"
+
+# Itanium builtin type codes -> (PTX type, size)
+MANGLED_TYPES = {
+    "b": ("u8", 1), "c": ("s8", 1), "a": ("s8", 1), "h": ("u8", 1),
+    "s": ("s16", 2), "t": ("u16", 2), "i": ("s32", 4), "j": ("u32", 4),
+    "l": ("s64", 8), "m": ("u64", 8), "x": ("s64", 8), "y": ("u64", 8),
+    "n": ("b128", 16), "o": ("b128", 16), "f": ("f32", 4), "d": ("f64", 8), "Dh": ("f16", 2),
+}
+# CUDA vector types passed by value -> (size, alignment)
+VECTOR_TYPES = {
+    "char2": (2, 2), "uchar2": (2, 2), "char4": (4, 4), "uchar4": (4, 4),
+    "short2": (4, 4), "ushort2": (4, 4), "short4": (8, 8), "ushort4": (8, 8),
+    "int2": (8, 8), "uint2": (8, 8), "int4": (16, 16), "uint4": (16, 16),
+    "float2": (8, 8), "float4": (16, 16), "double2": (16, 16), "__half2": (4, 4),
+    "long2": (16, 16), "ulong2": (16, 16), "longlong2": (16, 16), "ulonglong2": (16, 16),
+}
+
+def sm_version(arch: Optional[str]) -> int:
+    m = re.search(r'(\d+)', arch or DEFAULT_ARCH)
+    return int(m.group(1))
+
+def cbank_layout(arch: Optional[str]) -> Tuple[int, int]:
+    """(offset of ntid.x, offset of the first parameter) in c[0x0] for an sm_XX target."""
+    version = sm_version(arch)
+    driver, first = CBANK_LAYOUTS[0][1:]
+    for since, d, p in CBANK_LAYOUTS:
+        if version >= since:
+            driver, first = d, p
+    return driver, first
+
+def _source_name(text: str, pos: int) -> Tuple[Optional[str], int]:
+    m = re.match(r'(\d+)', text[pos:])
+    if not m:
+        return None, pos
+    length = int(m.group(1))
+    start = pos + len(m.group(1))
+    return text[start:start + length], start + length
+
+def _name(text: str, pos: int, subs: List) -> Tuple[Optional[str], int]:
+    """<unscoped-name> or N <prefix>... E; nested prefixes become substitution candidates."""
+    if text[pos:pos + 1] != "N":
+        return _source_name(text, pos)
+    pos += 1
+    parts = []
+    while pos < len(text) and text[pos] != "E":
+        name, pos = _source_name(text, pos)
+        if name is None:
+            return None, pos
+        parts.append(name)
+        subs.append({"class": "::".join(parts)})
+    subs.pop()   # the innermost name is added by the caller when it is a type
+    return "::".join(parts), pos + 1
+
+def _type(text: str, pos: int, subs: List) -> Tuple[Optional[Dict], int]:
+    """One parameter type: builtins, pointers, cv-qualifiers, S_ substitutions and vector structs."""
+    code = text[pos:pos + 2] if text[pos:pos + 1] == "D" else text[pos:pos + 1]
+    if code in MANGLED_TYPES:
+        ptx, size = MANGLED_TYPES[code]
+        return {"type": ptx, "size": size, "align": size, "pointer": False}, pos + len(code)
+    if code in ("P", "R"):
+        inner, end = _type(text, pos + 1, subs)
+        if inner is None:
+            return None, end
+        t = {"type": "u64", "size": 8, "align": 8, "pointer": True}
+        subs.append(t)
+        return t, end
+    if code in ("K", "V", "r"):
+        inner, end = _type(text, pos + 1, subs)
+        if inner is not None:
+            subs.append(inner)
+        return inner, end
+    if code == "S":
+        m = re.match(r'S([0-9A-Z]*)_', text[pos:])
+        if not m:
+            return None, pos
+        k = int(m.group(1), 36) + 1 if m.group(1) else 0
+        if k >= len(subs):
+            return None, pos
+        return subs[k], pos + m.end()
+    if code == "N" or code.isdigit():
+        name, end = _name(text, pos, subs)
+        if name is None or name.split("::")[-1] not in VECTOR_TYPES:
+            return None, end
+        size, align = VECTOR_TYPES[name.split("::")[-1]]
+        t = {"type": f"b8[{size}]", "size": size, "align": align, "pointer": False}
+        subs.append(t)
+        return t, end
+    return None, pos
+
+@lru_cache(maxsize=None)
+def demangle_params(kernel: str) -> Optional[Tuple[Dict, ...]]:
+    """
+    Parameter types of an Itanium-mangled kernel name (_Z6kernelPfS_i ->
+    float*, float*, int); None for names outside the supported subset
+    (templates, std:: types, structs other than CUDA vector types).
+    """
+    if not kernel.startswith("_Z"):
+        return None
+    subs: List = []
+    name, pos = _name(kernel, 2, subs)
+    if name is None:
+        return None
+    params = []
+    while pos < len(kernel):
+        if kernel[pos] == "v" and pos == len(kernel) - 1 and not params:
+            break
+        t, pos = _type(kernel, pos, subs)
+        if t is None:
+            return None
+        params.append(dict(t))
+    return tuple(params)
+
+def layout(params: List[Dict]) -> List[Dict]:
+    """Param-space offsets in declaration order; each parameter is aligned to its alignment."""
+    offset, out = 0, []
+    for k, p in enumerate(params):
+        offset = (offset + p["align"] - 1) // p["align"] * p["align"]
+        out.append({"name": f"param_{k}", **p, "offset": offset})
+        offset += p["size"]
+    return out
+
+def resolve_signature(kernel: Optional[str], cached: Optional[Dict[str, List[Dict]]] = None) -> List[Dict]:
+    """Layout of a kernel known only by name: cached PTX signature, mangled name, or DEFAULT_SIGNATURE."""
+    if kernel and cached and kernel in cached:
+        return cached[kernel]
+    types = demangle_params(kernel) if kernel else None
+    return layout(list(types) if types is not None else DEFAULT_SIGNATURE)
+
+def cbank_names(arch: Optional[str], params: List[Dict]) -> Dict[int, str]:
+    """c[0x0] offset -> symbol: the launch dimensions and every parameter word with a name."""
+    driver, first = cbank_layout(arch)
+    names = {driver + 4 * k: name for k, name in enumerate(("ntid.x", "ntid.y", "ntid.z",
+                                                           "nctaid.x", "nctaid.y", "nctaid.z"))}
+    for p in params:
+        names[first + p["offset"]] = p["name"]
+        if p["size"] == 8:
+            names[first + p["offset"] + 4] = f"{p['name']}.hi"
+    return names
+
+def signatures(ir: List[Dict]) -> Dict[str, List[Dict]]:
+    """Kernel name -> parameter layout, from the decl.param entries of an IR."""
+    out: Dict[str, List[Dict]] = {}
+    for instr in ir:
+        if instr["op"] == "decl.param":
+            out.setdefault(instr["kernel"], []).append(
+                {k: v for k, v in instr.items() if k not in ("op", "kernel", "cbank")})
+    return out
+
+def load_signatures(cache_dir: str) -> Dict[str, List[Dict]]:
+    try:
+        with open(os.path.join(cache_dir, SIGNATURE_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def store_signatures(cache_dir: str, ir: List[Dict]):
+    """Add the signatures of a parsed PTX file to the cache, replacing older entries of the same kernels."""
+    found = signatures(ir)
+    if not found:
+        return
+    table = load_signatures(cache_dir)
+    table.update(found)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = os.path.join(cache_dir, SIGNATURE_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(table, f, indent=1)
+    os.replace(tmp, os.path.join(cache_dir, SIGNATURE_FILE))
+
+def parse_param_arg(text: str) -> Tuple[str, int, Optional[int]]:
+    """--param NAME=VALUE[:SIZE]; NAME is the position or param_N, numbers may be hex."""
+    m = re.fullmatch(r'\s*(?:param_)?(\d+)\s*=\s*(-?(?:0x[0-9a-f]+|\d+))\s*(?::\s*(\w+))?\s*', text, re.I)
+    if not m:
+        raise ValueError(f"expected NAME=VALUE[:SIZE], got {text!r}")
+    size = m.group(3)
+    if size is not None:
+        size = int(size, 0) if size.lower().startswith("0x") else parse_size(size)
+    return f"param_{m.group(1)}", int(m.group(2), 0), size
+
+def assign_buffers(ir: List[Dict], base_address: int,
+                   overrides: Optional[Dict[str, Tuple[int, Optional[int]]]] = None) -> List[Dict]:
+    """
+    Launch value of every parameter. Pointers become buffers: {name, base,
+    size}, from `overrides` (name -> (base, size)) or placed from
+    base_address on, BUFFER_SPACING apart unless a size is given. Scalars
+    get {name, value}.
+    """
+    overrides = overrides or {}
+    params = [i for i in ir if i["op"] == "decl.param"]
+    unknown = set(overrides) - {p["name"] for p in params}
+    if unknown:
+        raise ValueError(f"no such kernel parameter: {', '.join(sorted(unknown))}")
+    out, top = [], base_address
+    for p in params:
+        value, size = overrides.get(p["name"], (None, None))
+        if not p["pointer"]:
+            out.append({"name": p["name"], "value": SCALAR_DEFAULT if value is None else value})
+            continue
+        base = top if value is None else value
+        out.append({"name": p["name"], "base": base, "size": size})
+        if value is None:
+            top = base + (size if size is not None else BUFFER_SPACING)
+            top = (top + BUFFER_ALIGN - 1) // BUFFER_ALIGN * BUFFER_ALIGN
+    return out
+
+def describe_params(ir: List[Dict], buffers: List[Dict]) -> List[Dict]:
+    """Report entry per parameter: its layout and launch value."""
+    decls = [i for i in ir if i["op"] == "decl.param"]
+    out = []
+    for decl, b in zip(decls, buffers):
+        entry = {k: v for k, v in decl.items() if k not in ("op", "symbol")}
+        if "cbank" in entry:
+            entry["cbank"] = hex(entry["cbank"])
+        if "base" in b:
+            entry.update(base=hex(b["base"]), buffer_size=b["size"])
+        else:
+            entry["value"] = b["value"]
+        out.append(entry)
+    return out
+
+def launch_values(buffers: List[Dict]) -> Dict[str, Any]:
+    """Register values of the parameters and of the high words of 64-bit ones."""
+    regs = {}
+    for b in buffers:
+        value = b.get("base", b.get("value"))
+        regs[b["name"]] = value
+        regs[f"{b['name']}.hi"] = value >> 32
+    return regs
@@ -1,34 +1,155 @@
 # parser.py
 
 import re
-from typing import List, Dict
+import struct
+from collections import Counter
+from typing import List, Dict, Optional
+from params import demangle_params, resolve_signature, cbank_names, cbank_layout
 
 def clean(s: str) -> str:
     """Strip whitespace and leading '%' from PTX identifiers."""
     return s.strip().lstrip('%')
 
+TYPE_SIZES = {
+    "b8": 1, "u8": 1, "s8": 1,
+    "b16": 2, "u16": 2, "s16": 2, "f16": 2,
+    "b32": 4, "u32": 4, "s32": 4, "f32": 4,
+    "b64": 8, "u64": 8, "s64": 8, "f64": 8,
+    "b128": 16,
+}
+
+def _access_size(op: str) -> int:
+    """Byte width of a typed PTX memory op such as ld.shared.u64 or st.global.v4.f32."""
+    parts = op.split('.')
+    count = next((int(p[1:]) for p in parts if p in ("v2", "v4", "v8")), 1)
+    for part in reversed(parts):
+        if part in TYPE_SIZES:
+            return count * TYPE_SIZES[part]
+    return count * 4
+
+def _vector(operand: str) -> List[str]:
+    """Registers of a PTX data operand: %f1, or every element of {%f1, %f2, %f3, %f4}."""
+    return [clean(r) for r in operand.strip().strip('{}').split(',')]
+
+def _literal(token: str):
+    """PTX operand: integer / 0f (f32) / 0d (f64) literal, else an identifier."""
+    token = clean(token)
+    if re.fullmatch(r'-?(0x[0-9a-fA-F]+|\d+)', token):
+        return int(token, 0)
+    if re.fullmatch(r'0[fF][0-9a-fA-F]{8}', token):
+        return struct.unpack('>f', bytes.fromhex(token[2:]))[0]
+    if re.fullmatch(r'0[dD][0-9a-fA-F]{16}', token):
+        return struct.unpack('>d', bytes.fromhex(token[2:]))[0]
+    return token
+
+def _store_value(operand: str):
+    """
+    Data operand of a PTX store: a register or literal, or a group "f1:f2"
+    of a vector store whose immediate elements are written as Python
+    literals (evaluator._group reads them back).
+    """
+    words = [_literal(w) for w in operand.strip().strip('{}').split(',')]
+    if len(words) == 1:
+        return words[0]
+    return ":".join(w if isinstance(w, str) else repr(w) for w in words)
+
+def _split_address(operand: str):
+    """Split a PTX address operand like [%r4+8] into (register, offset)."""
+    m = re.match(r"\[\s*([^\]]+?)\s*(?:\+\s*(-?\w+))?\s*\]", operand.strip())
+    if not m:
+        return None, 0
+    base, offset = m.groups()
+    return clean(base), int(offset, 0) if offset else 0
+
+def _ptx_param(line: str, kernel: str, index: int, offset: int) -> Optional[Dict]:
+    """decl.param for an entry parameter such as .param .u64 .ptr .align 8 k_param_0 or .param .align 8 .b8 k_param_1[16]."""
+    m = re.match(r'\.param\s+((?:\.\w+\s+(?:\d+\s+)?)+)([\w$]+)(?:\[(\d+)\])?', line)
+    if not m:
+        return None
+    attrs = m.group(1).split()
+    ptype = next((a[1:] for a in attrs if a[1:] in TYPE_SIZES), "b32")
+    size = TYPE_SIZES[ptype] * int(m.group(3) or 1)
+    align = int(attrs[attrs.index(".align") + 1]) if ".align" in attrs else TYPE_SIZES[ptype]
+    types = demangle_params(kernel)
+    if types is not None and index < len(types):
+        pointer = types[index]["pointer"]
+    else:
+        pointer = ".ptr" in attrs or (ptype in ("u64", "b64", "s64") and m.group(3) is None)
+    offset = (offset + align - 1) // align * align
+    return {"op": "decl.param", "kernel": kernel, "name": f"param_{index}", "symbol": m.group(2),
+            "type": ptype if m.group(3) is None else f"{ptype}[{m.group(3)}]",
+            "size": size, "align": align, "offset": offset, "pointer": pointer}
+
 def parse_ptx_to_ir(ptx_code: str) -> List[Dict]:
     ir = []
+    shared_top = 0
+    # Entry parameters: symbol -> param_N; decls of the .entry header being read
+    kernel, params, header = None, {}, None
 
     lines = ptx_code.strip().splitlines()
     for line in lines:
         line = line.strip()
-        if not line or line.startswith('//') or line.endswith(':'):
+        if not line or line.startswith('//'):
             continue 
 
-        tokens = re.split(r'\s+', line, maxsplit=1)
-        if len(tokens) < 2:
+        m = re.match(r'(?:\.visible\s+|\.weak\s+)?\.entry\s+([\w$]+)', line)
+        if m:
+            kernel, header = m.group(1), []
+            line = line[m.end():].lstrip("( ")
+            if not line:
+                continue
+        if header is not None:
+            if line.startswith(".param"):
+                top = header[-1]["offset"] + header[-1]["size"] if header else 0
+                decl = _ptx_param(line, kernel, len(header), top)
+                if decl is not None:
+                    header.append(decl)
+                    params[decl["symbol"]] = decl["name"]
+            if line.startswith(("{", ")")) or line.endswith(")"):
+                ir.extend(header)
+                header = None
+            continue
+
+        if re.fullmatch(r'[\w$.]+:', line):
+            ir.append({"op": "label", "name": line[:-1]})
+            continue
+
+        # .shared .align 4 .b8 _ZZ6kernelE4tile[4096];
+        m = re.match(r'(?:\.extern\s+)?\.shared\s+(?:\.align\s+(\d+)\s+)?\.(\w+)\s+([\w$]+)(?:\[(\d*)\])?', line)
+        if m:
+            elem = TYPE_SIZES.get(m.group(2), 4)
+            align = int(m.group(1) or elem)
+            if m.group(4) is None:
+                count = 1
+            elif m.group(4) == "":
+                count = 0  # extern array, sized at launch
+            else:
+                count = int(m.group(4))
+            shared_top = (shared_top + align - 1) // align * align
+            size = count * elem
+            ir.append({"op": "decl.shared", "name": m.group(3), "offset": shared_top, "size": size})
+            shared_top += size
             continue
 
-        op, args = tokens
-        args = args.rstrip(';')
+        # Guard predicate: @%p1 bra ...; @!%p1 st.global ...
+        pred, neg = None, False
+        m = re.match(r'@(!?)%?(\w+)\s+(.*)', line)
+        if m:
+            neg, pred, line = bool(m.group(1)), m.group(2), m.group(3)
+
+        start = len(ir)
+        tokens = re.split(r'\s+', line.rstrip(';'), maxsplit=1)
+        op = tokens[0]
+        args = tokens[1].rstrip(';') if len(tokens) > 1 else ""
 
-        if op == "ld.param.u64":
+        if op in ("ret", "exit"):
+            ir.append({"op": "exit"})
+
+        elif op.startswith("ld.param"):
             dst, src = map(clean, args.split(','))
-            param = src.strip('[]')
-            if param.endswith('_param_0'):
-                param = "out"
-            ir.append({"op": op, "dst": dst, "src": param})
+            param, offset = _split_address(src)
+            param = params.get(param, param)
+            ir.append({"op": op, "dst": dst, "src": f"{param}+{offset}" if offset else param})
 
         elif op == "cvta.to.global.u64":
             dst, src = map(clean, args.split(','))
@@ -36,174 +157,484 @@ def parse_ptx_to_ir(ptx_code: str) -> List[Dict]:
 
         elif op.startswith("mov"):
             dst, src = map(clean, args.split(','))
-            src = int(src) if src.isdigit() else src
-            ir.append({"op": op, "dst": dst, "src": src})
+            ir.append({"op": op, "dst": dst, "src": _literal(src)})
 
         elif op.startswith("mad.lo.s32"):
             dst, src1, src2, src3 = map(clean, args.split(','))
-            ir.append({"op": op, "dst": dst, "src1": src1, "src2": src2, "src3": src3})
+            ir.append({"op": op, "dst": dst, "src1": _literal(src1), "src2": _literal(src2), "src3": _literal(src3)})
 
         elif op.startswith("mul.wide.s32"):
             dst, src1, src2 = map(clean, args.split(','))
-            src2 = int(src2) if src2.isdigit() else src2
-            ir.append({"op": op, "dst": dst, "src1": src1, "src2": src2})
+            ir.append({"op": op, "dst": dst, "src1": src1, "src2": _literal(src2)})
 
         elif op.startswith("add.s64"):
             dst, src1, src2 = map(clean, args.split(','))
             ir.append({"op": op, "dst": dst, "src1": src1, "src2": src2})
 
-        elif op.startswith("st.global"):
-            m = re.match(r"(.*)\[(.*?)\],\s*(\S+)", args)
+        elif re.match(r'(add|sub|mul\.lo|shl|shr|and|or)\.\w+$', op):
+            dst, src1, src2 = map(clean, args.split(','))
+            ir.append({"op": op, "dst": dst, "src1": _literal(src1), "src2": _literal(src2)})
+
+        elif op.startswith("setp"):
+            dst, src1, src2 = map(clean, args.split(','))
+            ir.append({"op": op, "dst": dst.split('|')[0], "src1": _literal(src1), "src2": _literal(src2)})
+
+        elif op.startswith("selp"):
+            dst, src1, src2, src3 = map(clean, args.split(','))
+            ir.append({"op": op, "dst": dst, "src1": _literal(src1), "src2": _literal(src2), "src3": src3})
+
+        elif op.startswith("bra"):
+            ir.append({"op": "bra", "target": clean(args)})
+
+        elif re.match(r'st\.(global|shared)\.', op):
+            m = re.match(r"(\[.*?\]),\s*(\{[^}]*\}|\S+)", args)
             if m:
-                _, addr, val = m.groups()
-                ir.append({"op": op, "addr": clean(addr), "val": clean(val)})
+                addr, offset = _split_address(m.group(1))
+                ir.append({"op": op, "addr": addr, "offset": offset,
+                           "val": _store_value(m.group(2)), "size": _access_size(op)})
 
-    return ir
+        elif re.match(r'ld\.(global|shared)\.', op):
+            m = re.match(r"(\{[^}]*\}|\S+),\s*(\[.*?\])", args)
+            if m:
+                addr, offset = _split_address(m.group(2))
+                dst = _vector(m.group(1))
+                instr = {"op": op, "dst": dst[0], "addr": addr,
+                         "offset": offset, "size": _access_size(op)}
+                if len(dst) > 1:
+                    instr["dst_hi"] = ":".join(dst[1:])
+                ir.append(instr)
+
+        elif re.match(r'(atom|red)\.(global|shared)\.', op):
+            # atom.global.add.u32 d, [a], b (cas: d, [a], b, c); red has no d
+            m = re.match(r"(?:(\S+),\s*)?(\[.*?\]),\s*([^,]+)", args)
+            if m:
+                addr, offset = _split_address(m.group(2))
+                instr = {"op": op, "addr": addr, "offset": offset,
+                         "val": _literal(m.group(3)), "size": _access_size(op)}
+                if m.group(1) and op.startswith("atom"):
+                    instr["dst"] = clean(m.group(1))
+                ir.append(instr)
 
-CMEM_OFFSETS = {                      
-    0x28: "out",                      
-    0x160: "out",          
-    0x0: "ntid.x",                
-    0x168: "input_size",
-}
+        if pred is not None:
+            for instr in ir[start:]:
+                instr.update(pred=pred, neg=neg)
 
-def _cmem_alias(offset: int) -> str:
-    """Translate c[0x0][offset] into a symbolic name."""
-    return CMEM_OFFSETS.get(offset, f"cmem_{offset:x}")
+    return ir
 
-def parse_sass_to_ir(sass_code: str) -> List[Dict]:
+def _cmem_alias(offset: int) -> str:
     """
-    Very small, purpose-built SASS→IR mapper for the write kernel
-    (enough to prove out the pipeline; extend as you need).
+    Placeholder for c[0x0][offset]; parse_sass_to_ir() renames it once the
+    kernel's constant-bank layout is known (see params.cbank_names).
     """
-    ir: List[Dict] = []
+    return f"cmem_{offset:x}"
 
-    for raw in sass_code.splitlines():
-        line = raw.split(';')[0]                 
-        line = re.sub(r'^\s*/\*.*?\*/\s*', "", line)  
-        line = line.strip()
-        if not line or line.startswith(('//', '.', 'arch', 'code', 'host',
-                                        'compile_size', '=', 'Function')):
-            continue
+OPERAND_FIELDS = ("src", "src1", "src2", "src3", "val", "addr")
 
-        # Skip predicated instructions with @!PT or @P0
-        if line.startswith('@'):
-            continue
+def _resolve_cbank(ir: List[Dict], names: Dict[int, str]):
+    for instr in ir:
+        for key in OPERAND_FIELDS:
+            value = instr.get(key)
+            if isinstance(value, str) and value.startswith("cmem_"):
+                instr[key] = names.get(int(value[5:], 16), value)
 
-        # IMAD.MOV.U32 - Load constant with MOV variant
-        m = re.match(r'IMAD\.MOV\.U32\s+R(\d+),\s*RZ,\s*RZ,\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
-        if m:
-            dst = f"r{m.group(1)}"
-            src = _cmem_alias(int(m.group(2), 16))
-            ir.append({"op": "mov.u32", "dst": dst, "src": src})
-            continue
+SASS_WIDTHS = {"8": 1, "U8": 1, "S8": 1, "16": 2, "U16": 2, "S16": 2,
+               "32": 4, "64": 8, "128": 16}
+SASS_TYPES = {1: "u8", 2: "u16", 4: "u32", 8: "u64", 16: "v4.u32"}
 
-        # IMAD.MOV.U32 - Load immediate constant
-        m = re.match(r'IMAD\.MOV\.U32\s+R(\d+),\s*RZ,\s*RZ,\s*0x([0-9a-f]+)', line, re.I)
-        if m:
-            ir.append({"op": "mov.u32",
-                       "dst": f"r{m.group(1)}",
-                       "src": int(m.group(2), 16)})
-            continue
+ATOMIC_OPS = ("add", "min", "max", "inc", "dec", "and", "or", "xor", "exch", "cas")
+# Opcodes without an effect on the simulated state, not reported as unsupported
+IGNORED_SASS = ("NOP",)
 
-        # LDC.U16 - Load constant 16-bit
-        m = re.match(r'LDC\.U16\s+R(\d+),\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
-        if m:
-            dst = f"r{m.group(1)}"
-            src = _cmem_alias(int(m.group(2), 16))
-            ir.append({"op": "mov.u16", "dst": dst, "src": src})
-            continue
 
-        # PRMT - Permute bytes (simplified - just move source)
-        m = re.match(r'PRMT\s+R(\d+),\s*R(\d+),\s*0x([0-9a-f]+),\s*RZ', line, re.I)
-        if m:
-            ir.append({"op": "mov.u32",
-                       "dst": f"r{m.group(1)}",
-                       "src": f"r{m.group(2)}"})
-            continue
+def _sass_width(opcode: str) -> int:
+    """Byte width of a SASS memory opcode such as LDS.U.64 (default 32-bit)."""
+    for mod in reversed(opcode.upper().split('.')[1:]):
+        if mod in SASS_WIDTHS:
+            return SASS_WIDTHS[mod]
+    return 4
 
-        # ISETP.GT.AND - Set predicate (skip for now)
-        m = re.match(r'ISETP\.(GT|NE)\.AND\s+P\d+,\s*PT,.*', line, re.I)
-        if m:
-            continue
+def _reg(index) -> str:
+    """IR name of SASS register R<index>."""
+    return f"r{int(index)}"
 
-        # FSEL - Floating point select (conditional assignment)
-        m = re.match(r'FSEL\s+R(\d+),\s*RZ,\s*([0-9]+),\s*P\d+', line, re.I)
-        if m:
-            ir.append({"op": "mov.u32",
-                       "dst": f"r{m.group(1)}",
-                       "src": int(m.group(2))})
-            continue
+def _regs(index, words: int = 1) -> str:
+    """
+    Operand for `words` consecutive registers from R<index>: "r2" for one,
+    "r2:r3" for a 64-bit pair, "r4:r5:r6:r7" for 128-bit data.
+    """
+    return ":".join(_reg(int(index) + k) for k in range(words))
 
-        # STG.E.SYS - Store global with cache modifiers
-        m = re.match(r'STG[\.\w]*\s+\[R(\d+)\],\s*R(\d+)', line, re.I)
-        if m:
-            ir.append({"op": "st.global.u32",
-                       "addr": f"r{m.group(1)}",
-                       "val": f"r{m.group(2)}"})
-            continue
+def _sass_address(operand: str):
+    """
+    Split [R3+0x80] into ("r3", 0x80); [R2.64] names the pair "r2:r3".
+    RZ becomes the literal 0.
+    """
+    m = re.match(r'(?:desc\[UR\d+\])?\[\s*(R\d+|RZ)?(\.64)?\s*(?:\+?\s*(-?0x[0-9a-f]+))?\s*\]', operand.strip(), re.I)
+    if not m:
+        return None, 0
+    reg, wide, offset = m.groups()
+    base = 0 if reg is None or reg.upper() == "RZ" else _regs(reg[1:], 2 if wide else 1)
+    return base, int(offset, 16) if offset else 0
+
+def _global_address(opcode: str, operand: str):
+    """_sass_address() of LDG / STG; pre-Volta .E forms write the pair as [R2]."""
+    addr, offset = _sass_address(operand)
+    if isinstance(addr, str) and ":" not in addr and "E" in opcode.upper().split('.'):
+        addr = f"{addr}:{_reg(int(addr[1:]) + 1)}"
+    return addr, offset
+
+def _sass_operand(token: str, words: int = 1):
+    """
+    Map a SASS source operand to an IR operand (register/symbol name or
+    number); words=2 reads a register as a 64-bit pair.
+    """
+    token = token.strip()
+    if token.upper() == "RZ":
+        return 0
+    if re.fullmatch(r'R\d+', token, re.I):
+        return _regs(token[1:], words)
+    m = re.fullmatch(r'c\[0x0\]\[0x([0-9a-f]+)\]', token, re.I)
+    if m:
+        return _cmem_alias(int(m.group(1), 16))
+    if token.lower().startswith(('0x', '-0x')):
+        return int(token, 16)
+    return float(token) if re.search(r'[.e]', token, re.I) else int(token)
+
+def _sass_label(target: str) -> str:
+    """Label name for a BRA target: 0xc0, `(.L_x_0) or .L_x_0."""
+    target = target.strip('`() ')
+    return f"0x{int(target, 16):x}" if target.lower().startswith('0x') else target
+
+
+def _sass_line_to_ir(line: str) -> List[Dict]:
+    """Map one unguarded SASS instruction to IR (empty list if unsupported)."""
+
+    # IMAD.MOV.U32 - Load constant with MOV variant
+    m = re.match(r'IMAD\.MOV\.U32\s+R(\d+),\s*RZ,\s*RZ,\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
+    if m:
+        dst = _reg(m.group(1))
+        src = _cmem_alias(int(m.group(2), 16))
+        return [{"op": "mov.u32", "dst": dst, "src": src}]
+
+    # IMAD.MOV.U32 - Load immediate constant
+    m = re.match(r'IMAD\.MOV\.U32\s+R(\d+),\s*RZ,\s*RZ,\s*0x([0-9a-f]+)', line, re.I)
+    if m:
+        return [{"op": "mov.u32",
+                 "dst": _reg(m.group(1)),
+                 "src": int(m.group(2), 16)}]
+
+    # LDC.U16 - Load constant 16-bit
+    m = re.match(r'LDC\.U16\s+R(\d+),\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
+    if m:
+        dst = _reg(m.group(1))
+        src = _cmem_alias(int(m.group(2), 16))
+        return [{"op": "mov.u16", "dst": dst, "src": src}]
+
+    # PRMT - Permute bytes (simplified - just move source)
+    m = re.match(r'PRMT\s+R(\d+),\s*R(\d+),\s*0x([0-9a-f]+),\s*RZ', line, re.I)
+    if m:
+        return [{"op": "mov.u32",
+                 "dst": _reg(m.group(1)),
+                 "src": _reg(m.group(2))}]
+
+    src = r'(R\d+|RZ|-?0x[0-9a-f]+|c\[0x0\]\[0x[0-9a-f]+\])'
+
+    # ISETP.<cmp>[.U32].AND Pd, PT, a, b, Pc - Set predicate, combined with Pc
+    m = re.match(rf'ISETP\.(\w+?)(\.U32)?\.(AND|OR)\s+P(\d+),\s*PT,\s*{src},\s*{src},\s*(P\d+|PT)$', line, re.I)
+    if m:
+        dst = f"p{m.group(4)}"
+        kind = "u32" if m.group(2) else "s32"
+        out = [{"op": f"setp.{m.group(1).lower()}.{kind}",
+                "dst": dst,
+                "src1": _sass_operand(m.group(5)),
+                "src2": _sass_operand(m.group(6))}]
+        if m.group(7).upper() != "PT":
+            out.append({"op": f"{m.group(3).lower()}.pred",
+                        "dst": dst, "src1": dst, "src2": m.group(7).lower()})
+        return out
+
+    # LOP3.LUT Rd, a, b, RZ, lut, !PT - Bitwise op; only the two-input AND / OR tables
+    m = re.match(rf'LOP3\.LUT\s+R(\d+),\s*{src},\s*{src},\s*RZ,\s*(0xc0|0xfc),\s*!PT$', line, re.I)
+    if m:
+        return [{"op": "and.b32" if m.group(4).lower() == "0xc0" else "or.b32",
+                 "dst": _reg(m.group(1)),
+                 "src1": _sass_operand(m.group(2)),
+                 "src2": _sass_operand(m.group(3))}]
+
+    # FSEL / SEL - Select on a predicate
+    m = re.match(r'F?SEL\s+R(\d+),\s*([^,]+),\s*([^,]+),\s*(!?)P(\d+|T)$', line, re.I)
+    if m:
+        a, b = _sass_operand(m.group(2)), _sass_operand(m.group(3))
+        if m.group(4):
+            a, b = b, a
+        return [{"op": "selp.b32",
+                 "dst": _reg(m.group(1)),
+                 "src1": a,
+                 "src2": b,
+                 "src3": f"p{m.group(5).lower()}"}]
+
+    # STG.E[.64|.128] - Store global; the address is a 64-bit pair, wide data a register group
+    m = re.match(r'(STG[\.\w]*)\s+((?:desc\[UR\d+\])?\[[^\]]*\]),\s*R(\d+)', line, re.I)
+    if m:
+        addr, offset = _global_address(m.group(1), m.group(2))
+        size = _sass_width(m.group(1))
+        return [{"op": f"st.global.{SASS_TYPES[size]}",
+                 "addr": addr,
+                 "offset": offset,
+                 "val": _regs(m.group(3), max(1, size // 4)),
+                 "size": size}]
+
+    # LDG.E[.CONSTANT] - Load global
+    m = re.match(r'(LDG[\.\w]*)\s+R(\d+),\s*((?:desc\[UR\d+\])?\[[^\]]*\])', line, re.I)
+    if m:
+        addr, offset = _global_address(m.group(1), m.group(3))
+        size = _sass_width(m.group(1))
+        instr = {"op": f"ld.global.{SASS_TYPES[size]}",
+                 "dst": _reg(m.group(2)),
+                 "addr": addr,
+                 "offset": offset,
+                 "size": size}
+        if size > 4:
+            instr["dst_hi"] = _regs(int(m.group(2)) + 1, size // 4 - 1)
+        return [instr]
+
+    # RED / ATOMG / ATOM / ATOMS - Atomics; RED and a zero destination discard the old value
+    m = re.match(r'(RED|ATOMG|ATOMS|ATOM)((?:\.\w+)*)\s+(?:!?P\w+,\s*)?(?:(R\d+|RZ),\s*)?(\[[^\]]*\]),\s*(R\d+|RZ|-?0x[0-9a-f]+)',
+                 line, re.I)
+    if m:
+        kind, mods = m.group(1).upper(), m.group(2).upper().split('.')
+        addr, offset = _sass_address(m.group(4))
+        size = _sass_width(kind + m.group(2))
+        fn = next((f for f in ATOMIC_OPS if f.upper() in mods), "add")
+        instr = {"op": f"{'red' if kind == 'RED' else 'atom'}.{'shared' if kind == 'ATOMS' else 'global'}"
+                       f".{fn}.{'f32' if 'F32' in mods else SASS_TYPES[size]}",
+                 "addr": addr,
+                 "offset": offset,
+                 "val": _sass_operand(m.group(5)),
+                 "size": size}
+        if kind != "RED" and m.group(3) and m.group(3).upper() != "RZ":
+            instr["dst"] = _reg(m.group(3)[1:])
+        return [instr]
+
+    # STS / LDS - Shared memory store and load
+    m = re.match(r'(STS[\.\w]*)\s+(\[[^\]]*\]),\s*R(\d+)', line, re.I)
+    if m:
+        addr, offset = _sass_address(m.group(2))
+        size = _sass_width(m.group(1))
+        return [{"op": f"st.shared.{SASS_TYPES[size]}",
+                 "addr": addr,
+                 "offset": offset,
+                 "val": _regs(m.group(3), max(1, size // 4)),
+                 "size": size}]
+
+    m = re.match(r'(LDS[\.\w]*)\s+R(\d+),\s*(\[[^\]]*\])', line, re.I)
+    if m:
+        addr, offset = _sass_address(m.group(3))
+        size = _sass_width(m.group(1))
+        instr = {"op": f"ld.shared.{SASS_TYPES[size]}",
+                 "dst": _reg(m.group(2)),
+                 "addr": addr,
+                 "offset": offset,
+                 "size": size}
+        if size > 4:
+            instr["dst_hi"] = _regs(int(m.group(2)) + 1, size // 4 - 1)
+        return [instr]
+
+    # IMAD.SHL.U32 / SHF.L.U32 - Scale an index (shared-memory addressing)
+    m = re.match(r'IMAD\.SHL\.U32\s+R(\d+),\s*(R\d+|RZ),\s*(0x[0-9a-f]+|\d+),\s*RZ', line, re.I)
+    if m:
+        return [{"op": "mul.lo.s32",
+                 "dst": _reg(m.group(1)),
+                 "src1": _sass_operand(m.group(2)),
+                 "src2": _sass_operand(m.group(3))}]
+
+    m = re.match(r'SHF\.L\.U32\s+R(\d+),\s*(R\d+|RZ),\s*(0x[0-9a-f]+|\d+),\s*RZ', line, re.I)
+    if m:
+        return [{"op": "shl.b32",
+                 "dst": _reg(m.group(1)),
+                 "src1": _sass_operand(m.group(2)),
+                 "src2": _sass_operand(m.group(3))}]
+
+    # SHF.R.S32.HI / SHF.R.U32.HI Rd, RZ, shift, a - Right shift (sign word of a 64-bit index)
+    m = re.match(r'SHF\.R\.([SU]32)\.HI\s+R(\d+),\s*RZ,\s*(0x[0-9a-f]+|\d+),\s*(R\d+|RZ)$', line, re.I)
+    if m:
+        return [{"op": f"shr.{m.group(1).lower()}",
+                 "dst": _reg(m.group(2)),
+                 "src1": _sass_operand(m.group(4)),
+                 "src2": _sass_operand(m.group(3))}]
+
+    # IADD3[.X] Rd, [Pc, [Pc2,]] a, b, c[, Pin, Pin2] - Three-input integer add. The
+    # low word of 64-bit pointer math sets a carry predicate that IADD3.X adds
+    # back; with two, the first takes the whole carry and the second is zeroed
+    m = re.match(rf'IADD3(\.X)?\s+R(\d+),\s*(?:(P\d+|PT),\s*)?(?:(P\d+|PT),\s*)?{src},\s*{src},\s*{src}'
+                 r'(?:,\s*(!?P\w+)(?:,\s*(!?P\w+))?)?$', line, re.I)
+    if m:
+        dst = _reg(m.group(2))
+        a, b, c = (_sass_operand(g) for g in m.group(5, 6, 7))
+        out = []
+        if m.group(3) and m.group(3).upper() != "PT":
+            out.append({"op": "carry.u32", "dst": m.group(3).lower(), "src1": a, "src2": b, "src3": c})
+        if m.group(4) and m.group(4).upper() != "PT":
+            out.append({"op": "carry.u32", "dst": m.group(4).lower(), "src1": 0, "src2": 0})
+        out.append({"op": "add.s32", "dst": dst, "src1": a, "src2": b})
+        if c != 0:
+            out.append({"op": "add.s32", "dst": dst, "src1": dst, "src2": c})
+        if m.group(1):
+            out += [{"op": "add.s32", "dst": dst, "src1": dst, "src2": p.lower()}
+                    for p in m.group(8, 9) if p and re.fullmatch(r'P\d+', p, re.I)]
+        return out
+
+    # LEA Rd, [Pc,] a, b, shift - (a << shift) + b, the low word of a scaled pointer
+    m = re.match(rf'LEA\s+R(\d+),\s*(?:(P\d+),\s*)?{src},\s*{src},\s*(0x[0-9a-f]+|\d+)$', line, re.I)
+    if m:
+        dst, shift = _reg(m.group(1)), int(m.group(5), 0)
+        a, b = _sass_operand(m.group(3)), _sass_operand(m.group(4))
+        out = []
+        if m.group(2):
+            out.append({"op": "carry.u32", "dst": m.group(2).lower(), "src1": a, "src2": b, "shift": shift})
+        out.append({"op": "mad.lo.s32", "dst": dst, "src1": a, "src2": 1 << shift, "src3": b})
+        return out
+
+    # LEA.HI[.X][.SX32] Rd, a, b, [c,] shift[, Pin] - High word of (c:a) << shift, plus b
+    m = re.match(rf'LEA\.HI((?:\.\w+)*)\s+R(\d+),\s*{src},\s*{src},\s*(?:{src},\s*)?(0x[0-9a-f]+|\d+)'
+                 r'(?:,\s*(!?P\w+))?$', line, re.I)
+    if m:
+        dst = _reg(m.group(2))
+        instr = {"op": "lea.hi.u32", "dst": dst, "src1": _sass_operand(m.group(3)),
+                 "src2": _sass_operand(m.group(4)), "shift": int(m.group(6), 0)}
+        if m.group(5):
+            instr["src3"] = _sass_operand(m.group(5))   # else .SX32: a sign-extended
+        out = [instr]
+        if ".X" in m.group(1).upper() and m.group(7) and re.fullmatch(r'P\d+', m.group(7), re.I):
+            out.append({"op": "add.s32", "dst": dst, "src1": dst, "src2": m.group(7).lower()})
+        return out
+
+    # EXIT and BRA - Control flow
+    if re.match(r'EXIT\b', line, re.I):
+        return [{"op": "exit"}]
+
+    m = re.match(r'BRA(?:\.\w+)*\s+(\S+)', line, re.I)
+    if m:
+        return [{"op": "bra", "target": _sass_label(m.group(1))}]
+
+    # Existing patterns...
+    m = re.match(r'MOV\s+R(\d+),\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
+    if m:
+        dst = _reg(m.group(1))
+        src = _cmem_alias(int(m.group(2), 16))
+        return [{"op": "mov.u32", "dst": dst, "src": src}]
+
+    m = re.match(r'MOV\s+R(\d+),\s*0x([0-9a-f]+)', line, re.I)
+    if m:
+        return [{"op": "mov.u32",
+                 "dst": _reg(m.group(1)),
+                 "src": int(m.group(2), 16)}]
+
+    # MOV Rd, Rs / RZ - Register copy (e.g. the halves of a pointer pair)
+    m = re.match(r'MOV\s+R(\d+),\s*(R\d+|RZ)$', line, re.I)
+    if m:
+        return [{"op": "mov.u32", "dst": _reg(m.group(1)), "src": _sass_operand(m.group(2))}]
+
+    # IMAD.MOV.U32 Rd, RZ, RZ, Rs - The same copy issued on the FMA pipe
+    m = re.match(r'IMAD\.MOV(?:\.U32)?\s+R(\d+),\s*RZ,\s*RZ,\s*(R\d+|RZ)$', line, re.I)
+    if m:
+        return [{"op": "mov.u32", "dst": _reg(m.group(1)), "src": _sass_operand(m.group(2))}]
+
+    m = re.match(r'S2R\s+R(\d+),\s*SR_(\w+)\.([A-Z]+)', line, re.I)
+    if m:
+        sr = f"{m.group(2).lower()}.{m.group(3).lower()}"
+        return [{"op": "mov.u32", "dst": _reg(m.group(1)), "src": sr}]
+
+    # IMAD Rd, a, b, c - 32-bit multiply-add (index math, e.g. ctaid.y * ntid.y + tid.y)
+    m = re.match(rf'IMAD\s+R(\d+),\s*{src},\s*{src},\s*{src}', line, re.I)
+    if m:
+        return [{"op": "mad.lo.s32",
+                 "dst": _reg(m.group(1)),
+                 "src1": _sass_operand(m.group(2)),
+                 "src2": _sass_operand(m.group(3)),
+                 "src3": _sass_operand(m.group(4))}]
+
+    # IMAD.WIDE[.U32] Rd, a, b, c - 32x32 multiply plus a 64-bit addend into the pair Rd:Rd+1
+    m = re.match(rf'IMAD\.WIDE(\.U32)?\s+R(\d+),\s*{src},\s*{src},\s*{src}$', line, re.I)
+    if m:
+        dst = int(m.group(2))
+        return [{"op": f"mad.wide.{'u32' if m.group(1) else 's32'}",
+                 "dst": _reg(dst),
+                 "dst_hi": _reg(dst + 1),
+                 "src1": _sass_operand(m.group(3)),
+                 "src2": _sass_operand(m.group(4)),
+                 "src3": _sass_operand(m.group(5), 2)}]
+
+    return []
+
+def parse_sass_to_ir(sass_code: str, signatures: Optional[Dict[str, List[Dict]]] = None,
+                     arch: Optional[str] = None, unsupported: Optional[Counter] = None) -> List[Dict]:
+    """
+    Small SASS→IR mapper. Guards (@P0, @!P0) become "pred"/"neg" fields, and
+    branch targets, whether raw offsets (BRA 0xc0) or nvdisasm labels
+    (.L_x_0:), become label instructions so the CFG can be rebuilt.
 
-        # EXIT and BRA - Control flow (skip)
-        if re.match(r'(EXIT|BRA)', line, re.I):
-            continue
+    Constant-bank operands are named after the launch dimensions and kernel
+    parameters of the "code for sm_XX" architecture (or `arch`); the
+    parameter layout is the cached PTX signature of the kernel in
+    `signatures`, else what its mangled name says (params.resolve_signature).
 
-        # Existing patterns...
-        m = re.match(r'MOV\s+R(\d+),\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
-        if m:
-            dst = f"r{m.group(1)}"
-            src = _cmem_alias(int(m.group(2), 16))
-            ir.append({"op": "mov.u32", "dst": dst, "src": src})
-            continue
+    Instructions the mapper does not model are left out of the IR and
+    counted per opcode in `unsupported`.
+    """
+    ir: List[Dict] = []
 
-        m = re.match(r'MOV\s+R(\d+),\s*0x([0-9a-f]+)', line, re.I)
+    lines = []
+    targets = set()
+    kernel = None
+    for raw in sass_code.splitlines():
+        m = re.search(r'code for (sm_\d+)', raw)
+        if m and arch is None:
+            arch = m.group(1)
+        m = re.search(r'Function\s*:\s*(\S+)', raw)
+        if m and kernel is None:
+            kernel = m.group(1)
+        line = raw.split(';')[0]                 
+        m = re.match(r'^\s*/\*([0-9a-f]+)\*/', line, re.I)
+        offset = int(m.group(1), 16) if m else None
+        line = re.sub(r'^\s*/\*.*?\*/\s*', "", line)  
+        line = line.strip()
+        m = re.search(r'\bBRA(?:\.\w+)*\s+(\S+)', line, re.I)
         if m:
-            ir.append({"op": "mov.u32",
-                       "dst": f"r{m.group(1)}",
-                       "src": int(m.group(2), 16)})
-            continue
+            targets.add(_sass_label(m.group(1)))
+        lines.append((offset, line))
 
-        m = re.match(r'S2R\s+R(\d+),\s*SR_(\w+)\.([A-Z]+)', line, re.I)
-        if m:
-            sr = f"{m.group(2).lower()}.{m.group(3).lower()}"
-            ir.append({"op": "mov.u32", "dst": f"r{m.group(1)}", "src": sr})
+    for offset, line in lines:
+        if re.match(r'\.L\w*:$', line):
+            ir.append({"op": "label", "name": line[:-1]})
             continue
+        if offset is not None and f"0x{offset:x}" in targets:
+            ir.append({"op": "label", "name": f"0x{offset:x}"})
 
-        m = re.match(r'IMAD\s+R(\d+),\s*R(\d+),\s*c\[0x0\]\[0x0\],\s*R(\d+)',
-                     line, re.I)
-        if m:
-            ir.append({"op": "mad.lo.s32",
-                       "dst": f"r{m.group(1)}",
-                       "src1": f"r{m.group(2)}",
-                       "src2": "ntid.x",
-                       "src3": f"r{m.group(3)}"})
+        if not line or line.startswith(('//', '.', 'arch', 'code', 'host',
+                                        'compile_size', '=', 'Function')):
             continue
 
-        # IMAD.WIDE - Multiply-add wide (64-bit result)
-        m = re.match(r'IMAD\.WIDE\s+R(\d+),\s*R(\d+),\s*R(\d+),\s*c\[0x0\]\[0x([0-9a-f]+)\]', line, re.I)
-        if m:
-            dst_reg = f"r{m.group(1)}"
-            src1_reg = f"r{m.group(2)}" 
-            src2_reg = f"r{m.group(3)}"
-            offset = int(m.group(4), 16)
-            base = _cmem_alias(offset)
-            ir.extend([
-                {"op": "mul.wide.s32", "dst": dst_reg, "src1": src1_reg, "src2": src2_reg},
-                {"op": "add.s64", "dst": dst_reg, "src1": dst_reg, "src2": base}
-            ])
-            continue
-        
-        m = re.match(r'STG[\.\w]*\s+\[R(\d+)\],\s*R(\d+)', line, re.I)
-        if m:
-            ir.append({"op": "st.global.u32",
-                       "addr": "rd4",
-                       "val": f"r{m.group(2)}"})
-            continue
-        
-        m = re.match(r'FSEL\s+R(\d+),\s*RZ,\s*([0-9]+),\s*P\d+', line, re.I)
+        # Guard predicate: @P0, @!P0; @PT is always true, @!PT never executes
+        pred, neg = None, False
+        m = re.match(r'@(!?)(U?P\w+)\s+(.*)', line, re.I)
         if m:
-            ir.append({"op": "fsel",
-                       "dst": f"r{m.group(1)}",
-                       "src": int(m.group(2))})
-            continue
-
-    return ir
\ No newline at end of file
+            neg, pred, line = bool(m.group(1)), m.group(2).lower(), m.group(3)
+            if pred == "pt":
+                if neg:
+                    continue
+                pred = None
+
+        instrs = _sass_line_to_ir(line)
+        if not instrs and unsupported is not None and line.split()[0].upper() not in IGNORED_SASS:
+            unsupported[line.split()[0]] += 1
+        if pred is not None:
+            for instr in instrs:
+                instr.update(pred=pred, neg=neg)
+        ir.extend(instrs)
+
+    params = resolve_signature(kernel, signatures)
+    _resolve_cbank(ir, cbank_names(arch, params))
+    first = cbank_layout(arch)[1]
+    decls = [{"op": "decl.param", "kernel": kernel or "", **p, "cbank": first + p["offset"]} for p in params]
+    return decls + ir
@@ -0,0 +1,105 @@
+# profiling.py
+#
+# Phase timing and counters. Library code reports through the module-level
+# phase() / count() hooks, which cost one global lookup while no profiler is
+# active. Enable one with
+#
+#     with Profiler(memory=True, listeners=[my_sink]) as prof:
+#         ...
+#     prof.report()
+#
+# Every listener is called as listener(record) when a phase ends.
+
+import resource
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+_active: Optional["Profiler"] = None
+
+class Profiler:
+    """Collects wall time, peak traced memory and counter deltas per phase."""
+
+    def __init__(self, memory: bool = False, listeners: Optional[List[Callable[[Dict], None]]] = None):
+        self.memory = memory
+        self.listeners = list(listeners or [])
+        self.counters: Counter = Counter()
+        self.phases: List[Dict] = []
+        self._stack: List[Dict] = []
+        self._started_tracing = False
+        self._previous: Optional[Profiler] = None
+
+    def __enter__(self):
+        global _active
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        self._previous, _active = _active, self
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] += n
+
+    @contextmanager
+    def phase(self, name: str):
+        # tracemalloc has one peak register: fold it into the enclosing phase
+        # before resetting it for this one
+        if self.memory and self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], tracemalloc.get_traced_memory()[1])
+        if self.memory:
+            tracemalloc.reset_peak()
+        frame = {"name": name, "peak": 0, "counters": Counter(self.counters), "start": time.perf_counter()}
+        self._stack.append(frame)
+        try:
+            yield self
+        finally:
+            self._stack.pop()
+            record = {
+                "phase": ".".join([p["name"] for p in self._stack] + [name]),
+                "wall_s": round(time.perf_counter() - frame["start"], 6),
+            }
+            if self.memory:
+                peak = max(frame["peak"], tracemalloc.get_traced_memory()[1])
+                record["peak_bytes"] = peak
+                if self._stack:
+                    self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+            delta = self.counters - frame["counters"]
+            if delta:
+                record["counters"] = dict(sorted(delta.items()))
+            self.phases.append(record)
+            for listener in self.listeners:
+                listener(record)
+
+    def report(self) -> Dict:
+        return {
+            # Wall times include the tracemalloc overhead when memory is traced
+            "memory_traced": self.memory,
+            "phases": self.phases,
+            "counters": dict(sorted(self.counters.items())),
+            "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+def active() -> Optional[Profiler]:
+    return _active
+
+@contextmanager
+def phase(name: str):
+    """Time a phase on the active profiler; a no-op when profiling is off."""
+    if _active is None:
+        yield None
+    else:
+        with _active.phase(name) as prof:
+            yield prof
+
+def count(name: str, n: int = 1):
+    if _active is not None:
+        _active.counters[name] += n
@@ -0,0 +1,177 @@
+# report.py
+#
+# Incremental report output. Members are written as soon as they are added
+# and record lists are pulled lazily from iterables, so per-thread sections
+# never have to exist as one big list in memory.
+
+import json
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from access_trace import AccessTrace
+from utils import buffer_of
+
+FORMATS = ("json", "ndjson")
+DETAILS = ("summary", "warps", "threads")
+
+_dumps = json.JSONEncoder(separators=(",", ":")).encode
+
+class ReportWriter:
+    """
+    Streaming writer for the analysis report.
+
+    "json" writes one compact JSON object. "ndjson" writes one line per
+    member instead: {"field": path, "value": ...} for plain values and
+    {"record": path, ...} for each element of a record list, where path is
+    the dotted key (e.g. "control_flow.warps").
+    """
+
+    def __init__(self, stream, fmt: str = "json"):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown report format: {fmt}")
+        self.stream = stream
+        self.fmt = fmt
+        self.path: List[str] = []
+        self.first = [True]
+        if fmt == "json":
+            stream.write("{")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _key(self, key: str):
+        if not self.first[-1]:
+            self.stream.write(",")
+        self.first[-1] = False
+        self.stream.write(_dumps(key) + ":")
+
+    def _name(self, key: str) -> str:
+        return ".".join(self.path + [key])
+
+    def field(self, key: str, value: Any):
+        if self.fmt == "ndjson":
+            self.stream.write(_dumps({"field": self._name(key), "value": value}) + "\n")
+        else:
+            self._key(key)
+            self.stream.write(_dumps(value))
+
+    def fields(self, values: Dict[str, Any]):
+        for key, value in values.items():
+            self.field(key, value)
+
+    def records(self, key: str, items: Iterable[Dict[str, Any]]) -> int:
+        """Write a list member one element at a time; returns the element count."""
+        n = 0
+        if self.fmt == "ndjson":
+            name = self._name(key)
+            for item in items:
+                self.stream.write(_dumps({"record": name, **item}) + "\n")
+                n += 1
+            return n
+
+        self._key(key)
+        self.stream.write("[")
+        for item in items:
+            self.stream.write(("," if n else "") + _dumps(item))
+            n += 1
+        self.stream.write("]")
+        return n
+
+    @contextmanager
+    def section(self, key: str):
+        """Nested object; members added inside the block go under `key`."""
+        if self.fmt == "json":
+            self._key(key)
+            self.stream.write("{")
+            self.first.append(True)
+        self.path.append(key)
+        yield self
+        self.path.pop()
+        if self.fmt == "json":
+            self.first.pop()
+            self.stream.write("}")
+
+    def close(self):
+        if self.fmt == "json" and self.first:
+            self.stream.write("}\n")
+            self.first = []
+
+def iter_memory_writes(trace: AccessTrace, base_address: int,
+                       buffers: Optional[List[Dict]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    One record per stored value, unrolling summarized loop rows. With the
+    kernel's buffers (params.assign_buffers), offsets are relative to the
+    buffer a write falls into, which the record names.
+    """
+    bufs = sorted((b for b in buffers or () if "base" in b), key=lambda b: b["base"])
+    bases = [b["base"] for b in bufs]
+    # Rows of a block keep their order; blocks are listed in turn, so the
+    # output does not depend on how many blocks shared a simulation chunk
+    accesses = (part.record(i) for part in trace.chunks()
+                for i in sorted(range(len(part)), key=part.block.__getitem__))
+    for access in accesses:
+        if access["access_type"] == "write" and access["written_value"] is not None:
+            for j in range(access["count"]):
+                address = access["address"] + j * access["stride"]
+                k = buffer_of(bases, address)
+                record = {
+                    "address": address,
+                    "written_value": access["written_value"],
+                    "thread_id": access["globalIdx"],
+                    # Element index in units of the store's width
+                    "memory_offset": (address - (bases[k] if k >= 0 else base_address)) // access["access_size"],
+                    "access_size": access["access_size"],
+                }
+                if bufs:
+                    record["buffer"] = bufs[k]["name"] if k >= 0 else None
+                yield record
+
+def summarize_memory_writes(writes: Iterable[Dict[str, Any]], top: int = 16) -> Dict[str, Any]:
+    count, lo, hi = 0, None, None
+    values = Counter()
+    for w in writes:
+        count += 1
+        lo = w["address"] if lo is None else min(lo, w["address"])
+        hi = w["address"] if hi is None else max(hi, w["address"])
+        values[w["written_value"]] += 1
+    return {
+        "num_writes": count,
+        "address_range": f"0x{lo:08x} - 0x{hi:08x}" if count else None,
+        "distinct_values": len(values),
+        "value_histogram": {str(v): n for v, n in values.most_common(top)},
+    }
+
+def summarize_warp_usage(stats: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Histogram form of the per-warp warp_stats records."""
+    totals = Counter()
+    threads = Counter()
+    for s in stats:
+        totals["requests"] += 1
+        totals["fully_utilized"] += s["fully_utilized"]
+        totals["contiguous"] += s["contiguous"]
+        totals["coalesced"] += s["coalesced"]
+        totals["iterations"] += s["iterations"]
+        totals["coalesced_iterations"] += s["coalesced_iterations"]
+        totals["sectors"] += s["sectors"]
+        threads[s["num_threads"]] += 1
+    return {
+        **{k: totals[k] for k in ("requests", "fully_utilized", "contiguous", "coalesced",
+                                  "iterations", "coalesced_iterations", "sectors")},
+        "num_threads_histogram": {str(k): n for k, n in sorted(threads.items())},
+    }
+
+def warp_execution_histograms(warp_exec: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Utilization (0.1 bins), divergent-branch and issue-count histograms over warps."""
+    utilization, divergent, issued = Counter(), Counter(), Counter()
+    for w in warp_exec:
+        utilization[min(9, int(w["utilization"] * 10)) / 10] += 1
+        divergent[w["divergent_branches"]] += 1
+        issued[w["issued"]] += 1
+    return {
+        "utilization": {f"{k:.1f}": n for k, n in sorted(utilization.items())},
+        "divergent_branches": {str(k): n for k, n in sorted(divergent.items())},
+        "issued": {str(k): n for k, n in sorted(issued.items())},
+    }
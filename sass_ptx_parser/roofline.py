@@ -0,0 +1,103 @@
+# roofline.py
+#
+# Runtime estimate of a launch from what the simulation counted. Global
+# memory moves whole 32-byte sectors, so the DRAM traffic is the warp_stats
+# sector count times 32, and the memory time is that traffic over the
+# device bandwidth. The compute time is the warp instructions the IR issued
+# (warp_execution) over the issue rate of the SMs the grid occupies: one
+# warp instruction per cycle per scheduler. The slower of the two bounds the
+# kernel; arithmetic intensity is warp instructions per DRAM byte and the
+# ridge point is where both times are equal.
+#
+# Bytes the instructions requested, moved without waste, give the memory
+# time of perfectly coalesced accesses; potential_speedup compares the
+# estimate against it, which ranks kernels by what fixing their access
+# patterns could gain. Counts of a partial run are scaled to the whole grid:
+# under --sample to the extrapolated sectors, requested bytes and issued
+# instructions of the sampling estimates, spread over the instructions in
+# their simulated proportions; otherwise by the share of warps simulated.
+
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+SECTOR_BYTES = 32
+# Warp instructions issued per cycle and SM (four schedulers from Maxwell on)
+WARP_SCHEDULERS = 4
+
+def tally_sectors(records: Iterable[Dict[str, Any]], sectors: Counter) -> Iterator[Dict[str, Any]]:
+    """Pass warp_stats records through, adding up their sectors per instruction."""
+    for r in records:
+        sectors[r["instr_idx"]] += r["sectors"]
+        yield r
+
+def _us(seconds: float) -> float:
+    return round(seconds * 1e6, 3)
+
+def _ratio(total: float, part: float) -> float:
+    return total / part if part else 0.0
+
+def estimate(instructions: List[Dict], sectors: Counter, warp_exec: Dict[str, Any], grid_blocks: int,
+             num_warps: int, device: Dict[str, Any], sampled: Optional[Dict[str, Any]] = None
+             ) -> Optional[Dict[str, Any]]:
+    """
+    Memory- and compute-bound times of a launch. `instructions` is
+    utils.memory_instructions() of the global trace, `sectors` the tally of
+    its warp_stats, `warp_exec` summarize_warp_execution(), `device`
+    occupancy.device_limits() and `sampled` the estimates of
+    sampling.sample_launch() when only some blocks ran; None when the
+    device has no bandwidth or clock.
+    """
+    if not (device.get("bandwidth_gbs") and device.get("clock_ghz") and device.get("sm_count")):
+        return None
+    if sampled is None:
+        scale = num_warps / warp_exec["num_warps"] if warp_exec["num_warps"] else 1.0
+        sector_scale = byte_scale = issue_scale = scale
+    else:
+        sector_scale = _ratio(sampled["sectors"]["estimate"], sum(sectors[i["instr_idx"]] for i in instructions))
+        byte_scale = _ratio(sampled["requested_bytes"]["estimate"], sum(i["bytes"] for i in instructions))
+        issue_scale = _ratio(sampled["issued"]["estimate"], warp_exec["issued"])
+    bandwidth = device["bandwidth_gbs"] * 1e9
+    active_sms = min(device["sm_count"], grid_blocks)
+    issue_rate = active_sms * WARP_SCHEDULERS * device["clock_ghz"] * 1e9
+
+    per_instr = []
+    for i in instructions:
+        dram = sectors[i["instr_idx"]] * SECTOR_BYTES * sector_scale
+        requested = i["bytes"] * byte_scale
+        per_instr.append({
+            "instr_idx": i["instr_idx"],
+            "instruction": i["instruction"],
+            "access_size": i["access_size"],
+            "requested_bytes": round(requested),
+            "sectors": round(sectors[i["instr_idx"]] * sector_scale),
+            "dram_bytes": round(dram),
+            "efficiency": round(requested / dram, 3) if dram else 1.0,
+            "memory_time_us": _us(dram / bandwidth),
+        })
+
+    issued = warp_exec["issued"] * issue_scale
+    dram = sum(i["dram_bytes"] for i in per_instr)
+    requested = sum(i["requested_bytes"] for i in per_instr)
+    memory_time = dram / bandwidth
+    compute_time = issued / issue_rate
+    estimated = max(memory_time, compute_time)
+    ideal = max(min(requested, dram) / bandwidth, compute_time)
+    return {
+        "device": device["device"],
+        "sm_count": device["sm_count"],
+        "active_sms": active_sms,
+        "bandwidth_gbs": device["bandwidth_gbs"],
+        "clock_ghz": device["clock_ghz"],
+        "issued_instructions": round(issued),
+        "requested_bytes": requested,
+        "dram_bytes": dram,
+        "memory_time_us": _us(memory_time),
+        "compute_time_us": _us(compute_time),
+        "estimated_time_us": _us(estimated),
+        "bound": "memory" if memory_time >= compute_time else "compute",
+        "arithmetic_intensity": round(issued / dram, 4) if dram else None,
+        "ridge_point": round(issue_rate / bandwidth, 4),
+        "coalesced_time_us": _us(ideal),
+        "potential_speedup": round(estimated / ideal, 3) if ideal else 1.0,
+        "instructions": per_instr,
+    }
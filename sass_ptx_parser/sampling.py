@@ -0,0 +1,319 @@
+# sampling.py
+#
+# Sampled simulation: only a stratified subset of blocks runs, and per-block
+# metrics are extrapolated to the whole grid with 95% confidence intervals.
+# Blocks where the launch changes behaviour (bounds checks cutting through a
+# block, partially used warps) are located by bisection and simulated
+# exactly, so the random sample only has to cover homogeneous runs of blocks.
+#
+# Bytes that neighbouring blocks both touch (a stencil halo, a shared
+# counter) count once: a block's used_bytes are the bytes the block before
+# it does not touch. That block is compared directly when it was simulated;
+# otherwise the block's own ranges, moved back by the per-block shift of its
+# stratum (how far the stratum's end blocks start apart, per buffer), stand
+# in for it. The footprint is a span, not a sum over blocks: it comes from
+# the sampled ranges, whose extremes lie in the stratum end blocks that
+# always run. Samples are whole blocks, since the warps of a block share
+# memory and barriers. The sections listed under not_estimated cover the
+# simulated blocks only.
+
+import math
+import random
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import chain
+from typing import Any, Dict, List, Optional, Tuple
+from access_trace import AccessTrace
+from params import assign_buffers
+from simulator import simulate_launch, iter_warp_usage
+from spill import SpilledTrace
+from utils import strided_ranges, merge_ranges, buffer_usage
+
+Z_95 = 1.96
+
+METRICS = ("accesses", "requested_bytes", "used_bytes", "warp_requests", "coalesced_requests", "sectors",
+           "partial_requests", "issued")
+# Report sections computed from the simulated blocks, not extrapolated
+NOT_ESTIMATED = ("warp_stats", "warp_summary", "memory_writes", "memory_writes_summary", "control_flow",
+                 "shared_memory", "address_conflicts", "memory_summary.instructions", "memory_events")
+
+def block_metrics(trace: AccessTrace, blocks: List[int], warp_exec: List[Dict[str, Any]] = ()
+                  ) -> Tuple[Dict[int, Dict[str, int]], Dict[int, List[Tuple[int, int]]]]:
+    """
+    Per-block totals over the global-memory accesses of a trace and the
+    warp instructions of `warp_exec`, and the merged byte ranges of every
+    block. used_bytes is left at 0: it depends on the neighbouring blocks
+    (see _used_bytes).
+    """
+    trace = trace.select(space="global")
+    metrics = {b: dict.fromkeys(METRICS, 0) for b in blocks}
+    ranges = {b: [] for b in blocks}
+    for part in trace.chunks():
+        rows = defaultdict(list)
+        for i, b in enumerate(part.block):
+            rows[b].append(i)
+            metrics[b]["accesses"] += part.count[i]
+            metrics[b]["requested_bytes"] += part.count[i] * part.size[i]
+        for b, idx in rows.items():
+            ranges[b] = strided_ranges(part.take(idx))
+
+    for stat in iter_warp_usage(trace):
+        m = metrics[stat["warp_id"] // trace.warps_per_block]
+        m["warp_requests"] += stat["iterations"]
+        m["coalesced_requests"] += stat["coalesced_iterations"]
+        m["sectors"] += stat["sectors"]
+        m["partial_requests"] += not stat["fully_utilized"]
+    for w in warp_exec:
+        metrics[w["warp_id"] // trace.warps_per_block]["issued"] += w["issued"]
+    return metrics, ranges
+
+def _windows(ranges: List[Tuple[int, int]], bases: List[int]) -> Dict[int, List[Tuple[int, int]]]:
+    """Ranges cut at the buffer bases, per window (0 below every buffer, k from the k-th base on)."""
+    out = defaultdict(list)
+    for lo, hi in ranges:
+        while lo < hi:
+            k = bisect_right(bases, lo)
+            cut = min(hi, bases[k]) if k < len(bases) else hi
+            out[k].append((lo, cut))
+            lo = cut
+    return out
+
+def _overlap(a: List[Tuple[int, int]], b: List[Tuple[int, int]]) -> int:
+    """Bytes two sorted lists of disjoint ranges have in common."""
+    i = j = common = 0
+    while i < len(a) and j < len(b):
+        common += max(0, min(a[i][1], b[j][1]) - max(a[i][0], b[j][0]))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return common
+
+def _used_bytes(windows: Dict[int, Dict[int, List[Tuple[int, int]]]], segments: List[Tuple[int, int]]
+                ) -> Dict[int, Dict[int, int]]:
+    """Per simulated block and window, the bytes the block before it does not touch."""
+    starts = [lo for lo, _ in segments]
+    used = {}
+    for b, wins in windows.items():
+        lo, hi = segments[max(0, bisect_left(starts, b) - 1)]
+        used[b] = {}
+        for w, ranges in wins.items():
+            if b - 1 in windows:
+                before = windows[b - 1].get(w, [])
+            elif lo < b and windows[lo].get(w) and windows[hi].get(w):
+                shift = round((windows[hi][w][0][0] - windows[lo][w][0][0]) / (hi - lo))
+                before = [(a - shift, c - shift) for a, c in ranges]
+            else:
+                before = []
+            used[b][w] = sum(c - a for a, c in ranges) - _overlap(ranges, before)
+    return used
+
+def _signature(m: Dict[str, int]) -> Tuple[int, int]:
+    return m["accesses"], m["partial_requests"]
+
+def _stratum_total(values: List[float], population: int, proxies: List[float]) -> Tuple[float, float]:
+    """Expanded total and its variance for one stratum (with finite population correction)."""
+    if population == 0:
+        return 0.0, 0.0
+    sample = values if values else proxies
+    mean = sum(sample) / len(sample)
+    spread = sample if len(sample) > 1 else sample + proxies
+    var = 0.0
+    if len(spread) > 1:
+        m = sum(spread) / len(spread)
+        s2 = sum((v - m) ** 2 for v in spread) / (len(spread) - 1)
+        n = max(1, len(values))
+        var = population ** 2 * (1 - min(n, population) / population) * s2 / n
+    return population * mean, var
+
+class _Sampler:
+    def __init__(self, ir, grid_dim, block_dim, base_address, summarize_loops, params=None,
+                 memory_budget: Optional[int] = None):
+        self.args = (ir, grid_dim, block_dim, base_address, summarize_loops)
+        self.params = params
+        self.memory_budget = memory_budget
+        self.metrics: Dict[int, Dict[str, int]] = {}
+        self.ranges: Dict[int, List[Tuple[int, int]]] = {}
+        self.runs = []
+
+    def simulate(self, blocks):
+        blocks = sorted(set(blocks) - set(self.metrics))
+        if not blocks:
+            return
+        trace, warp_exec, loops = simulate_launch(*self.args, blocks=blocks, params=self.params,
+                                                  memory_budget=self.memory_budget)
+        metrics, ranges = block_metrics(trace, blocks, warp_exec)
+        self.metrics.update(metrics)
+        self.ranges.update(ranges)
+        self.runs.append((trace, warp_exec, loops))
+
+    def sig(self, b):
+        return _signature(self.metrics[b])
+
+def _merge_runs(runs, grid_dim, block_dim, base_address, memory_budget: Optional[int] = None):
+    """
+    Combine the traces, warp stats and loop stats of several partial runs;
+    under a memory budget the combined trace spills when any run did or
+    their rows together exceed it.
+    """
+    if memory_budget is not None and (any(isinstance(t, SpilledTrace) for t, _, _ in runs)
+                                      or sum(t.nbytes for t, _, _ in runs) > memory_budget):
+        trace = SpilledTrace(grid_dim, block_dim, base_address)
+        for part in chain.from_iterable(t.chunks() for t, _, _ in runs):
+            trace.append(part)
+    else:
+        trace = AccessTrace(grid_dim, block_dim, base_address)
+        for part, _, _ in runs:
+            for name, _ in AccessTrace.COLUMNS:
+                getattr(trace, name).extend(getattr(part, name))
+            trace.value.extend(part.value)
+            trace.ops.update(part.ops)
+
+    warp_exec = sorted((w for _, ws, _ in runs for w in ws), key=lambda w: w["warp_id"])
+
+    loops = [dict(info) for info in runs[0][2]] if runs else []
+    for loop, parts in zip(loops, zip(*(r[2] for r in runs))):
+        seen = [p for p in parts if "entries" in p]
+        if seen:
+            entries = sum(p["entries"] for p in seen)
+            loop.update({
+                "entries": entries,
+                "summarized_lanes": sum(p["summarized_lanes"] for p in seen),
+                "min_trips": min(p["min_trips"] for p in seen),
+                "max_trips": max(p["max_trips"] for p in seen),
+                "avg_trips": round(sum(p["avg_trips"] * p["entries"] for p in seen) / entries, 2),
+            })
+    return trace, warp_exec, loops
+
+def sample_launch(ir, grid_dim, block_dim, base_address, fraction: float, seed: int = 0,
+                  summarize_loops: bool = True, params=None, memory_budget: Optional[int] = None):
+    """
+    Simulate about `fraction` of the blocks and extrapolate to the grid.
+
+    Blocks are split into contiguous strata (neighbouring blocks tend to
+    behave alike). The first and last block of each stratum are simulated;
+    where their signature (accesses, partially used warp requests) differs,
+    the stratum is bisected until the blocks where it changes are found, and
+    all of these run exactly. The remaining budget is spread over the runs of
+    equal-signature blocks in between as a seeded random sample.
+
+    Returns (trace, warp_exec, loops, report) where the first three cover the
+    simulated blocks only, as simulate_launch() would return them.
+    """
+    sampler = _Sampler(ir, grid_dim, block_dim, base_address, summarize_loops, params, memory_budget)
+    rng = random.Random(seed)
+    num_blocks = AccessTrace(grid_dim, block_dim).grid_dim
+    budget = max(1, min(num_blocks, math.ceil(fraction * num_blocks)))
+
+    strata = max(1, budget // 4)
+    bounds = [num_blocks * k // strata for k in range(strata + 1)]
+    segments = [(lo, hi - 1) for lo, hi in zip(bounds, bounds[1:]) if hi > lo]
+    sampler.simulate([b for seg in segments for b in seg])
+
+    # Bisect every stratum whose ends disagree down to the changing blocks
+    while True:
+        split = [(lo, hi) for lo, hi in segments if hi - lo > 1 and sampler.sig(lo) != sampler.sig(hi)]
+        if not split:
+            break
+        sampler.simulate([(lo + hi) // 2 for lo, hi in split])
+        segments = [part for lo, hi in segments
+                    for part in (((lo, (lo + hi) // 2), ((lo + hi) // 2, hi)) if (lo, hi) in split else ((lo, hi),))]
+
+    exact = set(sampler.metrics)
+    interiors = [[b for b in range(lo + 1, hi) if b not in exact] for lo, hi in segments]
+    remaining = max(0, budget - len(exact))
+    population = sum(len(u) for u in interiors)
+    picks = []
+    for units in interiors:
+        k = min(len(units), round(remaining * len(units) / population)) if population else 0
+        picks.append(rng.sample(units, k))
+    sampler.simulate([b for p in picks for b in p])
+
+    buffers = params if params is not None else assign_buffers(ir, base_address)
+    bases = sorted(b["base"] for b in buffers if "base" in b)
+    used = _used_bytes({b: _windows(r, bases) for b, r in sampler.ranges.items()}, segments)
+    for b, per_window in used.items():
+        sampler.metrics[b]["used_bytes"] = sum(per_window.values())
+
+    def extrapolate(value) -> Tuple[float, float]:
+        """Grid total of a per-block quantity, and its variance."""
+        total = sum(value(b) for b in exact)
+        var = 0.0
+        for (lo, hi), units, picked in zip(segments, interiors, picks):
+            t, v = _stratum_total([value(b) for b in picked], len(units), [value(lo), value(hi)])
+            total += t
+            var += v
+        return total, var
+
+    def interval(total: float, var: float) -> Dict[str, Any]:
+        half = Z_95 * math.sqrt(var)
+        return {"estimate": round(total, 1), "ci95": [round(max(0.0, total - half), 1), round(total + half, 1)]}
+
+    estimates = {name: interval(*extrapolate(lambda b: sampler.metrics[b][name])) for name in METRICS}
+
+    # Coalescing ratio as a ratio estimator: its error comes from the residuals
+    requests = estimates["warp_requests"]["estimate"]
+    ratio = estimates["coalesced_requests"]["estimate"] / requests if requests else 0.0
+    var = extrapolate(lambda b: sampler.metrics[b]["coalesced_requests"]
+                                - ratio * sampler.metrics[b]["warp_requests"])[1]
+    half = Z_95 * math.sqrt(var) / requests if requests else 0.0
+    estimates["coalescing_ratio"] = {"estimate": round(ratio, 4),
+                                     "ci95": [round(max(0.0, ratio - half), 4), round(min(1.0, ratio + half), 4)]}
+
+    # Footprint per buffer from the sampled span, used bytes extrapolated per window
+    records, totals = buffer_usage(merge_ranges(chain.from_iterable(sampler.ranges.values())), buffers)
+    estimates["footprint_bytes"] = {"estimate": totals["footprint_bytes"]}
+    estimates["efficiency"] = _efficiency(estimates["used_bytes"], totals["footprint_bytes"])
+    per_buffer = []
+    for k, record in enumerate(records, 1):
+        used_k = interval(*extrapolate(lambda b: used[b].get(k, 0)))
+        per_buffer.append({"name": record["name"], "footprint_bytes": record["footprint_bytes"],
+                           "used_bytes": used_k, "efficiency": _efficiency(used_k, record["footprint_bytes"])})
+    estimates["buffers"] = per_buffer
+
+    # Edge blocks: where the signature changes, the side with more partly used warps
+    partial = lambda b: sampler.metrics[b]["partial_requests"]
+    edge_blocks = sorted(b for b in exact
+                         if any(sampler.sig(b) != sampler.sig(n) and partial(b) > partial(n)
+                                for n in (b - 1, b + 1) if n in sampler.metrics))
+    report: Dict[str, Any] = {
+        "fraction": fraction,
+        "seed": seed,
+        "num_blocks": num_blocks,
+        "simulated_blocks": len(sampler.metrics),
+        "exact_blocks": len(exact),
+        "strata": len(segments),
+        "edge_blocks": edge_blocks,
+        "estimates": estimates,
+        "not_estimated": list(NOT_ESTIMATED),
+    }
+    return (*_merge_runs(sampler.runs, grid_dim, block_dim, base_address, memory_budget), report)
+
+def _efficiency(used: Dict[str, Any], footprint: int) -> Dict[str, Any]:
+    """Used bytes over the footprint, with the interval of the used-bytes estimate."""
+    if not footprint:
+        return {"estimate": 1.0, "ci95": [1.0, 1.0]}
+    ratio = lambda v: round(min(1.0, v / footprint), 3)
+    return {"estimate": ratio(used["estimate"]), "ci95": [ratio(v) for v in used["ci95"]]}
+
+def apply_estimates(buffers: List[Dict], footprint: Dict[str, Any], report: Dict[str, Any]
+                    ) -> Tuple[List[Dict], Dict[str, Any]]:
+    """
+    utils.buffer_usage() records and totals of a sampled trace with the used
+    bytes, footprint and efficiency of the whole grid from `report`.
+    """
+    estimates = report["estimates"]
+    by_name = {b["name"]: b for b in estimates["buffers"]}
+    out = []
+    for record in buffers:
+        e = by_name.get(record["name"])
+        if e is not None:
+            used = round(e["used_bytes"]["estimate"])
+            record = {**record, "used_bytes": used, "footprint_bytes": e["footprint_bytes"],
+                      "efficiency": e["efficiency"]["estimate"],
+                      "density": round(min(1.0, used / e["footprint_bytes"]), 2) if e["footprint_bytes"] else None}
+        out.append(record)
+    used = round(estimates["used_bytes"]["estimate"])
+    total = estimates["footprint_bytes"]["estimate"]
+    return out, {**footprint, "footprint_bytes": total, "used_bytes": used,
+                 "wasted_bytes": max(0, total - used), "efficiency": estimates["efficiency"]["estimate"]}
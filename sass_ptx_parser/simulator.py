@@ -1,92 +1,528 @@
 # simulator.py
 
-from collections import defaultdict
-from typing import List, Dict, Any
-from evaluator import evaluate_instruction
-from utils import check_warp_coalescing
-
-def simulate_launch(ir, grid_dim_x, block_dim_x, base_address) -> List[Dict[str, Any]]:
-    accesses = []
-
-    for ctaid_x in range(grid_dim_x):
-        for tid_x in range(block_dim_x):
-            regs = {
-                "ctaid.x": ctaid_x,
-                "ntid.x": block_dim_x,
-                "tid.x": tid_x,
-                "out": base_address,
-                "input_size": 1234,
-                #"rd1": base_address,
-                #"rd2": base_address,
-            }
-            #print("DEGUG: BASE:", base_address)
-            address = None
-            written_value = None
-
-            for instr in ir:
-                result = evaluate_instruction(instr, regs)
-                if result is not None:
-                    if isinstance(result, dict) and "address" in result:
-                        address = result["address"]
-                        written_value = result.get("written_value", "unk")
-                    else:
-                        address = result
-
-
-            if address is not None:
-                global_idx = ctaid_x * block_dim_x + tid_x
-                warp_id = global_idx // 32
-
-
-                if written_value is not None:
-                    accesses.append({
-                        "blockIdx.x": ctaid_x,
-                        "threadIdx.x": tid_x,
-                        "warp_id": warp_id,
-                        "globalIdx": global_idx,
-                        "address": address,
-                        "written_value": written_value,
-                        "memory_offset": (address - base_address) // 4  # assume 4-byte words
-                    })
+from collections import defaultdict, Counter
+from itertools import chain, repeat
+from math import gcd
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+from evaluator import evaluate_instruction, guard, lanes, resolve, write, unsigned_width
+from cfg import build_cfg, find_loops, analyze_loop
+from access_trace import AccessTrace, Dim3, dim3, unravel
+from utils import check_warp_coalescing, count_sectors, warp_requests
+from spill import SpilledTrace
+from params import assign_buffers, launch_values
+import profiling
+
+# Threads simulated together; whole blocks are batched up to this size
+CHUNK_THREADS = 1 << 16
+
+# IR ops that are not instructions of their own: labels, declarations and
+# the carry output of an IADD3 / LEA
+NON_ISSUING = ("label", "decl.shared", "decl.param", "carry.u32")
+
+# Comparisons a summarized loop can exit on, and their negations (@!p bra)
+NEGATED_COMPARE = {"lt": "ge", "le": "gt", "gt": "le", "ge": "lt", "eq": "ne", "ne": "eq",
+                   "lo": "hs", "ls": "hi", "hi": "ls", "hs": "lo"}
+UNSIGNED_COMPARE = {"lo": "lt", "ls": "le", "hi": "gt", "hs": "ge"}
+
+def _tile(inner: int, extent: int, outer: int):
+    """
+    Index column where each value of range(extent) repeats for `inner`
+    consecutive threads, the whole pattern tiled `outer` times; built with
+    list repetition so no per-thread tuples exist. Extent 1 stays uniform.
+    """
+    if extent == 1:
+        return 0
+    return list(chain.from_iterable(repeat(v, inner) for v in range(extent))) * outer
+
+def _launch_registers(blocks: List[int], grid_dim: Dim3, block_dim: Dim3, params: Dict[str, Any]) -> Dict[str, Any]:
+    bx, by, bz = block_dim
+    per_block = bx * by * bz
+    regs = {
+        "tid.x": _tile(1, bx, by * bz * len(blocks)),
+        "tid.y": _tile(bx, by, bz * len(blocks)),
+        "tid.z": _tile(bx * by, bz, len(blocks)),
+        "pt": True,
+        **params,
+    }
+    coords = [unravel(b, grid_dim) for b in blocks]
+    for d, axis in enumerate("xyz"):
+        regs[f"ntid.{axis}"] = block_dim[d]
+        regs[f"nctaid.{axis}"] = grid_dim[d]
+        regs[f"ctaid.{axis}"] = list(chain.from_iterable(repeat(c[d], per_block) for c in coords)) \
+            if grid_dim[d] > 1 else 0
+    return regs
+
+def _trip_count(cmp: str, negated: bool, g0, dg):
+    """
+    Trips of a loop that keeps going while cmp(g(k), 0) != negated, where
+    g(k) = g0 + k * dg is (src1 - src2) of the exit test after iteration k.
+    The caller has seen iterations 0 and 1 continue. None when the loop does
+    not terminate, the values are not integers or the comparison is not one
+    of NEGATED_COMPARE.
+    """
+    if not isinstance(g0, int) or not isinstance(dg, int) or dg == 0:
+        return None
+    if negated:
+        cmp = NEGATED_COMPARE.get(cmp)
+    # The evaluator compares the unsigned forms as plain integers too
+    cmp = UNSIGNED_COMPARE.get(cmp, cmp)
+    if cmp == "lt" and dg > 0:
+        k = (-g0 + dg - 1) // dg
+    elif cmp == "le" and dg > 0:
+        k = (-g0) // dg + 1
+    elif cmp == "gt" and dg < 0:
+        k = (g0 - dg - 1) // -dg
+    elif cmp == "ge" and dg < 0:
+        k = g0 // -dg + 1
+    elif cmp == "ne" and -g0 % dg == 0 and -g0 // dg >= 2:
+        k = -g0 // dg
+    else:
+        return None
+    return max(k, 2) + 1
+
+class _Chunk:
+    """
+    A batch of blocks run with per-lane program counters. The lowest pending
+    basic block always runs next, for exactly the lanes waiting on it: within
+    one warp this is the usual min-PC reconvergence scheme, so diverged
+    paths execute one after another under partial active masks.
+    """
+
+    def __init__(self, ir, cfg, loops, blocks, grid_dim, block_dim, params,
+                 trace, warp_exec, loop_stats, evaluate=None, traced=None):
+        self.ir, self.cfg, self.loops = ir, cfg, loops
+        self.evaluate, self.traced = evaluate, traced
+        self.trace, self.warp_exec, self.loop_stats = trace, warp_exec, loop_stats
+        self.regs = _launch_registers(blocks, grid_dim, block_dim, params)
+        # Linear block / thread ids; warps are consecutive runs of 32 linear threads
+        per_block = trace.block_dim
+        self.block_col = list(chain.from_iterable(repeat(b, per_block) for b in blocks))
+        self.tid_col = list(range(per_block)) * len(blocks)
+        self.n = n = len(self.block_col)
+        warps_per_block = trace.warps_per_block
+        self.warp_col = list(chain.from_iterable(
+            repeat(b * warps_per_block + w, min(32, per_block - 32 * w))
+            for b in blocks for w in range(warps_per_block)))
+        self.by_label = {b["label"]: b["id"] for b in cfg if b["label"] is not None}
+        self.counters = profiling.active().counters if profiling.active() else None
+        self.path = [0] * n       # instructions issued while the lane was active
+        self.executed = [0] * n   # instructions whose guard let the lane execute
+
+    def run(self):
+        pending = {0: list(range(self.n))} if self.cfg else {}
+        while pending:
+            bid = min(pending)
+            active = sorted(pending.pop(bid))
+            if bid in self.loops:
+                groups = self._run_loop(bid, active)
+            else:
+                groups = self._run_block(bid, active)
+
+            groups = [(succ, lanes) for succ, lanes in groups if lanes]
+            if len(groups) > 1:
+                seen = Counter(w for _, lanes in groups for w in {self.warp_col[i] for i in lanes})
+                for w, paths in seen.items():
+                    if paths > 1:
+                        self.warp_exec[w]["divergent_branches"] += 1
+
+            for succ, lanes in groups:
+                if succ is not None:
+                    pending.setdefault(succ, []).extend(lanes)
+
+        for i, w in enumerate(self.warp_col):
+            stats = self.warp_exec[w]
+            stats["block"] = self.block_col[i]
+            stats["num_threads"] += 1
+            stats["active_lane_slots"] += self.executed[i]
+            stats["longest_path"] = max(stats["longest_path"], self.path[i])
+
+    def _length(self, bid) -> int:
+        blk = self.cfg[bid]
+        return sum(1 for k in range(blk["start"], blk["end"]) if self.ir[k]["op"] not in NON_ISSUING)
+
+    def _record(self, k, instr, access):
+        hit = access["lanes"]
+        self.trace.extend(k, instr["op"],
+                          [self.block_col[i] for i in hit],
+                          [self.tid_col[i] for i in hit],
+                          access["address"], access["access_size"],
+                          access["space"], access["access_type"], access["value"])
+
+    def _execute(self, bid, active, record, watch=None):
+        """
+        Execute block `bid` for `active`; returns the lanes that took its
+        branch and the lanes that exited. If `watch` names an instruction,
+        its per-lane source operands are stored in watch["operands"].
+        """
+        blk = self.cfg[bid]
+        regs, n = self.regs, self.n
+        unguarded = 0
+        taken, exiting = [], []
+        for k in range(blk["start"], blk["end"]):
+            instr = self.ir[k]
+            on = guard(instr, regs, active)
+            if instr["op"] not in NON_ISSUING:
+                if instr.get("pred") is None:
+                    unguarded += 1
                 else:
-                    accesses.append({
-                        "blockIdx.x": ctaid_x,
-                        "threadIdx.x": tid_x,
-                        "warp_id": warp_id,
-                        "globalIdx": global_idx,
-                        "address": address
-                    })
-
-    #print(f"DEBUG: Accesses: {accesses[0]}")
-    return accesses
-
-def analyze_warp_usage(accesses):
-    warps = defaultdict(list)
+                    for i in on:
+                        self.executed[i] += 1
+            if not on:
+                continue
+            if self.counters is not None and instr["op"] not in NON_ISSUING:
+                self.counters["op." + instr["op"].split(".")[0]] += len(on)
 
-    for entry in accesses:
-        warp_key = (entry["blockIdx.x"], entry["warp_id"])
-        warps[warp_key].append(entry)
+            if instr["op"] == "bra":
+                taken = on
+            elif instr["op"] == "exit":
+                exiting = on
+            elif self.evaluate is not None and k not in self.evaluate:
+                continue
+            else:
+                if watch is not None and k == watch["instr_idx"]:
+                    x, y = (lanes(resolve(instr[s], regs), on) for s in ("src1", "src2"))
+                    watch["operands"] = dict(zip(on, zip(x, y)))
+                access = evaluate_instruction(instr, regs, on, n)
+                if access is not None and (self.traced is None or k in self.traced):
+                    record(k, instr, access)
+        for i in active:
+            self.executed[i] += unguarded
+        return taken, exiting
 
-    result = []
-    for (block, warp), threads in warps.items():
-        thread_ids = sorted(t["threadIdx.x"] for t in threads)
-        addresses = sorted(t["address"] for t in threads)
-        contiguous = all(
-            b - a == 4 for a, b in zip(addresses, addresses[1:])
-        )
-        coalesced = check_warp_coalescing(threads)
+    def _issue(self, trips: Dict[int, int], length: int):
+        """Charge `length` issue slots per trip; a warp issues for its slowest lane."""
+        slowest = defaultdict(int)
+        for i, t in trips.items():
+            self.path[i] += t * length
+            w = self.warp_col[i]
+            slowest[w] = max(slowest[w], t)
+        for w, t in slowest.items():
+            self.warp_exec[w]["issued"] += t * length
+
+    def _run_block(self, bid, active):
+        blk = self.cfg[bid]
+        self._issue(dict.fromkeys(active, 1), self._length(bid))
+        taken, exiting = self._execute(bid, active, self._record)
+
+        # Route lanes to their successors; None means the lanes exit, as they
+        # do on a branch to a missing label
+        fallthrough = bid + 1 if bid + 1 < len(self.cfg) else None
+        leaving = set(taken) | set(exiting)
+        rest = [i for i in active if i not in leaving] if leaving else active
+        groups = [(fallthrough, rest)]
+        if taken:
+            groups.append((self.by_label.get(self.ir[blk["end"] - 1]["target"]), taken))
+        if exiting:
+            groups.append((None, exiting))
+        return groups
+
+    def _run_loop(self, bid, active):
+        """
+        Run a summarizable single-block loop (see cfg.analyze_loop). Two
+        iterations execute concretely; their difference gives every affine
+        register and address a per-lane step, and the exit test then yields
+        the trip count in closed form. Remaining iterations are not executed:
+        registers jump to their final values and each memory instruction
+        becomes one strided trace row per lane. Lanes whose trip count cannot
+        be solved keep iterating concretely.
+        """
+        info = self.loops[bid]
+        regs, n = self.regs, self.n
+        test = info["exit_test"]
+        cmp = test["op"].split(".")[1]
+        width = unsigned_width(test["op"])
+        mask = (1 << width) - 1 if width is not None else None
+        seen = [defaultdict(dict), defaultdict(dict)]   # iteration -> instr -> lane -> (addr, value)
+        meta = {}
+
+        def recorder(it):
+            def record(k, instr, access):
+                meta[k] = (instr["op"], access["access_size"], access["space"], access["access_type"])
+                values = access["value"] or [None] * len(access["lanes"])
+                seen[it][k].update(zip(access["lanes"], zip(access["address"], values)))
+            return record
+
+        watch = [{"instr_idx": test["instr_idx"]}, {"instr_idx": test["instr_idx"]}]
+        trips = dict.fromkeys(active, 1)
+        second, _ = self._execute(bid, active, recorder(0), watch[0])
+        before = {r: dict(zip(second, lanes(regs.get(r), second))) for r in info["affine"]}
+        solved, looping = {}, []
+        if second:
+            for i in second:
+                trips[i] = 2
+            again, _ = self._execute(bid, second, recorder(1), watch[1])
+            for i in again:
+                (x0, y0), (x1, y1) = watch[0]["operands"][i], watch[1]["operands"][i]
+                try:
+                    t = _trip_count(cmp, test["negated"], x0 - y0, (x1 - y1) - (x0 - y0))
+                    # An unsigned test is solved on the unwrapped values, so both
+                    # operands have to stay inside the type on the first and last test
+                    if t is not None and width is not None and not all(
+                            0 <= v + (t - 1) * (v1 - v) <= mask and 0 <= v <= mask
+                            for v, v1 in ((x0, x1), (y0, y1))):
+                        t = None
+                except TypeError:
+                    t = None
+                if t is None:
+                    looping.append(i)
+                else:
+                    solved[i] = t
 
-        start_addr = addresses[0]
-        end_anddr = addresses[-1]
+        if solved:
+            lanes_ = sorted(solved)
+            for r in info["affine"]:
+                after = lanes(regs.get(r), lanes_)
+                final = []
+                for i, v1 in zip(lanes_, after):
+                    v0 = before[r].get(i)
+                    try:
+                        final.append(v1 + (solved[i] - 2) * (v1 - v0))
+                    except TypeError:
+                        final.append(None)
+                write(regs, r, final, lanes_, n)
+            for r in info["varying"]:
+                write(regs, r, None, lanes_, n)
+            write(regs, self.ir[self.cfg[bid]["end"] - 1]["pred"], test["negated"], lanes_, n)
+            # Summarized iterations run the whole body; the last skips the branch
+            length = self._length(bid)
+            for i, t in solved.items():
+                trips[i] = t
+                self.executed[i] += (t - 2) * length - 1
+            profiling.count("summarized_iterations", sum(solved.values()) - 2 * len(solved))
 
+        # Strided rows for every lane that ran at least one summarized iteration
+        for k in sorted(meta):
+            op, size, space, kind = meta[k]
+            rows = defaultdict(list)
+            for i, (a0, v0) in sorted(seen[0][k].items()):
+                count, stride, value = 1, 0, v0
+                if i in solved and i in seen[1][k]:
+                    a1, v1 = seen[1][k][i]
+                    count, stride, value = solved[i], a1 - a0, v0 if v0 == v1 else None
+                rows["lanes"].append(i)
+                rows["address"].append(a0)
+                rows["value"].append(value)
+                rows["stride"].append(stride)
+                rows["count"].append(count)
+            for i, (a1, v1) in sorted(seen[1][k].items()):
+                if i not in solved:
+                    rows["lanes"].append(i)
+                    rows["address"].append(a1)
+                    rows["value"].append(v1)
+                    rows["stride"].append(0)
+                    rows["count"].append(1)
+            if rows:
+                hit = rows["lanes"]
+                self.trace.extend(k, op, [self.block_col[i] for i in hit], [self.tid_col[i] for i in hit],
+                                  rows["address"], size, space, kind,
+                                  rows["value"] if kind != "read" else None, rows["stride"], rows["count"])
+
+        # Lanes without a closed-form trip count iterate one by one
+        while looping:
+            for i in looping:
+                trips[i] += 1
+            looping, _ = self._execute(bid, looping, self._record)
+
+        self._issue(trips, self._length(bid))
+        ts = self.loop_stats[bid]
+        ts["lanes"] += len(trips)
+        ts["summarized_lanes"] += len(solved)
+        ts["trips"] += sum(trips.values())
+        ts["min_trips"] = min(ts["min_trips"], min(trips.values()))
+        ts["max_trips"] = max(ts["max_trips"], max(trips.values()))
+
+        by_warp = defaultdict(set)
+        for i, t in trips.items():
+            by_warp[self.warp_col[i]].add(t)
+        for w, counts in by_warp.items():
+            self.warp_exec[w]["divergent_branches"] += len(counts) - 1
+
+        fallthrough = bid + 1 if bid + 1 < len(self.cfg) else None
+        return [(fallthrough, active)]
+
+def simulate_launch(ir, grid_dim, block_dim, base_address, summarize_loops=True,
+                    blocks: Optional[List[int]] = None, memory_budget: Optional[int] = None,
+                    evaluate: Optional[Set[int]] = None, traced: Optional[Set[int]] = None,
+                    params: Optional[List[Dict[str, Any]]] = None
+                    ) -> Tuple[AccessTrace, List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Simulate every thread of the launch, or only the given linear block ids;
+    grid_dim and block_dim are ints or (x, y, z) tuples. Returns the memory
+    access trace, per-warp execution stats (issue slots, lane utilization,
+    divergence) and per-loop info with the trip counts observed at run time.
+    With memory_budget (bytes), a trace that outgrows it is spilled to disk
+    and a spill.SpilledTrace is returned instead.
+
+    `evaluate` restricts the instructions whose results are computed (branches
+    and exits always are) and `traced` the memory instructions that produce
+    trace rows; skipped instructions still issue, so the warp execution stats
+    do not change as long as every value the control flow reads is evaluated.
+
+    `params` are the launch values of the kernel parameters
+    (params.assign_buffers); by default pointer buffers start at base_address.
+    """
+    grid_dim, block_dim = dim3(grid_dim), dim3(block_dim)
+    values = launch_values(params if params is not None else assign_buffers(ir, base_address))
+    with profiling.phase("cfg"):
+        cfg = build_cfg(ir)
+        loops = {loop["header"]: analyze_loop(ir, cfg, loop) for loop in find_loops(cfg)}
+    trace = AccessTrace(grid_dim, block_dim, base_address)
+    warp_exec = defaultdict(lambda: {"issued": 0, "divergent_branches": 0, "num_threads": 0,
+                                     "active_lane_slots": 0, "longest_path": 0})
+
+    summarized = {h: info for h, info in loops.items() if summarize_loops and info["summarizable"]}
+    loop_stats = defaultdict(lambda: {"lanes": 0, "summarized_lanes": 0, "trips": 0,
+                                      "min_trips": float("inf"), "max_trips": 0})
+
+    blocks = sorted(blocks) if blocks is not None else range(trace.grid_dim)
+    max_blocks = max(1, CHUNK_THREADS // trace.block_dim)
+    # Under a budget the first chunk is one block; later chunks are sized from
+    # the trace bytes a block produced so far, so one chunk stays within a
+    # quarter of the budget
+    blocks_per_chunk = 1 if memory_budget is not None else max_blocks
+    spilled = None
+    produced = done = 0
+    with profiling.phase("execute"):
+        first = 0
+        while first < len(blocks):
+            chunk = list(blocks[first:first + blocks_per_chunk])
+            first += len(chunk)
+            before = trace.nbytes if memory_budget is not None else 0
+            _Chunk(ir, cfg, summarized, chunk, grid_dim, block_dim,
+                   values, trace, warp_exec, loop_stats, evaluate, traced).run()
+            profiling.count("blocks_simulated", len(chunk))
+            profiling.count("threads_simulated", len(chunk) * trace.block_dim)
+            if memory_budget is None:
+                continue
+            produced += trace.nbytes - before
+            done += len(chunk)
+            blocks_per_chunk = max(1, min(max_blocks, memory_budget // 4 * done // max(1, produced)))
+            # Spill between chunks only, so every file holds whole blocks
+            if trace.nbytes > memory_budget:
+                if spilled is None:
+                    spilled = SpilledTrace(grid_dim, block_dim, base_address)
+                spilled.append(trace)
+                trace = AccessTrace(grid_dim, block_dim, base_address)
+        if spilled is not None:
+            if len(trace):
+                spilled.append(trace)
+            trace = spilled
+        profiling.count("trace_rows", len(trace))
+        profiling.count("accesses_recorded", trace.num_accesses)
+
+    result = []
+    for w in sorted(warp_exec):
+        stats = warp_exec[w]
+        issued = stats["issued"]
+        bx, by, bz = unravel(stats["block"], grid_dim)
         result.append({
-            "blockIdx.x": block,
-            "warp_id": warp,
+            "blockIdx.x": bx,
+            "blockIdx.y": by,
+            "blockIdx.z": bz,
+            "warp_id": w,
+            "num_threads": stats["num_threads"],
+            "issued": issued,
+            "utilization": round(stats["active_lane_slots"] / (issued * 32), 3) if issued else 0.0,
+            "divergent_branches": stats["divergent_branches"],
+            "divergence_cost": issued - stats["longest_path"],
+        })
+
+    loop_info = []
+    for h, info in loops.items():
+        info = {k: v for k, v in info.items() if k not in ("affine", "varying", "memory")}
+        stats = loop_stats.get(h)
+        if stats is not None:
+            info.update({
+                "entries": stats["lanes"],
+                "summarized_lanes": stats["summarized_lanes"],
+                "min_trips": stats["min_trips"],
+                "max_trips": stats["max_trips"],
+                "avg_trips": round(stats["trips"] / stats["lanes"], 2),
+            })
+        loop_info.append(info)
+
+    return trace, result, loop_info
+
+def summarize_warp_execution(warp_exec: List[Dict[str, Any]]) -> Dict[str, Any]:
+    issued = sum(w["issued"] for w in warp_exec)
+    return {
+        "num_warps": len(warp_exec),
+        "issued": issued,
+        "avg_utilization": round(sum(w["utilization"] * w["issued"] for w in warp_exec) / issued, 3) if issued else 0.0,
+        "divergent_warps": sum(1 for w in warp_exec if w["divergent_branches"]),
+        "divergence_cost": sum(w["divergence_cost"] for w in warp_exec),
+    }
+
+def _iteration_weights(rows, trace: AccessTrace, segment_size: int = 128):
+    """
+    (iteration, weight) pairs that stand for every iteration of a warp's
+    summarized rows. With one shared stride the alignment against a segment
+    repeats every segment_size / gcd(stride, segment_size) iterations; the
+    tail where lanes drop out is listed one by one.
+    """
+    counts = [trace.count[i] for i in rows]
+    full, last = min(counts), max(counts)
+    strides = {trace.stride[i] for i in rows}
+    period = full
+    if len(strides) == 1:
+        period = min(full, segment_size // gcd(abs(strides.pop()), segment_size))
+    weights = [(j, len(range(j, full, period))) for j in range(period)]
+    return weights + [(j, 1) for j in range(full, last)]
+
+def iter_warp_usage(trace: AccessTrace) -> Iterator[Dict[str, Any]]:
+    """Per (block, warp, instruction) access stats, produced one at a time."""
+    # Chunks hold whole blocks, so every warp is complete within one
+    for part in trace.chunks():
+        yield from _chunk_warp_usage(part)
+
+def _chunk_warp_usage(trace: AccessTrace) -> Iterator[Dict[str, Any]]:
+    warps = defaultdict(list)
+
+    for i, key in enumerate(zip(trace.block, trace.warp, trace.instr)):
+        warps[key].append(i)
+
+    # Sorted, so the records come out in the same order however the blocks were chunked
+    for (block, warp, instr), rows in sorted(warps.items()):
+        thread_ids = sorted({trace.thread[i] for i in rows})
+        iterations = coalesced_iterations = sectors = 0
+        start_addr, end_anddr = float("inf"), 0
+        size = trace.size[rows[0]]
+        for request in warp_requests(trace, rows):
+            addresses = sorted(trace.address[i] for i in request)
+            if not iterations:
+                contiguous = all(
+                    b - a == size for a, b in zip(addresses, addresses[1:])
+                )
+            count = max(trace.count[i] for i in request)
+            iterations += count
+            if count == 1:
+                coalesced_iterations += check_warp_coalescing(addresses, size)
+                sectors += count_sectors(addresses, size)
+            else:
+                for j, weight in _iteration_weights(request, trace):
+                    moved = [trace.address[i] + j * trace.stride[i] for i in request if trace.count[i] > j]
+                    coalesced_iterations += weight * check_warp_coalescing(moved, size)
+                    sectors += weight * count_sectors(moved, size)
+            ends = [trace.address[i] + (trace.count[i] - 1) * trace.stride[i] for i in request]
+            start_addr = min(start_addr, addresses[0], min(ends))
+            end_anddr = max(end_anddr, addresses[-1], max(ends))
+
+        bx, by, bz = unravel(block, trace.grid_shape)
+        yield {
+            "blockIdx.x": bx,
+            "blockIdx.y": by,
+            "blockIdx.z": bz,
+            "warp_id": block * trace.warps_per_block + warp,
+            "instr_idx": instr,
             "num_threads": len(thread_ids),
             "fully_utilized": len(thread_ids) == 32,
             "address_range": f"0x{start_addr:08x} - 0x{end_anddr:08x}",
             "contiguous": contiguous,
-            "coalesced": coalesced,
-        })
+            "coalesced": coalesced_iterations == iterations,
+            "iterations": iterations,
+            "coalesced_iterations": coalesced_iterations,
+            "sectors": sectors,
+        }
 
-    return result
\ No newline at end of file
+def analyze_warp_usage(trace: AccessTrace) -> List[Dict[str, Any]]:
+    return list(iter_warp_usage(trace))
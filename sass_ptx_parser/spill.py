@@ -0,0 +1,266 @@
+# spill.py
+#
+# Memory-budgeted execution. When the in-memory trace grows past the budget,
+# simulate_launch() moves it to a trace file (trace_io format, written
+# values included) and starts a new one. The resulting
+# SpilledTrace hands the files back one chunk at a time through chunks(),
+# which the per-warp analyses already iterate; every chunk holds whole
+# blocks, so warp requests never straddle two files. Byte ranges are merged
+# externally: per-chunk ranges collect in memory up to the budget, sorted
+# runs go to disk and a k-way merge streams them into a RangeFile.
+
+import copy
+import heapq
+import mmap
+import os
+import shutil
+import tempfile
+import weakref
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+import profiling
+from access_trace import AccessTrace, SPACES, KINDS, dim3
+from trace_io import write_trace, read_trace
+from utils import strided_ranges, merge_ranges
+
+# One merged (lo, hi) range held as a Python tuple
+RANGE_BYTES = 120
+# Smallest read buffer per run during the range merge, in ranges
+MIN_READ = 4096
+
+SUFFIXES = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+def parse_size(text: str) -> int:
+    """'512M', '2g', '1.5G' or a plain byte count -> bytes."""
+    text = text.strip().lower().rstrip("b")
+    scale = SUFFIXES.get(text[-1:], 1)
+    if text[-1:] in SUFFIXES:
+        text = text[:-1]
+    size = int(float(text) * scale)
+    if size <= 0:
+        raise ValueError(f"bad size: {text}")
+    return size
+
+class _SpillDir:
+    """Temporary directory removed when the last trace or view using it goes away."""
+
+    def __init__(self, parent: Optional[str] = None):
+        self.path = tempfile.mkdtemp(prefix="ptxspill-", dir=parent)
+        self._cleanup = weakref.finalize(self, shutil.rmtree, self.path, True)
+        self.files = 0
+
+    def new(self, suffix: str) -> str:
+        self.files += 1
+        return os.path.join(self.path, f"{self.files:06d}{suffix}")
+
+def write_chunk(trace: AccessTrace, path: str) -> Tuple[Counter, Counter]:
+    """
+    Write a trace file; returns the row and access counts per (space, kind)
+    code pair.
+    """
+    write_trace(trace, path)
+    rows, accesses = Counter(), Counter()
+    for key, count in zip(zip(trace.space, trace.kind), trace.count):
+        rows[key] += 1
+        accesses[key] += count
+    return rows, accesses
+
+@contextmanager
+def read_chunk(path: str) -> Iterator[AccessTrace]:
+    with read_trace(path) as part:
+        yield part
+
+class SpilledTrace:
+    """
+    AccessTrace stand-in whose rows live in trace files. Supports what the
+    report needs: len(), num_accesses, select(), chunks(), record() and
+    records(); select() returns a filtered view over the same files.
+    """
+
+    def __init__(self, grid_dim, block_dim, base_address: int = 0, directory: Optional[str] = None):
+        self.grid_shape = dim3(grid_dim)
+        self.block_shape = dim3(block_dim)
+        self.grid_dim = self.grid_shape[0] * self.grid_shape[1] * self.grid_shape[2]
+        self.block_dim = self.block_shape[0] * self.block_shape[1] * self.block_shape[2]
+        self.base_address = base_address
+        self.ops: Dict[int, str] = {}
+        self.parent = directory
+        self._store: Optional[_SpillDir] = None
+        # (path, rows per (space, kind), accesses per (space, kind))
+        self.files: List[Tuple[str, Counter, Counter]] = []
+        self.filter: Optional[Tuple[Optional[int], Optional[int]]] = None
+
+    @property
+    def warps_per_block(self) -> int:
+        return (self.block_dim + 31) // 32
+
+    @property
+    def store(self) -> _SpillDir:
+        if self._store is None:
+            self._store = _SpillDir(self.parent)
+        return self._store
+
+    @property
+    def directory(self) -> str:
+        return self.store.path
+
+    def append(self, trace: AccessTrace):
+        """Write `trace` out as the next chunk; it must hold whole blocks."""
+        path = self.store.new(".trace")
+        rows, accesses = write_chunk(trace, path)
+        self.attach(path, rows, accesses, trace.ops)
+        profiling.count("spilled_chunks")
+        profiling.count("spilled_bytes", os.path.getsize(path))
+
+    def attach(self, path: str, rows: Counter, accesses: Counter, ops: Dict[int, str]):
+        """Add a chunk already on disk (see write_chunk); the file is not owned by the trace."""
+        self.files.append((path, rows, accesses))
+        self.ops.update(ops)
+
+    def _total(self, column: int) -> int:
+        return sum(n for entry in self.files for key, n in entry[column].items() if self._keep(key))
+
+    def _keep(self, key: Tuple[int, int]) -> bool:
+        if self.filter is None:
+            return True
+        space, kind = self.filter
+        return (space is None or key[0] == space) and (kind is None or key[1] == kind)
+
+    def __len__(self) -> int:
+        return self._total(1)
+
+    @property
+    def num_accesses(self) -> int:
+        return self._total(2)
+
+    def select(self, space: Optional[str] = None, kind: Optional[str] = None) -> "SpilledTrace":
+        if self.filter is not None:
+            raise ValueError("select() on a filtered spilled trace")
+        view = copy.copy(self)
+        view.filter = (SPACES.index(space) if space is not None else None,
+                       KINDS.index(kind) if kind is not None else None)
+        return view
+
+    def chunks(self) -> Iterator[AccessTrace]:
+        """Load the chunks one after another; each is released when the next is requested."""
+        for path, rows, _ in self.files:
+            if not any(self._keep(key) for key in rows):
+                continue
+            with read_chunk(path) as part:
+                if self.filter is None:
+                    yield part
+                else:
+                    space, kind = self.filter
+                    yield part.select(SPACES[space] if space is not None else None,
+                                      KINDS[kind] if kind is not None else None)
+
+    def record(self, i: int) -> Dict:
+        for part in self.chunks():
+            if i < len(part):
+                return part.record(i)
+            i -= len(part)
+        raise IndexError("trace index out of range")
+
+    def records(self) -> Iterator[Dict]:
+        return chain.from_iterable(part.records() for part in self.chunks())
+
+class RangeFile:
+    """Read-only sequence of merged (lo, hi) byte ranges stored as a flat 'Q' array."""
+
+    def __init__(self, path: str):
+        self.path = path
+        size = os.path.getsize(path)
+        self._mmap = None
+        self._q = array("Q")
+        if size:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._q = memoryview(self._mmap).cast("Q")
+        self._n = size // 16
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Tuple[int, int]:
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError("range index out of range")
+        return self._q[2 * i], self._q[2 * i + 1]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        q = self._q
+        for k in range(0, 2 * self._n, 2):
+            yield q[k], q[k + 1]
+
+def write_ranges(ranges, path: str):
+    buf = array("Q")
+    with open(path, "wb") as f:
+        for lo, hi in ranges:
+            buf.append(lo)
+            buf.append(hi)
+            if len(buf) >= 2 * MIN_READ:
+                buf.tofile(f)
+                del buf[:]
+        buf.tofile(f)
+
+def _read_ranges(path: str, batch: int) -> Iterator[Tuple[int, int]]:
+    with open(path, "rb") as f:
+        while True:
+            buf = array("Q")
+            try:
+                buf.fromfile(f, 2 * batch)
+            except EOFError:
+                pass
+            if not buf:
+                return
+            yield from zip(buf[::2], buf[1::2])
+
+def _merge_sorted(ranges: Iterator[Tuple[int, int]]) -> Iterator[Tuple[int, int]]:
+    """merge_ranges() for input that is already sorted, as a stream."""
+    lo = hi = None
+    for a, b in ranges:
+        if lo is not None and a <= hi:
+            hi = max(hi, b)
+        else:
+            if lo is not None:
+                yield lo, hi
+            lo, hi = a, b
+    if lo is not None:
+        yield lo, hi
+
+def spilled_ranges(trace: SpilledTrace, memory_budget: int) -> Union[List[Tuple[int, int]], RangeFile]:
+    """
+    strided_ranges() of a spilled trace. Returns a plain list when the merged
+    ranges fit in the budget, otherwise a RangeFile in the trace's directory.
+    """
+    runs, pending = [], []
+    for part in trace.chunks():
+        pending.extend(strided_ranges(part))
+        if len(pending) * RANGE_BYTES > memory_budget:
+            pending = merge_ranges(pending)
+            if len(pending) * RANGE_BYTES > memory_budget // 2:
+                runs.append(trace.store.new(".ranges"))
+                write_ranges(pending, runs[-1])
+                pending = []
+    pending = merge_ranges(pending)
+    if not runs:
+        return pending
+
+    runs.append(trace.store.new(".ranges"))
+    write_ranges(pending, runs[-1])
+    pending = None
+    path = trace.store.new(".ranges")
+    merge_range_files(runs, path, memory_budget)
+    for run in runs:
+        os.unlink(run)
+    profiling.count("spilled_range_runs", len(runs))
+    return RangeFile(path)
+
+def merge_range_files(paths: List[str], path: str, memory_budget: int):
+    """k-way merge of sorted range files into one file of merged ranges."""
+    batch = max(MIN_READ, memory_budget // (RANGE_BYTES * max(1, len(paths))))
+    write_ranges(_merge_sorted(heapq.merge(*(_read_ranges(p, batch) for p in paths))), path)
@@ -3,6 +3,8 @@ from typing import Dict, Any
 
 def get_val(table: Dict[str, Any], token: str):
     """Return the symbolic value if we have one, otherwise the raw token."""
+    if isinstance(token, str) and ":" in token:
+        token = token.split(":")[0]   # register pair: the low register holds 64-bit results
     return table.get(token, token)
 
 def evaluate_symbolic(ir) -> str:
@@ -13,7 +15,7 @@ def evaluate_symbolic(ir) -> str:
         op = instr["op"]
 
         if op == "ld.param.u64":
-            sym[instr["dst"]] = "out"
+            sym[instr["dst"]] = instr["src"]
 
         elif op == "cvta.to.global.u64":
             sym[instr["dst"]] = sym[instr["src"]]
@@ -21,7 +23,7 @@ def evaluate_symbolic(ir) -> str:
         elif op.startswith("mov"):
             sym[instr["dst"]] = instr["src"]
 
-        elif op.startswith("mad.lo.s32"):
+        elif op.startswith("mad"):
             a = get_val(sym, instr["src1"])
             b = get_val(sym, instr["src2"])
             c = get_val(sym, instr["src3"])
@@ -0,0 +1,125 @@
+# conftest.py
+#
+# The package uses flat module names (parser, simulator, utils), so the
+# tests import them with the package directory on sys.path. `analyze` runs
+# main.py on kernel text in a temporary directory and returns the report.
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+PACKAGE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE)
+
+# for (i = tid; i < n; i += stride) out[i] = 1.0f
+GRIDLOOP_PTX = """
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z4fillPfi(
+	.param .u64 _Z4fillPfi_param_0,
+	.param .u32 _Z4fillPfi_param_1
+)
+{
+	.reg .pred 	%p<3>;
+	.reg .b32 	%r<10>;
+	.reg .b64 	%rd<5>;
+
+	ld.param.u64 	%rd1, [_Z4fillPfi_param_0];
+	ld.param.u32 	%r5, [_Z4fillPfi_param_1];
+	mov.u32 	%r6, %ctaid.x;
+	mov.u32 	%r1, %ntid.x;
+	mov.u32 	%r7, %tid.x;
+	mad.lo.s32 	%r9, %r6, %r1, %r7;
+	setp.ge.s32 	%p1, %r9, %r5;
+	@%p1 bra 	$L__BB0_3;
+
+	cvta.to.global.u64 	%rd2, %rd1;
+	mov.u32 	%r8, %nctaid.x;
+	mul.lo.s32 	%r3, %r1, %r8;
+
+$L__BB0_2:
+	mul.wide.s32 	%rd3, %r9, 4;
+	add.s64 	%rd4, %rd2, %rd3;
+	st.global.f32 	[%rd4], 0f3F800000;
+	add.s32 	%r9, %r9, %r3;
+	setp.lt.s32 	%p2, %r9, %r5;
+	@%p2 bra 	$L__BB0_2;
+
+$L__BB0_3:
+	ret;
+}
+"""
+
+# if (i < n) out[i] = (tid & 1) ? 2.0f : 1.0f, through two diverging stores
+BOUNDS_PTX = """
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z5writePfi(
+	.param .u64 _Z5writePfi_param_0,
+	.param .u32 _Z5writePfi_param_1
+)
+{
+	.reg .pred 	%p<3>;
+	.reg .f32 	%f<3>;
+	.reg .b32 	%r<7>;
+	.reg .b64 	%rd<5>;
+
+	ld.param.u64 	%rd1, [_Z5writePfi_param_0];
+	ld.param.u32 	%r2, [_Z5writePfi_param_1];
+	mov.u32 	%r3, %ctaid.x;
+	mov.u32 	%r4, %ntid.x;
+	mov.u32 	%r5, %tid.x;
+	mad.lo.s32 	%r1, %r3, %r4, %r5;
+	setp.ge.s32 	%p1, %r1, %r2;
+	@%p1 bra 	$L__BB0_2;
+
+	cvta.to.global.u64 	%rd2, %rd1;
+	and.b32 	%r6, %r5, 1;
+	setp.eq.s32 	%p2, %r6, 0;
+	selp.f32 	%f1, 0f3F800000, 0f40000000, %p2;
+	mul.wide.s32 	%rd3, %r1, 4;
+	add.s64 	%rd4, %rd2, %rd3;
+	@%p2 bra 	$L__BB0_3;
+	st.global.f32 	[%rd4], %f1;
+	bra.uni 	$L__BB0_2;
+$L__BB0_3:
+	st.global.f32 	[%rd4], %f1;
+$L__BB0_2:
+	ret;
+}
+"""
+
+# out[tid] = tid, the pointer built with a two-carry IADD3 and the value copied with IMAD.MOV
+FILL_SASS = """\
+	code for sm_86
+		Function : _Z4fillPf
+        /*0000*/                   S2R R0, SR_TID.X ;
+        /*0010*/                   ULDC.64 UR4, c[0x0][0x118] ;
+        /*0020*/                   IMAD.SHL.U32 R2, R0, 0x4, RZ ;
+        /*0030*/                   IADD3 R2, P0, P1, R2, c[0x0][0x160], RZ ;
+        /*0040*/                   IADD3.X R3, RZ, c[0x0][0x164], RZ, P0, P1 ;
+        /*0050*/                   IMAD.MOV.U32 R5, RZ, RZ, R0 ;
+        /*0060*/                   STG.E [R2.64], R5 ;
+        /*0070*/                   NOP ;
+        /*0080*/                   EXIT ;
+"""
+
+@pytest.fixture
+def analyze(tmp_path):
+    """analyze(path, text, *args) -> bytes of the report main.py writes for the kernel at tmp_path / path."""
+    def run(name: str, text: str, *args: str) -> bytes:
+        kernel = tmp_path / name
+        kernel.parent.mkdir(parents=True, exist_ok=True)
+        kernel.write_text(text)
+        out = tmp_path / (name + ".json")
+        subprocess.run([sys.executable, os.path.join(PACKAGE, "main.py"), str(kernel), "--json_out", str(out),
+                        "--cache_dir", str(tmp_path / "cache"), *args],
+                       check=True, stdout=subprocess.DEVNULL, cwd=tmp_path)
+        return out.read_bytes()
+    return run
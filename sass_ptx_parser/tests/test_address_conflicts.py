@@ -0,0 +1,66 @@
+# test_address_conflicts.py
+
+import json
+
+from conftest import GRIDLOOP_PTX
+
+# atomicAdd(&out[i % 16], 1); red out[i + 1024]; out[0] = i
+HIST_PTX = """\
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z4histPj(
+	.param .u64 _Z4histPj_param_0,
+	.param .u32 _Z4histPj_param_1
+)
+{
+	.reg .b32 	%r<11>;
+	.reg .b64 	%rd<9>;
+
+	ld.param.u64 	%rd1, [_Z4histPj_param_0];
+	cvta.to.global.u64 	%rd2, %rd1;
+	mov.u32 	%r1, %ctaid.x;
+	mov.u32 	%r2, %ntid.x;
+	mov.u32 	%r3, %tid.x;
+	mad.lo.s32 	%r4, %r1, %r2, %r3;
+	and.b32 	%r5, %r4, 15;
+	mul.wide.s32 	%rd3, %r5, 4;
+	add.s64 	%rd4, %rd2, %rd3;
+	atom.global.add.u32 	%r6, [%rd4], 1;
+	mul.wide.s32 	%rd5, %r4, 4;
+	add.s64 	%rd6, %rd2, %rd5;
+	red.global.add.u32 	[%rd6+4096], 1;
+	st.global.u32 	[%rd2], %r4;
+	ret;
+}
+"""
+
+# Every grid-stride iteration adds to out[0]
+COUNTER_PTX = GRIDLOOP_PTX.replace("st.global.f32 	[%rd4], 0f3F800000;", "red.global.add.f32 	[%rd2], 0f3F800000;")
+
+def _conflicts(report: bytes):
+    conflicts = json.loads(report)["address_conflicts"]
+    return conflicts, {i["instruction"]: i for i in conflicts["instructions"]}
+
+def test_atomic_collisions(analyze):
+    conflicts, per_instr = _conflicts(analyze("k.ptx", HIST_PTX, "--grid", "2", "--block", "64"))
+    atom = per_instr["atom.global.add.u32"]
+    # 16 bins: two lanes per bin in every warp, eight hits per bin over the grid
+    assert (atom["accesses"], atom["distinct_addresses"], atom["collisions"]) == (128, 16, 112)
+    assert (atom["max_ways"], atom["warp_collisions"], atom["conflicted_requests"]) == (2, 64, 4)
+    assert atom["hottest"][0] == {"address": "0x00001000", "hits": 8}
+    red = per_instr["red.global.add.u32"]
+    assert (red["collisions"], red["max_ways"], red["hottest"]) == (0, 1, [])
+    store = per_instr["st.global.u32"]
+    assert (store["max_ways"], store["warp_collisions"]) == (32, 124)
+    # out[0] is hit by the first bin, the store and nothing else
+    assert conflicts["hottest"][0] == {"address": "0x00001000", "hits": 136}
+    assert conflicts["conflicted_warps"] == 4
+
+def test_summarized_loop_collisions_match_concrete_run(analyze):
+    launch = ("--grid", "4", "--block", "64", "--param", "1=3000")
+    summarized, _ = _conflicts(analyze("k.ptx", COUNTER_PTX, *launch))
+    concrete, _ = _conflicts(analyze("k.ptx", COUNTER_PTX, *launch, "--no-loop-summary"))
+    assert summarized == concrete
+    assert summarized["collisions"] == 3000 - 1
@@ -0,0 +1,77 @@
+# test_bank_conflicts.py
+
+import json
+
+import pytest
+from utils import request_bank_conflicts
+
+# Shared-memory requests of one warp: tile[tid], tile[32 * tid], tile[1] and wide[tid] (8 bytes)
+TILE_PTX = """\
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z4tilePf(
+	.param .u64 _Z4tilePf_param_0
+)
+{
+	.reg .b32 	%r<12>;
+	.reg .b64 	%rd<8>;
+	// demoted variable
+	.shared .align 4 .b8 _ZZ4tilePfE4tile[4096];
+	// demoted variable
+	.shared .align 8 .b8 _ZZ4tilePfE4wide[2048];
+
+	ld.param.u64 	%rd1, [_Z4tilePf_param_0];
+	cvta.to.global.u64 	%rd2, %rd1;
+	mov.u32 	%r1, %tid.x;
+	mov.u32 	%r2, _ZZ4tilePfE4tile;
+	shl.b32 	%r3, %r1, 2;
+	add.s32 	%r4, %r2, %r3;
+	mov.u32 	%r5, 1065353216;
+	st.shared.u32 	[%r4], %r5;
+	bar.sync 	0;
+	shl.b32 	%r6, %r1, 7;
+	add.s32 	%r7, %r2, %r6;
+	ld.shared.u32 	%r8, [%r7];
+	ld.shared.u32 	%r9, [_ZZ4tilePfE4tile+4];
+	mov.u32 	%r10, _ZZ4tilePfE4wide;
+	shl.b32 	%r11, %r1, 3;
+	add.s32 	%r11, %r10, %r11;
+	ld.shared.u64 	%rd5, [%r11];
+	mov.u32 	%r1, %ctaid.x;
+	mov.u32 	%r2, %ntid.x;
+	mov.u32 	%r3, %tid.x;
+	mad.lo.s32 	%r4, %r1, %r2, %r3;
+	mul.wide.s32 	%rd3, %r4, 4;
+	add.s64 	%rd4, %rd2, %rd3;
+	st.global.u32 	[%rd4], %r8;
+	ret;
+}
+"""
+
+@pytest.mark.parametrize("stride, size, expected", [
+    (4, 4, (1, 1, 1)),        # consecutive words
+    (8, 4, (2, 2, 1)),        # every other bank
+    (128, 4, (32, 32, 1)),    # one bank
+    (0, 4, (1, 1, 1)),        # broadcast
+    (8, 8, (1, 2, 2)),        # 8-byte lanes in two half-warp phases
+    (16, 8, (2, 4, 2)),
+    (16, 16, (1, 4, 4)),      # quarter-warp phases
+])
+def test_request_ways(stride, size, expected):
+    assert request_bank_conflicts([(lane, lane * stride) for lane in range(32)], size) == expected
+
+def test_partial_warp_counts_active_lanes_only():
+    assert request_bank_conflicts([(lane, lane * 128) for lane in range(0, 32, 4)]) == (8, 8, 1)
+
+def test_kernel_ways(analyze):
+    report = json.loads(analyze("k.ptx", TILE_PTX, "--grid", "2", "--block", "32"))
+    ways = {(c["instruction"], c["max_ways"], c["wavefronts"], c["ideal_wavefronts"], c["conflicted_requests"])
+            for c in report["shared_memory"]["bank_conflicts"]}
+    assert ways == {
+        ("st.shared.u32", 1, 2, 2, 0),
+        ("ld.shared.u32", 32, 64, 2, 2),
+        ("ld.shared.u32", 1, 2, 2, 0),
+        ("ld.shared.u64", 1, 4, 4, 0),
+    }
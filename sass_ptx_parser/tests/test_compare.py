@@ -0,0 +1,48 @@
+# test_compare.py
+
+import pytest
+import compare
+from conftest import BOUNDS_PTX
+from compare import WarpTable, load_report, iter_deltas
+
+LAUNCH = ("--grid", "4", "--block", "64", "--param", "1=200")
+
+def _table(rows) -> WarpTable:
+    """WarpTable of (warp, instruction, sectors) rows, one full coalesced warp each."""
+    table = WarpTable()
+    for warp, instr, sectors in rows:
+        table.append({"warp_id": warp, "instr_idx": instr, "blockIdx.x": warp // 2, "num_threads": 32,
+                      "contiguous": True, "coalesced": True, "iterations": 1, "coalesced_iterations": 1,
+                      "sectors": sectors, "address_range": f"0x{warp * 128:08x} - 0x{warp * 128 + 124:08x}"})
+    return table
+
+def test_json_report_streams_like_ndjson(analyze, tmp_path, monkeypatch):
+    paths = {}
+    for fmt in ("json", "ndjson"):
+        paths[fmt] = tmp_path / f"r.{fmt}"
+        paths[fmt].write_bytes(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--format", fmt))
+    # Reads far smaller than one value exercise the refills
+    monkeypatch.setattr(compare, "READ_SIZE", 7)
+    (fj, tj), (fn, tn) = load_report(str(paths["json"])), load_report(str(paths["ndjson"]))
+    assert fj == fn and "memory_writes" not in fj and "warps" not in fj["control_flow"]
+    assert len(tj) == len(tn) == 14   # two stores per warp with a thread below n
+    assert all(getattr(tj, name) == getattr(tn, name) for name, _ in WarpTable.COLUMNS)
+
+def test_merge_join_reports_added_removed_and_changed_warps():
+    before = _table([(1, 3, 4), (0, 5, 4), (0, 3, 4)])
+    after = _table([(2, 3, 4), (1, 3, 4), (0, 3, 8)])
+    stats = {}
+    deltas = [(d["warp_id"], d["instr_idx"], d["status"]) for d in iter_deltas(before, after, "index", stats)]
+    assert deltas == [(0, [3, 3], "changed"), (0, [5, None], "only_before"), (2, [None, 3], "only_after")]
+    assert stats == {"unchanged": 1, "changed": 1, "improved": 0, "regressed": 1, "only_before": 1, "only_after": 1}
+
+@pytest.mark.parametrize("align, matched", [("index", 0), ("ordinal", 4)])
+def test_mismatched_instruction_sets(align, matched):
+    # An edit shifted both memory instructions by one index
+    before = _table([(0, 3, 4), (0, 5, 4), (1, 3, 4), (1, 5, 4)])
+    after = _table([(0, 4, 4), (0, 6, 4), (1, 4, 4), (1, 6, 4)])
+    stats = {}
+    deltas = list(iter_deltas(before, after, align, stats))
+    assert stats["unchanged"] == matched
+    assert stats["only_before"] == stats["only_after"] == 4 - matched
+    assert len(deltas) == 2 * (4 - matched)
@@ -0,0 +1,42 @@
+# test_control_flow.py
+
+import json
+
+import pytest
+from conftest import GRIDLOOP_PTX, BOUNDS_PTX
+from cfg import build_cfg, unresolved_targets
+from evaluator import evaluate_instruction
+from parser import parse_ptx_to_ir
+
+def test_immediate_store_reports_its_value(analyze):
+    report = json.loads(analyze("k.ptx", GRIDLOOP_PTX, "--grid", "2", "--block", "32", "--param", "1=100"))
+    writes = report["memory_writes"]
+    assert sorted(w["memory_offset"] for w in writes) == list(range(100))
+    assert {w["written_value"] for w in writes} == {1.0}
+
+def test_divergent_stores_write_both_values(analyze):
+    report = json.loads(analyze("k.ptx", BOUNDS_PTX, "--grid", "1", "--block", "32", "--param", "1=32"))
+    values = {w["thread_id"]: w["written_value"] for w in report["memory_writes"]}
+    assert values == {t: 2.0 if t & 1 else 1.0 for t in range(32)}
+
+def test_branch_to_missing_label_exits(analyze):
+    kernel = BOUNDS_PTX.replace("$L__BB0_3:\n", "")
+    ir = parse_ptx_to_ir(kernel)
+    assert unresolved_targets(ir) == ["$L__BB0_3"]
+    assert build_cfg(ir)[1]["succs"] == [2]   # the guarded branch only falls through
+    report = json.loads(analyze("k.ptx", kernel, "--grid", "1", "--block", "32", "--param", "1=32"))
+    assert report["control_flow"]["unresolved_branches"] == ["$L__BB0_3"]
+    # Even lanes take the branch and leave; odd lanes store once
+    assert {w["thread_id"] for w in report["memory_writes"]} == set(range(1, 32, 2))
+
+@pytest.mark.parametrize("op, a, b, expected", [
+    ("setp.lo.u32", 0xfffffff0, 5, False),
+    ("setp.lt.u32", -1, 5, False),         # -1 is 0xffffffff as a u32
+    ("setp.hi.u32", -1, 5, True),
+    ("setp.lt.s32", -1, 5, True),
+    ("setp.ls.u64", 1 << 40, 1 << 33, False),
+])
+def test_unsigned_compare_wraps_to_width(op, a, b, expected):
+    regs = {"a": a, "b": b}
+    evaluate_instruction({"op": op, "dst": "p", "src1": "a", "src2": "b"}, regs, [0], 1)
+    assert regs["p"] is expected
@@ -0,0 +1,61 @@
+# test_incremental.py
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import BOUNDS_PTX, GRIDLOOP_PTX, FILL_SASS, PACKAGE
+
+LAUNCH = ("--grid", "8", "--block", "64", "--param", "1=300")
+
+def _comparable(report: bytes) -> dict:
+    """A report without the incremental summary; memory_writes are grouped by instruction there."""
+    fields = json.loads(report)
+    fields.pop("incremental", None)
+    fields["memory_writes"].sort(key=lambda w: (w["address"], w["thread_id"]))
+    return fields
+
+def _insert_after(text: str, anchor: str, line: str) -> str:
+    head, tail = text.split(anchor, 1)
+    return head + anchor + "\n\t" + line + tail
+
+def test_unrelated_insertion_matches_full_run(analyze):
+    edited = _insert_after(BOUNDS_PTX, "mov.u32 	%r5, %tid.x;", "mov.u32 	%r6, 7;")
+    analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--incremental")
+    incremental = analyze("k.ptx", edited, *LAUNCH, "--incremental")
+    full = analyze("full/k.ptx", edited, *LAUNCH)
+
+    summary = json.loads(incremental)["incremental"]
+    assert summary["reused"] == 2 and summary["resimulated"] == []
+    assert _comparable(incremental) == _comparable(full)
+    # The renumbered entries are stored, so the next run reuses them as they are
+    assert _comparable(analyze("k.ptx", edited, *LAUNCH, "--incremental")) == _comparable(full)
+
+def test_edited_address_is_resimulated(analyze):
+    analyze("k.ptx", GRIDLOOP_PTX, *LAUNCH, "--incremental")
+    edited = GRIDLOOP_PTX.replace("mul.wide.s32 	%rd3, %r9, 4;", "mul.wide.s32 	%rd3, %r9, 8;")
+    incremental = analyze("k.ptx", edited, *LAUNCH, "--incremental")
+    full = analyze("full/k.ptx", edited, *LAUNCH)
+
+    assert json.loads(incremental)["incremental"]["resimulated"] != []
+    assert _comparable(incremental) == _comparable(full)
+
+def test_identical_kernels_share_a_cache(analyze, tmp_path):
+    first = json.loads(analyze("a/k.ptx", BOUNDS_PTX, *LAUNCH, "--incremental"))["incremental"]
+    # A file the cache did not write survives its cleanup
+    stray = os.path.join(first["cache"], "notes.txt")
+    open(stray, "w").close()
+    second = json.loads(analyze("b/k.ptx", BOUNDS_PTX, *LAUNCH, "--incremental"))["incremental"]
+    assert second["cache"] == first["cache"] and second["reused"] == 2
+    assert os.path.exists(stray)
+
+def test_stdin_kernel_reuses_its_cache(tmp_path):
+    def run():
+        out = tmp_path / "stdin.json"
+        subprocess.run([sys.executable, os.path.join(PACKAGE, "main.py"), "-", "--json_out", str(out),
+                        "--cache_dir", str(tmp_path / "cache"), "--grid", "1", "--block", "8", "--incremental"],
+                       input=FILL_SASS.encode(), check=True, stdout=subprocess.DEVNULL, cwd=tmp_path)
+        return json.loads(out.read_bytes())["incremental"]
+    assert run()["reused"] == 0
+    assert run()["reused"] == 1
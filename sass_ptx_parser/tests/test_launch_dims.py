@@ -0,0 +1,70 @@
+# test_launch_dims.py
+
+import json
+
+import pytest
+from access_trace import dim3, unravel
+from parser import parse_sass_to_ir
+
+# out[row * width + col] = row * width + col over a 2D grid of 2D blocks
+GRID2D_PTX = """
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z4fillPj(
+	.param .u64 _Z4fillPj_param_0
+)
+{
+	.reg .b32 	%r<13>;
+	.reg .b64 	%rd<5>;
+
+	ld.param.u64 	%rd1, [_Z4fillPj_param_0];
+	cvta.to.global.u64 	%rd2, %rd1;
+	mov.u32 	%r1, %tid.x;
+	mov.u32 	%r2, %tid.y;
+	mov.u32 	%r3, %ctaid.x;
+	mov.u32 	%r4, %ctaid.y;
+	mov.u32 	%r5, %ntid.x;
+	mov.u32 	%r6, %ntid.y;
+	mov.u32 	%r7, %nctaid.x;
+	mad.lo.s32 	%r8, %r3, %r5, %r1;
+	mad.lo.s32 	%r9, %r4, %r6, %r2;
+	mul.lo.s32 	%r10, %r7, %r5;
+	mad.lo.s32 	%r11, %r9, %r10, %r8;
+	mul.wide.s32 	%rd3, %r11, 4;
+	add.s64 	%rd4, %rd2, %rd3;
+	st.global.u32 	[%rd4], %r11;
+	ret;
+}
+"""
+
+def test_dim3_and_unravel():
+    assert dim3(128) == (128, 1, 1)
+    assert dim3("16,16") == dim3("16x16") == dim3((16, 16)) == (16, 16, 1)
+    assert dim3("8x8x4") == (8, 8, 4)
+    with pytest.raises(ValueError):
+        dim3("0x4")
+    # x varies fastest, then y, then z
+    assert [unravel(i, (4, 3, 2)) for i in (0, 1, 4, 12, 23)] == [(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1), (3, 2, 1)]
+
+def test_2d_launch_covers_the_grid(analyze):
+    report = json.loads(analyze("k.ptx", GRID2D_PTX, "--grid", "2x2", "--block", "16x4"))
+    writes = report["memory_writes"]
+    assert sorted(w["memory_offset"] for w in writes) == list(range(256))
+    assert all(w["written_value"] == w["memory_offset"] for w in writes)
+
+    # Warps take 32 consecutive linear thread indices: two 16-wide rows, one 32-element row apart
+    stats = report["warp_stats"]
+    assert len(stats) == 8 and all(s["num_threads"] == 32 and not s["contiguous"] for s in stats)
+    assert [(s["blockIdx.x"], s["blockIdx.y"]) for s in stats[::2]] == [(0, 0), (1, 0), (0, 1), (1, 1)]
+    block3_warp1 = stats[7]
+    lo, hi = (int(a, 16) for a in block3_warp1["address_range"].split(" - "))
+    # Rows 6 and 7, columns 16..31
+    assert (hi - lo) // 4 == (7 * 32 + 31) - (6 * 32 + 16)
+
+def test_sass_special_registers_of_every_dimension():
+    lines = [f"        /*{16 * k:04x}*/                   S2R R{k}, SR_{name} ;"
+             for k, name in enumerate(("TID.Y", "TID.Z", "CTAID.Y", "CTAID.Z"))]
+    ir = parse_sass_to_ir("\tcode for sm_86\n\t\tFunction : _Z1kv\n" + "\n".join(lines) + "\n")
+    assert [i["src"] for i in ir] == ["tid.y", "tid.z", "ctaid.y", "ctaid.z"]
@@ -0,0 +1,52 @@
+# test_loops.py
+
+import json
+
+import pytest
+from conftest import GRIDLOOP_PTX
+from simulator import _trip_count
+
+# for (i = tid + 3n; i >= n; i -= stride) out[i] = 1.0f, exiting on an unsigned, negated test
+COUNTDOWN_PTX = GRIDLOOP_PTX.replace("""\
+	@%p1 bra 	$L__BB0_3;
+""", """\
+	@%p1 bra 	$L__BB0_3;
+	mad.lo.s32 	%r9, %r5, 3, %r9;
+""").replace("""\
+	add.s32 	%r9, %r9, %r3;
+	setp.lt.s32 	%p2, %r9, %r5;
+	@%p2 bra 	$L__BB0_2;""", """\
+	sub.s32 	%r9, %r9, %r3;
+	setp.lo.u32 	%p2, %r9, %r5;
+	@!%p2 bra 	$L__BB0_2;""")
+
+LAUNCH = ("--grid", "4", "--block", "64", "--param", "1=3000")
+# Loop entries that only a summarized run counts
+TRIP_STATS = ("entries", "summarized_lanes", "min_trips", "max_trips", "avg_trips")
+
+def _without_trip_stats(report: bytes):
+    report = json.loads(report)
+    for loop in report["control_flow"]["loops"]:
+        for key in TRIP_STATS:
+            loop.pop(key, None)
+    # A summarized loop writes lane by lane, a concrete one iteration by iteration
+    report["memory_writes"].sort(key=lambda w: (w["address"], w["thread_id"]))
+    return report
+
+@pytest.mark.parametrize("kernel", [GRIDLOOP_PTX, COUNTDOWN_PTX], ids=["gridloop", "countdown"])
+def test_summary_matches_concrete_run(analyze, kernel):
+    summarized = analyze("k.ptx", kernel, *LAUNCH)
+    assert json.loads(summarized)["control_flow"]["loops"][0]["summarized_lanes"] == 256
+    concrete = analyze("k.ptx", kernel, *LAUNCH, "--no-loop-summary")
+    assert _without_trip_stats(summarized) == _without_trip_stats(concrete)
+
+def test_trip_count():
+    # for (i = 0; i < 10; i += 3): the test after the first trip sees 3 - 10
+    assert _trip_count("lt", False, -7, 3) == 4
+    assert _trip_count("lo", False, -7, 3) == 4
+    assert _trip_count("hs", True, -7, 3) == 4
+    assert _trip_count("ls", True, 7, -3) == _trip_count("gt", False, 7, -3) == 4
+    # for (i = 0; i != 9; i += 3)
+    assert _trip_count("ne", False, -6, 3) == 3
+    assert _trip_count("equ", False, -7, 3) is None
+    assert _trip_count("equ", True, -7, 3) is None
@@ -0,0 +1,28 @@
+# test_occupancy.py
+
+import json
+
+from conftest import GRIDLOOP_PTX
+from occupancy import ptx_registers, device_limits, launch_occupancy, PTX_REGISTERS
+
+# 300 virtual 32-bit registers, more than any thread may hold
+WIDE_PTX = GRIDLOOP_PTX.replace(".reg .b32 \t%r<10>;", ".reg .b32 \t%r<300>;")
+
+def test_ptx_register_count_is_an_upper_bound(analyze):
+    assert ptx_registers(WIDE_PTX) == 300 + 2 * 5
+    report = json.loads(analyze("k.ptx", WIDE_PTX, "--grid", "2", "--block", "1024", "--param", "1=100",
+                                "--device", "a100"))
+    occupancy = report["occupancy"]
+    assert occupancy["registers_per_thread"] == 255
+    assert occupancy["registers_approximate"] and occupancy["register_source"] == PTX_REGISTERS
+    flags = [f["flag"] for f in occupancy["flags"]]
+    assert "cannot_launch" not in flags and "register_bound" in flags
+    # Smaller blocks fit even at 255 registers
+    assert occupancy["best_occupancy"] > 0
+
+def test_register_count_from_ptxas_can_block_a_launch():
+    limits = device_limits("a100")
+    occupancy = launch_occupancy(2, 1024, 255, 0, limits, "--registers")
+    assert not occupancy["registers_approximate"]
+    assert occupancy["blocks_per_sm"] == 0
+    assert [f["flag"] for f in occupancy["flags"]][0] == "cannot_launch"
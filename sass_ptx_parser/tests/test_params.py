@@ -0,0 +1,94 @@
+# test_params.py
+
+import json
+
+import pytest
+from params import demangle_params, layout, cbank_names, assign_buffers, BUFFER_SPACING
+from utils import buffer_usage
+
+# Reads x[i] and y[i], writes y[i + 1]: two buffers BUFFER_SPACING apart
+SAXPY_PTX = """\
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z5saxpyifPKfPf(
+	.param .u32 _Z5saxpyifPKfPf_param_0,
+	.param .f32 _Z5saxpyifPKfPf_param_1,
+	.param .u64 _Z5saxpyifPKfPf_param_2,
+	.param .u64 _Z5saxpyifPKfPf_param_3
+)
+{
+	.reg .pred 	%p<2>;
+	.reg .b32 	%r<6>;
+	.reg .f32 	%f<5>;
+	.reg .b64 	%rd<8>;
+
+	ld.param.u32 	%r2, [_Z5saxpyifPKfPf_param_0];
+	ld.param.f32 	%f1, [_Z5saxpyifPKfPf_param_1];
+	ld.param.u64 	%rd1, [_Z5saxpyifPKfPf_param_2];
+	ld.param.u64 	%rd2, [_Z5saxpyifPKfPf_param_3];
+	mov.u32 	%r3, %ctaid.x;
+	mov.u32 	%r4, %ntid.x;
+	mov.u32 	%r5, %tid.x;
+	mad.lo.s32 	%r1, %r3, %r4, %r5;
+	setp.ge.s32 	%p1, %r1, %r2;
+	@%p1 bra 	$L__BB0_2;
+	cvta.to.global.u64 	%rd3, %rd1;
+	mul.wide.s32 	%rd4, %r1, 4;
+	add.s64 	%rd5, %rd3, %rd4;
+	ld.global.nc.f32 	%f2, [%rd5];
+	cvta.to.global.u64 	%rd6, %rd2;
+	add.s64 	%rd7, %rd6, %rd4;
+	ld.global.f32 	%f3, [%rd7];
+	st.global.f32 	[%rd7+4], %f3;
+$L__BB0_2:
+	ret;
+}
+"""
+
+def _ptr():
+    return {"type": "u64", "size": 8, "align": 8, "pointer": True}
+
+def test_demangle_params():
+    assert demangle_params("_Z6kernelPfS_i") == (_ptr(), _ptr(), {"type": "s32", "size": 4, "align": 4, "pointer": False})
+    assert demangle_params("_Z4pack6float4Pj") == ({"type": "b8[16]", "size": 16, "align": 16, "pointer": False}, _ptr())
+    assert demangle_params("_Z4initv") == ()
+    # Templates are outside the supported subset
+    assert demangle_params("_Z3fooIiEvPT_") is None
+    assert demangle_params("kernel") is None
+
+def test_layout_aligns_each_parameter():
+    params = layout([{"type": "s32", "size": 4, "align": 4, "pointer": False}, _ptr(),
+                     {"type": "b8[16]", "size": 16, "align": 16, "pointer": False}])
+    assert [(p["name"], p["offset"]) for p in params] == [("param_0", 0), ("param_1", 8), ("param_2", 16)]
+
+@pytest.mark.parametrize("arch, driver, first", [("sm_52", 0x8, 0x140), ("sm_80", 0x0, 0x160), ("sm_90", 0x0, 0x210)])
+def test_cbank_names(arch, driver, first):
+    names = cbank_names(arch, layout(list(demangle_params("_Z6kernelPfS_i"))))
+    assert names[driver] == "ntid.x" and names[driver + 12] == "nctaid.x"
+    assert [names[first + o] for o in (0, 4, 8, 12, 16)] == ["param_0", "param_0.hi", "param_1", "param_1.hi", "param_2"]
+
+def test_assign_buffers():
+    ir = [{"op": "decl.param", "name": f"param_{k}", "pointer": p} for k, p in enumerate((True, False, True, True))]
+    out = assign_buffers(ir, 0x1000, {"param_2": (0x10, 64)})
+    assert out == [{"name": "param_0", "base": 0x1000, "size": None},
+                   {"name": "param_1", "value": 1234},
+                   {"name": "param_2", "base": 0x10, "size": 64},
+                   {"name": "param_3", "base": 0x1000 + BUFFER_SPACING, "size": None}]
+    with pytest.raises(ValueError):
+        assign_buffers(ir, 0x1000, {"param_7": (0, None)})
+
+def test_buffer_usage_strides_per_buffer():
+    bufs = [{"name": "a", "base": 0, "size": None}, {"name": "b", "base": BUFFER_SPACING, "size": None}]
+    ranges = [(0, 4), (8, 12), (16, 20), (BUFFER_SPACING, BUFFER_SPACING + 64)]
+    records, totals = buffer_usage(ranges, bufs, 4)
+    assert [(r["stride"], r["pattern"], r["density"]) for r in records] == [(8, "irregular", 0.6), (4, "unit-strided", 1.0)]
+    assert totals["footprint_bytes"] == 84
+
+def test_multi_buffer_kernel_reports_dominant_stride(analyze):
+    report = json.loads(analyze("k.ptx", SAXPY_PTX, "--grid", "4", "--block", "64", "--param", "0=256"))
+    summary = report["memory_summary"]
+    assert (summary["stride"], summary["pattern"], summary["density"]) == (4, "unit-strided", 1.0)
+    assert summary["stride_buffer"] == "param_3"
+    assert [b["pattern"] for b in report["buffers"]["buffers"]] == ["unit-strided", "unit-strided"]
@@ -0,0 +1,49 @@
+# test_report.py
+
+import io
+import json
+
+from conftest import BOUNDS_PTX
+from report import ReportWriter, summarize_warp_usage
+
+LAUNCH = ("--grid", "4", "--block", "64", "--param", "1=200")
+
+def _write(fmt: str, pulled: list) -> str:
+    def items():
+        for k in range(3):
+            pulled.append(k)
+            yield {"k": k}
+    stream = io.StringIO()
+    with ReportWriter(stream, fmt) as out:
+        out.field("a", 1)
+        with out.section("s"):
+            out.field("b", [1, 2])
+            # Records are pulled only as they are written
+            assert out.records("r", items()) == 3
+        out.field("c", None)
+    return stream.getvalue()
+
+def test_writer_formats_hold_the_same_report():
+    pulled = []
+    assert json.loads(_write("json", pulled)) == {"a": 1, "s": {"b": [1, 2], "r": [{"k": 0}, {"k": 1}, {"k": 2}]}, "c": None}
+    lines = [json.loads(line) for line in _write("ndjson", pulled).splitlines()]
+    assert lines == [{"field": "a", "value": 1}, {"field": "s.b", "value": [1, 2]},
+                     {"record": "s.r", "k": 0}, {"record": "s.r", "k": 1}, {"record": "s.r", "k": 2},
+                     {"field": "c", "value": None}]
+    assert pulled == [0, 1, 2] * 2
+
+def test_detail_levels(analyze):
+    threads = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH))
+    warps = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--detail", "warps"))
+    summary = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--detail", "summary"))
+
+    assert len(threads["memory_writes"]) == 200 and "memory_writes" not in warps
+    assert warps["memory_writes_summary"]["num_writes"] == 200
+    assert warps["warp_stats"] == threads["warp_stats"]
+    assert "warp_stats" not in summary and "warps" not in summary["control_flow"]
+    assert summary["warp_summary"] == summarize_warp_usage(threads["warp_stats"])
+    # Histograms count every warp the run executed
+    assert sum(summary["control_flow"]["warps_histogram"]["issued"].values()) == len(threads["control_flow"]["warps"])
+    # The totals do not depend on the detail level
+    for section in ("memory_summary", "buffers", "roofline"):
+        assert summary[section] == threads[section]
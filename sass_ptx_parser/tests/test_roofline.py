@@ -0,0 +1,32 @@
+# test_roofline.py
+
+import json
+
+import pytest
+from conftest import BOUNDS_PTX
+
+# The bounds-checked store behind 256 dependent adds per thread
+ALU_PTX = BOUNDS_PTX.replace("\tand.b32 \t%r6, %r5, 1;\n",
+                             "\tand.b32 \t%r6, %r5, 1;\n" + "\tadd.s32 \t%r1, %r1, 0;\n" * 256)
+LAUNCH = ("--grid", "64", "--block", "64", "--param", "1=3000", "--device", "a100")
+TOTALS = ("issued_instructions", "requested_bytes", "dram_bytes")
+
+@pytest.mark.parametrize("kernel, bound", [(BOUNDS_PTX, "memory"), (ALU_PTX, "compute")],
+                         ids=["bandwidth", "compute"])
+def test_bound(analyze, kernel, bound):
+    roofline = json.loads(analyze("k.ptx", kernel, *LAUNCH))["roofline"]
+    assert roofline["bound"] == bound
+    intensity_above_ridge = roofline["arithmetic_intensity"] > roofline["ridge_point"]
+    assert intensity_above_ridge == (bound == "compute")
+    # One 4-byte store per thread below n; each of the two divergent stores touches every sector of the warp
+    assert roofline["requested_bytes"] == 3000 * 4
+    assert roofline["dram_bytes"] == 2 * 3000 * 4
+
+@pytest.mark.parametrize("kernel", [BOUNDS_PTX, ALU_PTX], ids=["bandwidth", "compute"])
+def test_sampled_roofline_uses_the_estimates(analyze, kernel):
+    full = json.loads(analyze("k.ptx", kernel, *LAUNCH))["roofline"]
+    sampled = json.loads(analyze("k.ptx", kernel, *LAUNCH, "--sample", "0.25"))
+    assert sampled["sampling"]["simulated_blocks"] < 64
+    roofline = sampled["roofline"]
+    assert {k: roofline[k] for k in TOTALS} == {k: full[k] for k in TOTALS}
+    assert roofline["bound"] == full["bound"]
@@ -0,0 +1,46 @@
+# test_sampling.py
+
+import json
+
+from conftest import BOUNDS_PTX
+
+LAUNCH = ("--grid", "64", "--block", "64", "--param", "1=3000")
+# Even lanes also write out[i + 2], so the last even lane of a block writes into the next block
+HALO_PTX = BOUNDS_PTX.replace("""\
+$L__BB0_3:
+	st.global.f32 	[%rd4], %f1;
+""", """\
+$L__BB0_3:
+	st.global.f32 	[%rd4], %f1;
+	st.global.f32 	[%rd4+8], %f1;
+""")
+
+def test_full_sample_is_exact(analyze):
+    full = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH))
+    sampled = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--sample", "1.0"))
+    used = sampled["sampling"]["estimates"]["used_bytes"]
+    assert used["estimate"] == used["ci95"][0] == used["ci95"][1] == full["memory_summary"]["used_bytes"]
+
+def test_simulated_only_sections_are_listed(analyze):
+    report = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--sample", "0.25"))
+    listed = report["sampling"]["not_estimated"]
+    assert {"memory_summary.instructions", "warp_stats", "address_conflicts"} <= set(listed)
+    assert not {"memory_summary", "buffers"} & set(listed)
+    assert report["sampling"]["simulated_blocks"] < 64
+
+def test_bytes_shared_between_blocks_count_once(analyze):
+    launch = ("--grid", "64", "--block", "64", "--param", "1=4096")
+    full = json.loads(analyze("k.ptx", HALO_PTX, *launch))
+    assert full["memory_summary"]["used_bytes"] == 4097 * 4
+    sampled = json.loads(analyze("k.ptx", HALO_PTX, *launch, "--sample", "0.25"))
+    assert sampled["sampling"]["simulated_blocks"] < 64
+    assert sampled["sampling"]["estimates"]["used_bytes"]["estimate"] == 4097 * 4
+    for key in ("used_bytes", "footprint_bytes", "efficiency"):
+        assert sampled["memory_summary"][key] == full["memory_summary"][key]
+    assert [(b["used_bytes"], b["footprint_bytes"]) for b in sampled["buffers"]["buffers"]] == [(4097 * 4, 4097 * 4)]
+
+def test_sampling_under_memory_budget(analyze):
+    sampled = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--sample", "0.25"))
+    spilled = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--sample", "0.25", "--memory-budget", "2000"))
+    assert spilled["sampling"] == sampled["sampling"]
+    assert spilled["memory_summary"] == sampled["memory_summary"]
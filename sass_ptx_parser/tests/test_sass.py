@@ -0,0 +1,19 @@
+# test_sass.py
+
+import json
+from collections import Counter
+
+from conftest import FILL_SASS
+from parser import parse_sass_to_ir
+
+def test_unsupported_instructions_are_counted():
+    unsupported = Counter()
+    ir = parse_sass_to_ir(FILL_SASS, unsupported=unsupported)
+    assert unsupported == {"ULDC.64": 1}
+    assert {"op": "mov.u32", "dst": "r5", "src": "r0"} in ir
+
+def test_two_carry_iadd3_crosses_4gib(analyze):
+    report = json.loads(analyze("k.sass", FILL_SASS, "--grid", "1", "--block", "8", "--param", "0=0xfffffff0"))
+    writes = sorted((w["address"], w["written_value"]) for w in report["memory_writes"])
+    assert writes == [(0xfffffff0 + 4 * t, t) for t in range(8)]
+    assert report["unsupported_instructions"] == {"ULDC.64": 1}
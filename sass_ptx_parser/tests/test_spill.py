@@ -0,0 +1,37 @@
+# test_spill.py
+
+import json
+
+import pytest
+from conftest import GRIDLOOP_PTX, BOUNDS_PTX
+from spill import parse_size
+
+LAUNCH = ("--grid", "24", "--block", "96")
+
+@pytest.mark.parametrize("kernel, extra", [
+    (BOUNDS_PTX, ("--param", "1=2000")),
+    (GRIDLOOP_PTX, ("--param", "1=9000", "--no-loop-summary")),
+])
+@pytest.mark.parametrize("budget", ["4K", "64K"])
+def test_spilled_report_matches_in_memory(analyze, kernel, extra, budget):
+    full = analyze("k.ptx", kernel, *LAUNCH, *extra)
+    spilled = analyze("k.ptx", kernel, *LAUNCH, *extra, "--memory-budget", budget)
+    assert spilled == full
+
+def test_budget_sizes_chunks_below_the_budget(analyze):
+    report = json.loads(analyze("k.ptx", GRIDLOOP_PTX, *LAUNCH, "--param", "1=9000", "--no-loop-summary",
+                                "--memory-budget", "64K", "--profile-memory", "--detail", "summary"))
+    execute = next(p for p in report["profile"]["phases"] if p["phase"] == "simulate.execute")
+    assert execute["counters"]["spilled_chunks"] > 1
+    assert execute["peak_bytes"] < 4 * parse_size("64K")
+
+def test_parse_size():
+    assert parse_size("512M") == 512 << 20
+    assert parse_size("1.5g") == 3 << 29
+    with pytest.raises(ValueError):
+        parse_size("0")
+
+def test_profile_traces_memory_only_on_request(analyze):
+    profile = json.loads(analyze("k.ptx", BOUNDS_PTX, *LAUNCH, "--param", "1=2000", "--profile"))["profile"]
+    assert not profile["memory_traced"]
+    assert all("peak_bytes" not in p for p in profile["phases"])
@@ -0,0 +1,21 @@
+# test_trace_io.py
+
+from access_trace import AccessTrace
+from trace_io import write_trace, read_trace
+
+def test_write_then_mapped_read_round_trips(tmp_path):
+    trace = AccessTrace((2, 1, 1), (64, 1, 1), 0x1000)
+    trace.extend(3, "st.global.f32 [%rd4], %f1", [0, 0, 1], [0, 33, 5], [0x1000, 0x1084, 0x1114], 4,
+                 "global", "write", values=[1.5, -7, None])
+    trace.extend(5, "st.shared.u64 [%r2], %rd1", [1, 1], [6, 7], [0x20, 0x28], 8, "shared", "write",
+                 values=[(1 << 64) - 1, 1 << 40], strides=[-8, 8], counts=[1 << 33, 3])
+    path = str(tmp_path / "t.trace")
+    write_trace(trace, path)
+    with read_trace(path) as mapped:
+        assert (mapped.grid_shape, mapped.block_shape, mapped.base_address) == ((2, 1, 1), (64, 1, 1), 0x1000)
+        assert mapped.ops == trace.ops
+        assert list(mapped.records()) == list(trace.records())
+        assert mapped.count[3] == 1 << 33
+        assert [mapped.value[i] for i in range(len(mapped))] == [1.5, -7, None, (1 << 64) - 1, 1 << 40]
+        # select() copies the rows, values included, out of the mapping
+        assert mapped.select(space="shared").value == [(1 << 64) - 1, 1 << 40]
@@ -0,0 +1,57 @@
+# test_vector_access.py
+
+import json
+
+import pytest
+from conftest import FILL_SASS
+
+# out[tid] = value, one store of the given type and width per thread
+STORE_PTX = """
+.version 7.5
+.target sm_86
+.address_size 64
+
+.visible .entry _Z5storePv(
+	.param .u64 _Z5storePv_param_0
+)
+{{
+	.reg .b32 	%r<6>;
+	.reg .b64 	%rd<5>;
+
+	ld.param.u64 	%rd1, [_Z5storePv_param_0];
+	cvta.to.global.u64 	%rd2, %rd1;
+	mov.u32 	%r5, %tid.x;
+	mul.wide.s32 	%rd3, %r5, {width};
+	add.s64 	%rd4, %rd2, %rd3;
+	st.global.{type} 	[%rd4], {value};
+	ret;
+}}
+"""
+
+@pytest.mark.parametrize("type, width, value, expected", [
+    ("u32", 4, "7", lambda t: 7),
+    ("v2.u32", 8, "{%r5, %r5}", lambda t: t | t << 32),
+    ("v4.u32", 16, "{1, 2, 3, %r5}", lambda t: 1 | 2 << 32 | 3 << 64 | t << 96),
+], ids=["immediate", "v2", "v4-immediates"])
+def test_vector_store_width_and_values(analyze, type, width, value, expected):
+    kernel = STORE_PTX.format(type=type, width=width, value=value)
+    report = json.loads(analyze("k.ptx", kernel, "--grid", "1", "--block", "32"))
+    [instr] = report["memory_summary"]["instructions"]
+    assert (instr["access_size"], instr["bytes"]) == (width, 32 * width)
+    writes = sorted(report["memory_writes"], key=lambda w: w["thread_id"])
+    assert [(w["memory_offset"], w["access_size"], w["written_value"]) for w in writes] == \
+        [(t, width, expected(t)) for t in range(32)]
+
+    # A warp moving 32 * width contiguous bytes fills every sector it touches
+    [stat] = report["warp_stats"]
+    assert stat["coalesced"] and stat["sectors"] == 32 * width // 32
+    assert report["memory_summary"]["used_bytes"] == report["memory_summary"]["footprint_bytes"] == 32 * width
+    assert report["memory_summary"]["stride"] == width
+
+def test_sass_128_bit_store(analyze):
+    kernel = FILL_SASS.replace("IMAD.SHL.U32 R2, R0, 0x4, RZ", "IMAD.SHL.U32 R2, R0, 0x10, RZ") \
+                      .replace("STG.E [R2.64], R5", "STG.E.128 [R2.64], R4")
+    report = json.loads(analyze("k.sass", kernel, "--grid", "1", "--block", "32"))
+    [instr] = report["memory_summary"]["instructions"]
+    assert (instr["instruction"], instr["access_size"], instr["bytes"]) == ("st.global.v4.u32", 16, 512)
+    assert report["warp_stats"][0]["sectors"] == 16
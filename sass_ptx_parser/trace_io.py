@@ -0,0 +1,213 @@
+# trace_io.py
+#
+# Binary trace files: a versioned header, a column table and one fixed-width
+# little-endian array per AccessTrace column, each 8-byte aligned. Written
+# values take two more columns: a type tag (none, signed or unsigned int,
+# float) and the value's 64 bits (the float's IEEE bits). Reading
+# maps the file and hands out memoryview columns over the mapping, so even
+# very large traces load without copying and the utils.py analyses run on
+# them directly.
+#
+#   header   <8sHHQ3I3IQQI  magic, version, columns, rows, grid xyz,
+#                           block xyz, base address, ops offset, ops length
+#   columns  <8sc7xQ        name, array type code, data offset (per column)
+#   data     rows * itemsize bytes per column
+#   ops      JSON object {instr_idx: op}
+#
+# Version 1 files have no value columns; their values read as None.
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List
+from access_trace import AccessTrace
+
+MAGIC = b"PTXTRACE"
+VERSION = 2
+
+HEADER = struct.Struct("<8sHHQ3I3IQQI")
+COLUMN = struct.Struct("<8sc7xQ")
+
+# Fixed on-disk widths; AccessTrace itself uses native 'L' for some columns
+FORMATS: Dict[str, str] = {
+    "block": "I", "thread": "I", "warp": "I", "instr": "I", "address": "Q",
+    "size": "H", "space": "B", "kind": "B", "stride": "q", "count": "Q",
+}
+VALUE_FORMATS: Dict[str, str] = {"vtype": "B", "vbits": "Q"}
+WIDTHS = {"B": 1, "H": 2, "I": 4, "Q": 8, "q": 8}
+
+# vtype tags
+V_NONE, V_INT, V_UINT, V_FLOAT = range(4)
+DOUBLE = struct.Struct("<d")
+QWORD = struct.Struct("<Q")
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+def _value_tags(values: List) -> array:
+    tags = array("B")
+    for v in values:
+        if v is None:
+            tags.append(V_NONE)
+        elif isinstance(v, float):
+            tags.append(V_FLOAT)
+        else:
+            tags.append(V_INT if -(1 << 63) <= v < 1 << 63 else V_UINT)
+    return tags
+
+def _value_bits(values: List) -> array:
+    bits = array("Q")
+    for v in values:
+        if v is None:
+            bits.append(0)
+        elif isinstance(v, float):
+            bits.append(QWORD.unpack(DOUBLE.pack(v))[0])
+        else:
+            bits.append(v & (1 << 64) - 1)
+    return bits
+
+def _decode(tag: int, bits: int):
+    if tag == V_INT:
+        return bits - (1 << 64) if bits >> 63 else bits
+    if tag == V_UINT:
+        return bits
+    if tag == V_FLOAT:
+        return DOUBLE.unpack(QWORD.pack(bits))[0]
+    return None
+
+class _Values:
+    """Per-row written values, decoded from the vtype and vbits columns on access."""
+
+    def __init__(self, tags, bits):
+        self.tags = tags
+        self.bits = bits
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __getitem__(self, i):
+        return _decode(self.tags[i], self.bits[i])
+
+class _NoValues:
+    """Stands in for the per-row written values of a version 1 file, which did not store them."""
+
+    def __init__(self, n: int):
+        self.n = n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        return None
+
+def write_trace(trace: AccessTrace, path: str):
+    """Write `trace` in the binary trace format, one chunk of rows at a time."""
+    n = len(trace)
+    ops = json.dumps({str(k): v for k, v in trace.ops.items()}).encode()
+    columns = {**FORMATS, **VALUE_FORMATS}
+    offset = _align(HEADER.size + COLUMN.size * len(columns))
+    table, starts = [], []
+    for name, code in columns.items():
+        if array(code).itemsize != WIDTHS[code]:
+            raise RuntimeError(f"array '{code}' is {array(code).itemsize} bytes on this platform")
+        table.append(COLUMN.pack(name.encode(), code.encode(), offset))
+        starts.append(offset)
+        offset = _align(offset + n * WIDTHS[code])
+
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(columns), n, *trace.grid_shape, *trace.block_shape,
+                            trace.base_address, offset, len(ops)))
+        f.write(b"".join(table))
+        for start, (name, code) in zip(starts, columns.items()):
+            f.write(b"\0" * (start - f.tell()))
+            for part in trace.chunks():
+                if name == "vtype":
+                    col = _value_tags(part.value)
+                elif name == "vbits":
+                    col = _value_bits(part.value)
+                else:
+                    col = array(code, getattr(part, name))
+                if sys.byteorder == "big":
+                    col.byteswap()
+                col.tofile(f)
+        f.write(b"\0" * (offset - f.tell()))
+        f.write(ops)
+
+class MappedTrace(AccessTrace):
+    """
+    Read-only AccessTrace whose columns are memoryviews into a mapped trace
+    file. select() and take() return ordinary in-memory traces.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if len(buf) < HEADER.size:
+            raise ValueError(f"{path}: not a trace file")
+        magic, version, ncols, n, gx, gy, gz, bx, by, bz, base, ops_at, ops_len = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a trace file")
+        if version not in (1, VERSION):
+            raise ValueError(f"{path}: unsupported trace version {version}")
+        super().__init__((gx, gy, gz), (bx, by, bz), base)
+
+        self._views = [buf]
+        columns = {}
+        for k in range(ncols):
+            name, code, start = COLUMN.unpack_from(buf, HEADER.size + k * COLUMN.size)
+            name, code = name.rstrip(b"\0").decode(), code.decode()
+            raw = buf[start:start + n * WIDTHS[code]]
+            if sys.byteorder == "big":
+                col = array(code, raw)
+                col.byteswap()
+            else:
+                col = raw.cast(code)
+                self._views.append(col)
+            columns[name] = col
+        for name in FORMATS:
+            setattr(self, name, columns[name])
+        self.value = _Values(columns["vtype"], columns["vbits"]) if "vtype" in columns else _NoValues(n)
+        self.ops = {int(k): v for k, v in json.loads(bytes(buf[ops_at:ops_at + ops_len])).items()}
+
+    def extend(self, *args, **kwargs):
+        raise TypeError("mapped traces are read-only")
+
+    def close(self):
+        for name in FORMATS:
+            setattr(self, name, array(FORMATS[name]))
+        self.value = []
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def read_trace(path: str) -> MappedTrace:
+    return MappedTrace(path)
+
+if __name__ == "__main__":
+    # Re-run the memory analyses on an archived trace
+    from utils import (strided_ranges, stride_from_ranges, footprint_from_ranges, analyze_bank_conflicts,
+                       memory_instructions)
+
+    with read_trace(sys.argv[1]) as trace:
+        accesses = trace.select(space="global")
+        ranges = strided_ranges(accesses)
+        instructions = memory_instructions(accesses)
+        main_access = max(instructions, key=lambda i: (i["access_type"] == "write", i["bytes"]), default=None)
+        print(json.dumps({
+            "rows": len(trace),
+            "num_accesses": trace.num_accesses,
+            **stride_from_ranges(ranges, main_access["access_size"] if main_access else 4),
+            **footprint_from_ranges(ranges),
+            "instructions": instructions,
+            "bank_conflicts": analyze_bank_conflicts(trace.select(space="shared")),
+        }, indent=4))
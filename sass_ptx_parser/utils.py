@@ -1,12 +1,18 @@
 # utils.py
 
-from typing import List, Dict
+import heapq
+from bisect import bisect_right
+from collections import defaultdict, Counter
+from itertools import chain, islice
+from typing import List, Dict, Iterator, Tuple
+from access_trace import AccessTrace, KINDS, unravel
 
 def coalesce_addresses(addresses: List[int], access_size: int = 4) -> List[Dict]:
     addresses = sorted(set(addresses))
     ranges = []
+    if not addresses:
+        return ranges
 
-    print(f"DEBUG: Address[0]: 0x{addresses[0]:x}")
     start = prev = addresses[0]
     
     for addr in addresses[1:]:
@@ -20,13 +26,13 @@ def coalesce_addresses(addresses: List[int], access_size: int = 4) -> List[Dict]
 
     return [
         {
-            "address_range": f"0x{start:08x} - 0x{end-4:08x}",
+            "address_range": f"0x{start:08x} - 0x{end-access_size:08x}",
             "coalesced": True
         }
         for start, end in ranges
     ]
 
-def analyze_stride(addresses: List[int]) -> Dict:
+def analyze_stride(addresses: List[int], access_size: int = 4) -> Dict:
     if len(addresses) < 2:
         return {"stride": None, "pattern": "undetermined", "density": None}
 
@@ -35,8 +41,8 @@ def analyze_stride(addresses: List[int]) -> Dict:
     stride_set = set(diffs)
 
     stride = diffs[0] if len(stride_set) == 1 else None
-    pattern = "unit-strided" if stride == 4 else "irregular"
-    density = len(addresses) * 4 / (addresses[-1] + 4 - addresses[0])
+    pattern = "unit-strided" if stride == access_size else "irregular"
+    density = len(addresses) * access_size / (addresses[-1] + access_size - addresses[0])
 
     return {
         "stride": stride,
@@ -63,8 +69,187 @@ def estimate_footprint(addresses: List[int], access_size: int = 4) -> Dict:
         "efficiency": efficiency
     }
 
-def check_warp_coalescing(warp_entries, access_size=4, segment_size=128):
-    addresses = sorted(e["address"] for e in warp_entries)
+def merge_ranges(ranges) -> List[Tuple[int, int]]:
+    """Sort and merge overlapping or touching [lo, hi) byte ranges."""
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], hi)
+        else:
+            merged.append([lo, hi])
+    return [(lo, hi) for lo, hi in merged]
+
+def strided_ranges(trace: AccessTrace) -> List[Tuple[int, int]]:
+    """
+    Merged byte ranges touched by a trace without unrolling summarized loops.
+
+    Rows sharing (stride, count, size) form a lattice: when the union of their
+    first iteration fits inside one stride, every later iteration is the same
+    pattern shifted by the stride, so it is copied per iteration instead of
+    per thread, and collapses to a single range when it tiles the stride.
+    """
+    ranges = []
+    lattices = defaultdict(list)
+    for addr, stride, count, size in zip(trace.address, trace.stride, trace.count, trace.size):
+        if count == 1 or stride == 0:
+            ranges.append((addr, addr + size))
+            continue
+        if stride < 0:
+            addr, stride = addr + stride * (count - 1), -stride
+        lattices[(stride, count, size)].append(addr)
+
+    for (stride, count, size), starts in lattices.items():
+        base = merge_ranges((a, a + size) for a in starts)
+        width = base[-1][1] - base[0][0]
+        if width == stride and len(base) == 1:
+            ranges.append((base[0][0], base[0][0] + stride * count))
+        elif width <= stride:
+            ranges.extend((lo + j * stride, hi + j * stride) for j in range(count) for lo, hi in base)
+        else:
+            ranges.extend((a + j * stride, a + j * stride + size) for a in starts for j in range(count))
+
+    return merge_ranges(ranges)
+
+def format_ranges(ranges: List[Tuple[int, int]], access_size: int = 4) -> Iterator[Dict]:
+    return (
+        {
+            "address_range": f"0x{start:08x} - 0x{end-access_size:08x}",
+            "coalesced": True
+        }
+        for start, end in ranges
+    )
+
+def _stride_pattern(used: int, span: int, gaps, widths, access_size: int) -> Dict:
+    """Stride, pattern and density of `used` bytes over `span` bytes; gaps is None for a single range."""
+    if used < 2 * access_size:
+        return {"stride": None, "pattern": "undetermined", "density": None}
+
+    if gaps is None:
+        stride = access_size
+    else:
+        stride = next(iter(gaps)) if len(gaps) == 1 and widths == {access_size} else None
+    pattern = "unit-strided" if stride == access_size else "irregular"
+
+    return {
+        "stride": stride,
+        "pattern": pattern,
+        "density": round(used / span, 2)
+    }
+
+def stride_from_ranges(ranges: List[Tuple[int, int]], access_size: int = 4) -> Dict:
+    """analyze_stride() computed from merged byte ranges."""
+    used = sum(hi - lo for lo, hi in ranges)
+    if used < 2 * access_size:
+        return _stride_pattern(used, 0, None, None, access_size)
+    gaps = {b[0] - a[0] for a, b in zip(ranges, islice(ranges, 1, None))} if len(ranges) > 1 else None
+    widths = {hi - lo for lo, hi in ranges}
+    return _stride_pattern(used, ranges[-1][1] - ranges[0][0], gaps, widths, access_size)
+
+def footprint_from_ranges(ranges: List[Tuple[int, int]]) -> Dict:
+    """estimate_footprint() computed from merged byte ranges."""
+    if not ranges:
+        return {"footprint_bytes": 0, "used_bytes": 0, "wasted_bytes": 0, "efficiency": 1.0}
+
+    footprint = ranges[-1][1] - ranges[0][0]
+    used = sum(hi - lo for lo, hi in ranges)
+    return {
+        "footprint_bytes": footprint,
+        "used_bytes": used,
+        "wasted_bytes": footprint - used,
+        "efficiency": round(used / footprint, 3) if footprint > 0 else 1.0
+    }
+
+def buffer_usage(ranges: List[Tuple[int, int]], buffers: List[Dict],
+                 access_size: int = 4) -> Tuple[List[Dict], Dict]:
+    """
+    Split merged byte ranges among the pointer parameters (params.assign_buffers).
+    Bytes from a buffer's base up to the next buffer belong to it, and count
+    as out of bounds past its size when one is known. Returns one record per
+    buffer, with stride_from_ranges() of its in-bounds bytes, and
+    footprint_from_ranges() totals summed over the buffers, so the gaps
+    between separate allocations are not counted as wasted.
+    """
+    bufs = sorted((b for b in buffers if "base" in b), key=lambda b: b["base"])
+    bases = [b["base"] for b in bufs]
+    # Per window (index 0: below every buffer): bytes and span inside, bytes and span overall
+    inside, outside = [0] * (len(bufs) + 1), [0] * (len(bufs) + 1)
+    span_in = [[None, None] for _ in range(len(bufs) + 1)]
+    span = [[None, None] for _ in range(len(bufs) + 1)]
+    # Per window: distances between the starts of in-bounds ranges and their widths (two are enough to rule out a stride)
+    gaps = [set() for _ in range(len(bufs) + 1)]
+    widths = [set() for _ in range(len(bufs) + 1)]
+    last = [None] * (len(bufs) + 1)
+    for lo, hi in ranges:
+        while lo < hi:
+            k = bisect_right(bases, lo)
+            cut = min(hi, bases[k]) if k < len(bases) else hi
+            size = bufs[k - 1]["size"] if k else None
+            limit = max(lo, min(cut, bases[k - 1] + size)) if size is not None else cut
+            if limit > lo:
+                if span_in[k][0] is not None and len(gaps[k]) < 2:
+                    gaps[k].add(lo - last[k])
+                if len(widths[k]) < 2:
+                    widths[k].add(limit - lo)
+                last[k] = lo
+                inside[k] += limit - lo
+                span_in[k] = [lo if span_in[k][0] is None else span_in[k][0], limit]
+            outside[k] += cut - limit
+            span[k] = [lo if span[k][0] is None else span[k][0], cut]
+            lo = cut
+
+    records = []
+    for k, b in enumerate(bufs, 1):
+        lo, hi = span_in[k]
+        end = b["base"] + b["size"] if b["size"] is not None else None
+        records.append({
+            "name": b["name"],
+            "base": hex(b["base"]),
+            "size": b["size"],
+            "used_bytes": inside[k],
+            "footprint_bytes": hi - lo if inside[k] else 0,
+            "efficiency": round(inside[k] / (hi - lo), 3) if inside[k] else 1.0,
+            "address_range": f"0x{lo:08x} - 0x{hi:08x}" if inside[k] else None,
+            **_stride_pattern(inside[k], hi - lo if inside[k] else 0, gaps[k] or None, widths[k], access_size),
+            "out_of_bounds_bytes": outside[k],
+            # Buffers given overlapping extents with --param alias each other
+            "overlaps": [o["name"] for o in bufs if o is not b and end is not None and o["size"] is not None
+                         and o["base"] < end and b["base"] < o["base"] + o["size"]],
+        })
+
+    footprint = sum(hi - lo for lo, hi in span if lo is not None)
+    used = sum(inside) + sum(outside)
+    return records, {
+        "footprint_bytes": footprint,
+        "used_bytes": used,
+        "wasted_bytes": footprint - used,
+        "efficiency": round(used / footprint, 3) if footprint > 0 else 1.0,
+        "unattributed_bytes": inside[0],
+    }
+
+def memory_instructions(trace: AccessTrace) -> List[Dict]:
+    """Width, kind, accesses and bytes moved of every memory instruction in a trace."""
+    per_instr = {}   # instr -> [access size, kind, accesses]
+    for part in trace.chunks():
+        for instr, size, kind, count in zip(part.instr, part.size, part.kind, part.count):
+            entry = per_instr.get(instr)
+            if entry is None:
+                entry = per_instr[instr] = [size, kind, 0]
+            entry[2] += count
+    return [{
+        "instr_idx": k,
+        "instruction": trace.ops[k],
+        "access_type": KINDS[kind],
+        "access_size": size,
+        "accesses": n,
+        "bytes": n * size,
+    } for k, (size, kind, n) in sorted(per_instr.items())]
+
+def buffer_of(bases: List[int], address: int) -> int:
+    """Index of the buffer (sorted bases) an address falls into, -1 below all of them."""
+    return bisect_right(bases, address) - 1
+
+def check_warp_coalescing(warp_addresses, access_size=4, segment_size=128):
+    addresses = sorted(set(warp_addresses))
     if not addresses:
         return False
 
@@ -73,6 +258,217 @@ def check_warp_coalescing(warp_entries, access_size=4, segment_size=128):
 
     span = max_addr - base
     aligned = (base % segment_size) == 0
-    within_segment = span <= segment_size
+    # Wide accesses need several segments even when packed (32 x 16 bytes: four)
+    segments = (len(addresses) * access_size + segment_size - 1) // segment_size
+    within_segment = span <= segments * segment_size
+
+    return aligned and within_segment
+
+def count_sectors(addresses, access_size=4, sector_size=32) -> int:
+    """Distinct sector_size-byte sectors touched by one warp request."""
+    return len({s for a in addresses
+                for s in range(a // sector_size, (a + access_size - 1) // sector_size + 1)})
+
+def request_bank_conflicts(lanes: List[Tuple[int, int]], access_size: int = 4,
+                           num_banks: int = 32, bank_width: int = 4) -> Tuple[int, int, int]:
+    """
+    Conflict degree of one warp-wide shared-memory request.
+
+    `lanes` holds (lane, address) pairs. Accesses wider than a bank are served
+    in phases of num_banks * bank_width bytes (half-warps for 8-byte, quarter-
+    warps for 16-byte); lanes touching the same word are a broadcast and do
+    not conflict. Returns (ways, wavefronts, ideal_wavefronts).
+    """
+    per_phase = max(1, num_banks * bank_width // max(access_size, bank_width))
+    phases = defaultdict(lambda: defaultdict(set))
+    for lane, addr in lanes:
+        banks = phases[lane // per_phase]
+        for word in range(addr // bank_width, (addr + access_size - 1) // bank_width + 1):
+            banks[word % num_banks].add(word)
 
-    return aligned and within_segment
\ No newline at end of file
+    ways = [max(len(words) for words in banks.values()) for banks in phases.values()]
+    return max(ways), sum(ways), len(ways)
+
+def warp_requests(trace: AccessTrace, rows: List[int]) -> List[List[int]]:
+    """
+    Split the rows of one (block, warp, instruction) into the individual
+    times the warp executed it: a lane showing up again starts a new request.
+    """
+    requests, lanes = [[]], set()
+    for i in rows:
+        if trace.thread[i] in lanes:
+            requests.append([])
+            lanes = set()
+        requests[-1].append(i)
+        lanes.add(trace.thread[i])
+    return requests
+
+def _loop_requests(trace: AccessTrace, rows: List[int], bank_width: int = 4):
+    """
+    (lanes, repeat) warp requests behind one warp's rows. A summarized loop
+    where every lane moves by the same whole-bank stride only rotates the
+    banks, so its first iteration stands for all of them; otherwise the
+    iterations are replayed one by one.
+    """
+    strides = {trace.stride[i] for i in rows}
+    counts = {trace.count[i] for i in rows}
+    lanes = [(trace.thread[i] % 32, trace.address[i]) for i in rows]
+    if counts == {1} or (len(counts) == 1 and len(strides) == 1
+                         and strides.pop() % bank_width == 0):
+        yield lanes, counts.pop()
+        return
+    for j in range(max(counts)):
+        yield [(trace.thread[i] % 32, trace.address[i] + j * trace.stride[i])
+               for i in rows if trace.count[i] > j], 1
+
+def analyze_bank_conflicts(trace: AccessTrace, num_banks: int = 32, bank_width: int = 4) -> List[Dict]:
+    """Per-instruction bank-conflict summary over every warp request in a shared-memory trace."""
+    per_instr = defaultdict(lambda: {"requests": 0, "conflicted_requests": 0, "max_ways": 0,
+                                     "wavefronts": 0, "ideal_wavefronts": 0, "ways": Counter()})
+    first = {}   # instr -> (access size, kind) of its first row
+    # Chunks hold whole blocks, so no warp request spans two of them
+    for part in trace.chunks():
+        requests = defaultdict(list)
+        for i, key in enumerate(zip(part.instr, part.block, part.warp)):
+            requests[key].append(i)
+            if key[0] not in first:
+                first[key[0]] = (part.size[i], part.kind[i])
+
+        for (instr_idx, _, _), rows in requests.items():
+            size = first[instr_idx][0]
+            stats = per_instr[instr_idx]
+            for lanes, repeat in chain.from_iterable(
+                    _loop_requests(part, request, bank_width) for request in warp_requests(part, rows)):
+                ways, wavefronts, ideal = request_bank_conflicts(lanes, size, num_banks, bank_width)
+                stats["requests"] += repeat
+                stats["conflicted_requests"] += repeat * (wavefronts > ideal)
+                stats["max_ways"] = max(stats["max_ways"], ways)
+                stats["wavefronts"] += repeat * wavefronts
+                stats["ideal_wavefronts"] += repeat * ideal
+                stats["ways"][ways] += repeat
+
+    result = []
+    for instr_idx in sorted(per_instr):
+        stats = per_instr[instr_idx]
+        ways = stats.pop("ways")
+        size, kind = first[instr_idx]
+        result.append({
+            "instr_idx": instr_idx,
+            "instruction": trace.ops[instr_idx],
+            "access_type": KINDS[kind],
+            "access_size": size,
+            **stats,
+            "avg_ways": round(sum(w * n for w, n in ways.items()) / stats["requests"], 2),
+            "ways_histogram": {str(w): n for w, n in sorted(ways.items())},
+        })
+
+    return result
+
+def analyze_address_conflicts(trace: AccessTrace, top: int = 10) -> Dict:
+    """
+    Same-address contention of atomics and stores, in one pass over the
+    trace. Within a warp request, lanes on the same address serialize: `ways`
+    is the most lanes on one address and every lane beyond the first on an
+    address is a warp collision. Grid-wide, the per-address hit counts are
+    hashed per instruction; accesses beyond the first to an address are
+    collisions, and the most hit addresses are listed. Reads never conflict
+    and are skipped. Returns the grid-wide totals, per-instruction entries and
+    one record per warp and instruction with a conflicted request.
+    """
+    read = KINDS.index("read")
+    hits = defaultdict(Counter)    # instr -> address -> accesses
+    per_instr = defaultdict(lambda: {"requests": 0, "conflicted_requests": 0, "warp_collisions": 0,
+                                     "max_ways": 0, "ways": Counter()})
+    first = {}   # instr -> (access size, kind) of its first row
+    warps = []
+    # Chunks hold whole blocks, so no warp request spans two of them
+    for part in trace.chunks():
+        groups = defaultdict(list)
+        for i, key in enumerate(zip(part.instr, part.block, part.warp, part.kind)):
+            if key[3] != read:
+                groups[key[:3]].append(i)
+
+        for (instr_idx, block, warp), rows in sorted(groups.items(), key=lambda g: (g[0][1], g[0][2], g[0][0])):
+            if instr_idx not in first:
+                first[instr_idx] = (part.size[rows[0]], part.kind[rows[0]])
+            counter = hits[instr_idx]
+            for i in rows:
+                addr, stride, count = part.address[i], part.stride[i], part.count[i]
+                if count == 1 or stride == 0:
+                    counter[addr] += count
+                else:
+                    counter.update(range(addr, addr + stride * count, stride))
+
+            # Every lane moving by one stride keeps the pattern, so one
+            # iteration of a summarized loop stands for all of them
+            stats = per_instr[instr_idx]
+            requests = conflicted = collisions = max_ways = 0
+            for lanes, repeat in chain.from_iterable(
+                    _loop_requests(part, request, 1) for request in warp_requests(part, rows)):
+                addresses = Counter(addr for _, addr in lanes)
+                ways = max(addresses.values())
+                requests += repeat
+                stats["ways"][ways] += repeat
+                max_ways = max(max_ways, ways)
+                if ways > 1:
+                    conflicted += repeat
+                    collisions += repeat * (len(lanes) - len(addresses))
+            stats["requests"] += requests
+            stats["conflicted_requests"] += conflicted
+            stats["warp_collisions"] += collisions
+            stats["max_ways"] = max(stats["max_ways"], max_ways)
+            if conflicted:
+                bx, by, bz = unravel(block, part.grid_shape)
+                warps.append({
+                    "blockIdx.x": bx,
+                    "blockIdx.y": by,
+                    "blockIdx.z": bz,
+                    "warp_id": block * part.warps_per_block + warp,
+                    "instr_idx": instr_idx,
+                    "requests": requests,
+                    "conflicted_requests": conflicted,
+                    "collisions": collisions,
+                    "max_ways": max_ways,
+                })
+
+    def hottest(counter: Counter) -> List[Dict]:
+        # Ties go to the lower address, so the order does not depend on the chunking
+        return [{"address": f"0x{a:08x}", "hits": n}
+                for a, n in heapq.nlargest(top, counter.items(), key=lambda x: (x[1], -x[0])) if n > 1]
+
+    instructions = []
+    for instr_idx in sorted(per_instr):
+        stats = per_instr[instr_idx]
+        ways = stats.pop("ways")
+        size, kind = first[instr_idx]
+        counter = hits[instr_idx]
+        accesses = sum(counter.values())
+        instructions.append({
+            "instr_idx": instr_idx,
+            "instruction": trace.ops[instr_idx],
+            "access_type": KINDS[kind],
+            "access_size": size,
+            "accesses": accesses,
+            "distinct_addresses": len(counter),
+            "collisions": accesses - len(counter),
+            **stats,
+            "avg_ways": round(sum(w * n for w, n in ways.items()) / stats["requests"], 2),
+            "ways_histogram": {str(w): n for w, n in sorted(ways.items())},
+            "hottest": hottest(counter),
+        })
+
+    total = Counter()
+    for counter in hits.values():
+        total.update(counter)
+    accesses = sum(i["accesses"] for i in instructions)
+    return {
+        "accesses": accesses,
+        "distinct_addresses": len(total),
+        "collisions": accesses - len(total),
+        "conflicted_requests": sum(i["conflicted_requests"] for i in instructions),
+        "warp_collisions": sum(i["warp_collisions"] for i in instructions),
+        "conflicted_warps": len({w["warp_id"] for w in warps}),
+        "hottest": hottest(total),
+        "instructions": instructions,
+        "warps": warps,
+    }